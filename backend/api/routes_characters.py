@@ -36,7 +36,7 @@ async def create_character(request: CharacterCreateRequest):
         HTTPException: If validation fails or name exists
     """
     try:
-        character = character_service.create_character(request)
+        character = await character_service.create_character(request)
         logger.info(f"Created character: {character.name} ({character.id})")
         return character
         
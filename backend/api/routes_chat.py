@@ -1,11 +1,17 @@
 """Chat endpoints."""
 
+import json
 import logging
+from typing import Any, AsyncIterator, Dict
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
 from models.schemas import ChatMessage, ChatResponse
 from services.chat_service import chat_service
-from llm.ollama_service import ollama_service
+from services.metrics import record_generation
+from llm.provider import llm_service
+from llm.scheduler import Priority, SchedulerRejected, TicketedStream, llm_scheduler
 from config.settings import settings
 from uuid import uuid4
 import time
@@ -15,6 +21,16 @@ logger = logging.getLogger(__name__)
 router = APIRouter(tags=["chat"])
 
 
+def _rejected(e: SchedulerRejected) -> HTTPException:
+    """Map a scheduler rejection to 429/503 with Retry-After."""
+    logger.warning(f"Generation request rejected ({e.status_code}): {e}")
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(message: ChatMessage):
     """Process chat message and return AI response.
@@ -37,6 +53,9 @@ async def chat(message: ChatMessage):
         )
         return response
         
+    except SchedulerRejected as e:
+        raise _rejected(e)
+        
     except ValueError as e:
         logger.warning(f"Invalid chat request: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -49,6 +68,73 @@ async def chat(message: ChatMessage):
         )
 
 
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a single server-sent event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _sse_stream(events: TicketedStream) -> AsyncIterator[str]:
+    """Convert chat service events into SSE frames."""
+    try:
+        async for event in events:
+            yield _format_sse(event["event"], event["data"])
+    finally:
+        await events.aclose()
+
+
+@router.post("/chat/stream")
+async def chat_stream(message: ChatMessage):
+    """Process chat message and stream the AI response as server-sent events.
+    
+    Emits a ``token`` event for every chunk generated by the LLM, then a
+    single ``done`` event whose data is the full ChatResponse (including
+    parsed structured content and metadata). Failures during generation
+    are reported as an ``error`` event.
+    
+    Args:
+        message: ChatMessage with user input
+        
+    Returns:
+        StreamingResponse with ``text/event-stream`` content
+        
+    Raises:
+        HTTPException: If validation or context retrieval fails
+    """
+    try:
+        events = await chat_service.stream_message(
+            character_id=message.characterId,
+            user_id=message.userId,
+            message=message.message,
+            conversation_id=message.conversationId
+        )
+        
+    except SchedulerRejected as e:
+        raise _rejected(e)
+        
+    except ValueError as e:
+        logger.warning(f"Invalid chat request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+        
+    except Exception as e:
+        logger.error(f"Chat stream setup failed: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate response: {str(e)}"
+        )
+    
+    # The background task also runs if the body was never started (client
+    # disconnected first), so the generation slot is always released
+    return StreamingResponse(
+        _sse_stream(events),
+        media_type="text/event-stream",
+        background=BackgroundTask(events.aclose),
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @router.post("/enhance", response_model=ChatResponse)
 async def enhance(message: ChatMessage):
     """Lightweight enhancer endpoint that reuses the chat pipeline but
@@ -67,6 +153,7 @@ async def enhance(message: ChatMessage):
                     user_id=message.userId,
                     message=message.message,
                     conversation_id=message.conversationId,
+                    priority=Priority.ENHANCE
                 )
             except ValueError:
                 # Fallthrough to generic enhancer when character not found
@@ -79,28 +166,34 @@ async def enhance(message: ChatMessage):
             " compelling character description in Bahasa Indonesia (max 15 words). Return only the sentence."
         )
 
-        ai_response = await ollama_service.generate(
-            prompt=message.message,
-            system_prompt=system_prompt,
-            conversation_history=[],
-            temperature=settings.temperature,
-            max_tokens=80,
-        )
+        async with llm_scheduler.submit(Priority.ENHANCE, message.userId) as ticket:
+            result = await llm_service.generate(
+                prompt=message.message,
+                system_prompt=system_prompt,
+                conversation_history=[],
+                temperature=settings.temperature,
+                max_tokens=80,
+            )
+        record_generation(result)
 
         response_time = time.time() - start
         conv_id = message.conversationId or str(uuid4())
 
         return ChatResponse(
-            reply=ai_response,
+            reply=result.text,
             characterName="Enhancer",
             conversationId=conv_id,
             context=[],
             metadata={
                 "responseTime": round(response_time, 3),
-                "model": settings.default_model,
+                "model": result.model or settings.default_model,
+                "queueWait": round(ticket.wait_time, 3),
+                "generation": result.usage(),
             },
         )
 
+    except SchedulerRejected as e:
+        raise _rejected(e)
     except Exception as e:
         logger.error(f"Enhance processing failed: {e}", exc_info=True)
         raise HTTPException(
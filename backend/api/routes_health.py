@@ -1,13 +1,13 @@
 """Health and status check endpoints."""
 
 import logging
-import psutil
 import time
-import os
-from fastapi import APIRouter
+from typing import Any, Dict
+from fastapi import APIRouter, Query
 
-from models.schemas import SystemStatus
-from llm.ollama_service import ollama_service
+from models.schemas import StatusHistory, SystemSample, SystemStatus
+from llm.health_monitor import health_monitor
+from services.system_sampler import system_sampler
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -21,6 +21,16 @@ APP_VERSION = "2.0.0"  # Updated with long-term memory system
 app_start_time = time.time()
 
 
+def _components(health: Dict[str, Any], sample: SystemSample) -> Dict[str, str]:
+    """Component health from the cached LLM health and the latest sample"""
+    return {
+        "llm": "healthy" if health.get("available_models") else "down",
+        "vector_db": "healthy",
+        "memory_store": "healthy" if sample.memories is not None else "down",
+        "character_store": "healthy" if sample.characters is not None else "down"
+    }
+
+
 @router.get("/health")
 async def health_check():
     """Modern health check endpoint with detailed component status.
@@ -29,23 +39,16 @@ async def health_check():
         Comprehensive health status with component breakdown
     """
     try:
-        health_status = await ollama_service.check_health()
+        health_status = await health_monitor.get()
+        
+        sample = await system_sampler.latest()
         
         # Check component health
-        components = {
-            "llm": "healthy" if health_status.get("available_models") else "down",
-            "vector_db": "healthy",
-            "memory_store": "healthy" if os.path.exists("data/memories") else "down",
-            "character_store": "healthy" if os.path.exists("data/characters") else "down"
-        }
+        components = _components(health_status, sample)
         
         # Calculate overall status
         overall_status = "healthy" if all(v == "healthy" for v in components.values()) else "degraded"
         
-        # Count resources
-        character_files = len([f for f in os.listdir("data/characters") if f.endswith(".json")]) if os.path.exists("data/characters") else 0
-        memory_files = len([f for f in os.listdir("data/memories") if f.endswith(".json")]) if os.path.exists("data/memories") else 0
-        
         return {
             "status": overall_status,
             "version": APP_VERSION,
@@ -55,11 +58,15 @@ async def health_check():
                 "provider": settings.llm_provider,
                 "model": settings.default_model,
                 "available_models": len(health_status.get("available_models", [])),
-                "gpu_available": health_status.get("gpu_available", False)
+                "gpu_available": health_status.get("gpu_available", False),
+                "backends": health_status.get("backends", []),
+                "checked_at": health_status.get("checked_at"),
+                "age_seconds": health_status.get("age_seconds"),
+                "model_switch": health_status.get("model_switch")
             },
             "metrics": {
-                "characters": character_files,
-                "memory_files": memory_files,
+                "characters": sample.characters or 0,
+                "memory_files": sample.memories or 0,
                 "uptime_seconds": round(time.time() - app_start_time, 1)
             }
         }
@@ -83,23 +90,18 @@ async def health_check():
 async def get_system_status():
     """Get detailed system status with resource usage.
     
+    Resource figures come from the latest background sample, so this
+    never blocks on psutil or directory listings.
+    
     Returns:
         SystemStatus with CPU/memory metrics and component health
     """
     try:
-        health = await ollama_service.check_health()
+        health = await health_monitor.get()
+        sample = await system_sampler.latest()
         
         # Component health checks
-        components = {
-            "llm": "healthy" if health.get("available_models") else "down",
-            "vector_db": "healthy",
-            "memory_store": "healthy" if os.path.exists("data/memories") else "down",
-            "character_store": "healthy" if os.path.exists("data/characters") else "down"
-        }
-        
-        # Count resources
-        character_count = len([f for f in os.listdir("data/characters") if f.endswith(".json")]) if os.path.exists("data/characters") else 0
-        memory_count = len([f for f in os.listdir("data/memories") if f.endswith(".json")]) if os.path.exists("data/memories") else 0
+        components = _components(health, sample)
         
         return SystemStatus(
             status="running",
@@ -108,13 +110,13 @@ async def get_system_status():
             model_loaded=settings.default_model,
             components=components,
             metrics={
-                "characters": character_count,
-                "memories": memory_count,
+                "characters": sample.characters or 0,
+                "memories": sample.memories or 0,
                 "models_available": len(health.get("available_models", []))
             },
             gpu_available=health.get("gpu_available", False),
-            cpu_usage=psutil.cpu_percent(interval=0.1),
-            memory_usage=psutil.virtual_memory().percent,
+            cpu_usage=sample.cpu_usage,
+            memory_usage=sample.memory_usage,
             uptime_seconds=round(time.time() - app_start_time, 1)
         )
     except Exception as e:
@@ -131,3 +133,20 @@ async def get_system_status():
             memory_usage=0.0,
             uptime_seconds=0.0
         )
+
+
+@router.get("/status/history", response_model=StatusHistory)
+async def get_status_history(window: float = Query(300, ge=1, le=86400, description="Seconds of history")):
+    """Get recent resource samples for the monitoring UI.
+    
+    Args:
+        window: How many seconds back to return
+        
+    Returns:
+        StatusHistory with samples, oldest first
+    """
+    return StatusHistory(
+        interval=system_sampler.interval,
+        window=window,
+        samples=system_sampler.history(window)
+    )
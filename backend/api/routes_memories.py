@@ -1,5 +1,6 @@
 """Memory management endpoints."""
 
+import asyncio
 import logging
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Query, Path
@@ -7,12 +8,26 @@ from fastapi import APIRouter, HTTPException, Query, Path
 from models.schemas import MemoryEntry, MemoryCreateRequest, MemoryUpdateRequest, MemoryType
 from services.memory_service import memory_service
 from services.character_service import character_service
+from rag.vector_service import rag_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["memories"])
 
 
+async def _embed_memory_content(content: str) -> Optional[List[float]]:
+    """Embed memory content for semantic ranking.
+    
+    Failures are non-fatal: the memory is stored without a vector and
+    gets backfilled the next time it is ranked.
+    """
+    try:
+        return await rag_service.embed_text(content)
+    except Exception as e:
+        logger.warning(f"Could not embed memory content: {e}")
+        return None
+
+
 @router.post("/memories/{character_id}/{user_id}", response_model=MemoryEntry, status_code=201)
 async def create_memory(
     character_id: str = Path(..., description="Character ID"),
@@ -35,7 +50,11 @@ async def create_memory(
         if not character:
             raise HTTPException(status_code=404, detail=f"Character not found: {character_id}")
         
-        memory = memory_service.create_memory(character_id, user_id, request)
+        embedding = await _embed_memory_content(request.content)
+        async with memory_service.pair_lock(character_id, user_id):
+            memory = await asyncio.to_thread(
+                memory_service.create_memory, character_id, user_id, request, embedding=embedding
+            )
         logger.info(f"Created memory {memory.id} for {character_id}/{user_id}")
         return memory
         
@@ -142,7 +161,11 @@ async def update_memory(
     Returns:
         Updated MemoryEntry
     """
-    memory = memory_service.update_memory(character_id, user_id, memory_id, request)
+    embedding = await _embed_memory_content(request.content) if request.content is not None else None
+    async with memory_service.pair_lock(character_id, user_id):
+        memory = await asyncio.to_thread(
+            memory_service.update_memory, character_id, user_id, memory_id, request, embedding=embedding
+        )
     if not memory:
         raise HTTPException(
             status_code=404,
@@ -168,7 +191,8 @@ async def delete_memory(
     Returns:
         No content on success
     """
-    success = memory_service.delete_memory(character_id, user_id, memory_id)
+    async with memory_service.pair_lock(character_id, user_id):
+        success = await asyncio.to_thread(memory_service.delete_memory, character_id, user_id, memory_id)
     if not success:
         raise HTTPException(
             status_code=404,
@@ -198,7 +222,8 @@ async def pin_memory(
     Returns:
         Updated MemoryEntry
     """
-    memory = memory_service.pin_memory(character_id, user_id, memory_id, pinned)
+    async with memory_service.pair_lock(character_id, user_id):
+        memory = await asyncio.to_thread(memory_service.pin_memory, character_id, user_id, memory_id, pinned)
     if not memory:
         raise HTTPException(
             status_code=404,
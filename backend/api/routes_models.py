@@ -2,10 +2,12 @@
 
 import logging
 from typing import List
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 
 from models.schemas import ModelConfig, ModelConfigUpdate
-from llm.ollama_service import ollama_service
+from llm.provider import llm_service
+from llm.health_monitor import health_monitor
+from rag.vector_service import rag_service
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -17,11 +19,13 @@ router = APIRouter(tags=["models"])
 async def list_available_models():
     """Get list of available LLM models.
     
+    Served from the health monitor's cached listing.
+    
     Returns:
         List of model names
     """
     try:
-        health = await ollama_service.check_health()
+        health = await health_monitor.get()
         return health.get("available_models", [])
         
     except Exception as e:
@@ -32,13 +36,7 @@ async def list_available_models():
         )
 
 
-@router.get("/config", response_model=ModelConfig)
-async def get_model_config():
-    """Get current model configuration.
-    
-    Returns:
-        ModelConfig with current settings
-    """
+def _current_config() -> ModelConfig:
     return ModelConfig(
         provider=settings.llm_provider,
         model_name=settings.default_model,
@@ -46,22 +44,42 @@ async def get_model_config():
         gpu_layers=settings.gpu_layers,
         temperature=settings.temperature,
         context_length=settings.context_length,
-        max_tokens=settings.max_tokens
+        max_tokens=settings.max_tokens,
+        model_switch=health_monitor.model_switch
     )
 
 
+@router.get("/config", response_model=ModelConfig)
+async def get_model_config():
+    """Get current model configuration.
+    
+    Returns:
+        ModelConfig with current settings and the model switch status
+    """
+    return _current_config()
+
+
 @router.put("/config", response_model=ModelConfig)
-async def update_model_config(config: ModelConfigUpdate):
+async def update_model_config(config: ModelConfigUpdate, response: Response):
     """Update model configuration.
     
+    A model change runs in the background (the model may have to be
+    pulled first) and answers ``202``; ``model_switch`` in the response,
+    ``GET /config`` and ``/health`` reports its progress. Other settings
+    apply immediately.
+    
     Args:
         config: New configuration settings
         
     Returns:
         Updated ModelConfig
     """
-    if config.model:
-        settings.default_model = config.model
+    if config.model and (config.model != llm_service.current_model or health_monitor.switching):
+        try:
+            health_monitor.switch_model(config.model)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        response.status_code = 202
         
     if config.temperature is not None:
         settings.temperature = config.temperature
@@ -80,21 +98,16 @@ async def update_model_config(config: ModelConfigUpdate):
     
     logger.info(f"Updated config: model={settings.default_model}, temp={settings.temperature}")
     
-    return ModelConfig(
-        provider=settings.llm_provider,
-        model_name=settings.default_model,
-        cpu_threads=settings.cpu_threads,
-        gpu_layers=settings.gpu_layers,
-        temperature=settings.temperature,
-        context_length=settings.context_length,
-        max_tokens=settings.max_tokens
-    )
+    return _current_config()
 
 
 @router.post("/embed")
 async def generate_embedding(text: str = Query(..., min_length=1, max_length=5000)):
     """Generate text embedding.
     
+    Uses the same embedding model and cache as RAG retrieval, so repeated
+    texts are served without re-encoding.
+    
     Args:
         text: Text to embed
         
@@ -102,7 +115,7 @@ async def generate_embedding(text: str = Query(..., min_length=1, max_length=500
         Embedding vector and metadata
     """
     try:
-        embedding = await ollama_service.generate_embedding(text)
+        embedding = await rag_service.embed_text(text)
         return {
             "embedding": embedding,
             "dimension": len(embedding),
@@ -114,3 +127,16 @@ async def generate_embedding(text: str = Query(..., min_length=1, max_length=500
             status_code=500,
             detail="Could not generate embedding"
         )
+
+
+@router.get("/embed/stats")
+async def get_embedding_cache_stats():
+    """Get embedding cache statistics.
+    
+    Returns:
+        Cache size and hit/miss counters
+    """
+    return {
+        "model": settings.embedding_model,
+        "cache": rag_service.embedding_cache.stats()
+    }
@@ -4,11 +4,16 @@ Menggunakan Pydantic Settings untuk type-safe config
 """
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, field_validator
-from typing import List
+from typing import List, Optional, Union
 import os
+import re
 from pathlib import Path
 
 
+# Go duration accepted by Ollama's keep_alive, e.g. "30m", "1h30m", "-1m"
+KEEP_ALIVE_DURATION = re.compile(r"^[-+]?((\d+(\.\d*)?|\.\d+)(ns|us|µs|ms|s|m|h))+$")
+
+
 class Settings(BaseSettings):
     """Application settings dengan environment variable support"""
     
@@ -43,13 +48,65 @@ class Settings(BaseSettings):
     # LLM Configuration
     llm_provider: str = Field(default="ollama", env="LLM_PROVIDER")  # ollama or llamacpp
     ollama_base_url: str = Field(default="http://localhost:11434", env="OLLAMA_BASE_URL")
+    ollama_hosts: str = Field(default="", env="OLLAMA_HOSTS")  # comma-separated pool; empty = OLLAMA_BASE_URL only
+    ollama_probe_interval: float = Field(default=10.0, gt=0, env="OLLAMA_PROBE_INTERVAL")  # seconds between host health probes
+    ollama_eject_seconds: float = Field(default=5.0, gt=0, env="OLLAMA_EJECT_SECONDS")  # first ejection of a failing host; doubles per failure
+    ollama_max_eject_seconds: float = Field(default=120.0, gt=0, env="OLLAMA_MAX_EJECT_SECONDS")
+    llm_health_interval: float = Field(default=15.0, gt=0, env="LLM_HEALTH_INTERVAL")  # seconds between cached health/model-list refreshes
+    # Ollama HTTP transport (per host)
+    ollama_max_connections: int = Field(default=10, ge=1, env="OLLAMA_MAX_CONNECTIONS")
+    ollama_max_keepalive_connections: int = Field(default=5, ge=0, env="OLLAMA_MAX_KEEPALIVE_CONNECTIONS")
+    ollama_keepalive_expiry: float = Field(default=30.0, ge=0, env="OLLAMA_KEEPALIVE_EXPIRY")  # seconds an idle connection is kept
+    ollama_connect_timeout: float = Field(default=5.0, gt=0, env="OLLAMA_CONNECT_TIMEOUT")  # also pool wait and health probes
+    ollama_first_token_timeout: float = Field(default=120.0, gt=0, env="OLLAMA_FIRST_TOKEN_TIMEOUT")  # streamed: model load + prompt eval
+    ollama_total_timeout: float = Field(default=300.0, gt=0, env="OLLAMA_TOTAL_TIMEOUT")  # whole generation
+    ollama_retries: int = Field(default=2, ge=0, env="OLLAMA_RETRIES")  # retries for idempotent calls (list/show/embeddings)
+    ollama_retry_backoff: float = Field(default=0.25, ge=0, env="OLLAMA_RETRY_BACKOFF")  # base delay, doubled per retry with jitter
+    ollama_connect_retries: int = Field(default=1, ge=0, env="OLLAMA_CONNECT_RETRIES")  # transport-level retries of failed connects
     default_model: str = Field(default="llama3.2:3b", env="DEFAULT_MODEL")
+    ollama_keep_alive: Union[int, float, str] = Field(default="30m", env="OLLAMA_KEEP_ALIVE")  # duration ("30m") or seconds; negative = forever, 0 = unload
+    
+    @field_validator('ollama_keep_alive', mode='before')
+    @classmethod
+    def parse_keep_alive(cls, v):
+        """Turn bare numbers into seconds; Ollama rejects them as duration strings."""
+        if isinstance(v, (int, float)):
+            return v
+        v = str(v).strip()
+        try:
+            return int(v)
+        except ValueError:
+            pass
+        try:
+            return float(v)
+        except ValueError:
+            pass
+        if not KEEP_ALIVE_DURATION.match(v):
+            raise ValueError(f'OLLAMA_KEEP_ALIVE must be a duration like "30m" or a number of seconds, got "{v}"')
+        return v
+    # llama.cpp provider (in-process GGUF; uses CPU_THREADS and GPU_LAYERS)
+    llamacpp_model_path: str = Field(default="", env="LLAMACPP_MODEL_PATH")
+    llamacpp_n_ctx: int = Field(default=0, ge=0, env="LLAMACPP_N_CTX")  # 0 = CONTEXT_LENGTH
+    llamacpp_n_batch: int = Field(default=512, ge=1, env="LLAMACPP_N_BATCH")  # prompt tokens evaluated per batch
+    llamacpp_max_sessions: int = Field(default=4, ge=0, env="LLAMACPP_MAX_SESSIONS")  # KV snapshots of conversations switched out of the context
+    llamacpp_session_cache_mb: int = Field(default=1024, ge=0, env="LLAMACPP_SESSION_CACHE_MB")  # memory cap for those snapshots
+    # Per-turn context placement: stable_prefix (after history, keeps the persona prefix cacheable) or inline
+    prompt_layout: str = Field(default="stable_prefix", env="PROMPT_LAYOUT")
+    
+    # Generation scheduler (admission control in front of the LLM)
+    llm_slots: int = Field(default=1, ge=1, env="LLM_SLOTS")  # concurrent generations; match OLLAMA_NUM_PARALLEL
+    llm_max_queue: int = Field(default=16, ge=0, env="LLM_MAX_QUEUE")  # waiting requests before 503
+    llm_max_queue_per_user: int = Field(default=2, ge=1, env="LLM_MAX_QUEUE_PER_USER")  # in-flight requests per user before 429
+    llm_queue_timeout: float = Field(default=60.0, gt=0, env="LLM_QUEUE_TIMEOUT")  # max seconds waiting for a slot
     
     # Resource Allocation
     cpu_threads: int = Field(default=4, env="CPU_THREADS")
     gpu_layers: int = Field(default=0, env="GPU_LAYERS")  # 0=CPU, -1=all GPU, N=first N layers
     context_length: int = Field(default=4096, env="CONTEXT_LENGTH")
     max_tokens: int = Field(default=512, env="MAX_TOKENS")
+    context_reserve_tokens: int = Field(default=64, ge=0, env="CONTEXT_RESERVE_TOKENS")  # safety margin for chat template tokens
+    context_safety_margin: float = Field(default=0.1, ge=0.0, lt=1.0, env="CONTEXT_SAFETY_MARGIN")  # share of CONTEXT_LENGTH kept free for estimation error
+    token_chars_per_token: float = Field(default=3.5, gt=0, env="TOKEN_CHARS_PER_TOKEN")  # token estimate ratio
     temperature: float = Field(default=0.7, ge=0.0, le=2.0)
     
     # Sampling Parameters
@@ -63,6 +120,23 @@ class Settings(BaseSettings):
         env="EMBEDDING_MODEL"
     )
     collection_prefix: str = Field(default="echominds_", env="COLLECTION_PREFIX")
+    collection_cache_size: int = Field(default=256, ge=1, env="COLLECTION_CACHE_SIZE")  # open collection handles
+    vector_storage_mode: str = Field(default="per_pair", env="VECTOR_STORAGE_MODE")  # per_pair or shared
+    vector_shard_count: int = Field(default=1, ge=1, env="VECTOR_SHARD_COUNT")  # collections in shared mode
+    embedding_batch_size: int = Field(default=32, ge=1, env="EMBEDDING_BATCH_SIZE")
+    embedding_max_wait_ms: float = Field(default=5.0, ge=0, env="EMBEDDING_MAX_WAIT_MS")  # wait to fill a batch
+    embedding_queue_size: int = Field(default=1024, ge=1, env="EMBEDDING_QUEUE_SIZE")
+    embedding_cache_size: int = Field(default=10000, ge=0, env="EMBEDDING_CACHE_SIZE")  # entries in memory
+    embedding_cache_max_mb: int = Field(default=64, ge=0, env="EMBEDDING_CACHE_MAX_MB")
+    embedding_cache_path: Optional[Path] = Field(default=None, env="EMBEDDING_CACHE_PATH")  # None = memory only
+    embedding_cache_disk_capacity: int = Field(default=100000, ge=1, env="EMBEDDING_CACHE_DISK_CAPACITY")
+    
+    # Chat Pipeline
+    context_stage_timeout: float = Field(default=3.0, gt=0, env="CONTEXT_STAGE_TIMEOUT")  # seconds per context lookup
+    write_behind_enabled: bool = Field(default=True, env="WRITE_BEHIND_ENABLED")  # index turns after responding
+    write_buffer_max_pending: int = Field(default=64, ge=1, env="WRITE_BUFFER_MAX_PENDING")  # messages before flush
+    write_buffer_flush_interval: float = Field(default=2.0, gt=0, env="WRITE_BUFFER_FLUSH_INTERVAL")  # seconds
+    write_buffer_max_attempts: int = Field(default=5, ge=1, env="WRITE_BUFFER_MAX_ATTEMPTS")  # failed flushes before a conversation's messages are dropped
     
     # Storage Paths
     character_data_path: Path = Field(
@@ -73,6 +147,31 @@ class Settings(BaseSettings):
         default=Path("../data/conversations"),
         env="CONVERSATION_DATA_PATH"
     )
+    memory_cache_size: int = Field(default=512, ge=1, env="MEMORY_CACHE_SIZE")  # character-user pairs cached
+    history_messages: int = Field(default=6, ge=0, env="HISTORY_MESSAGES")  # recent messages sent verbatim
+    
+    # Background LLM jobs (summaries, memory extraction) wait for chat to be idle
+    background_idle_seconds: float = Field(default=2.0, gt=0, env="BACKGROUND_IDLE_SECONDS")  # re-check interval while chat is busy
+    
+    # Rolling conversation summary (older turns compressed by a background worker)
+    summary_enabled: bool = Field(default=True, env="SUMMARY_ENABLED")
+    summary_trigger_messages: int = Field(default=8, ge=1, env="SUMMARY_TRIGGER_MESSAGES")  # aged-out messages before summarizing
+    summary_max_tokens: int = Field(default=256, ge=32, env="SUMMARY_MAX_TOKENS")
+    
+    # Automatic memory extraction (background worker, yields to chat)
+    memory_extraction_enabled: bool = Field(default=True, env="MEMORY_EXTRACTION_ENABLED")
+    memory_extraction_interval: int = Field(default=6, ge=2, env="MEMORY_EXTRACTION_INTERVAL")  # new messages per extraction pass
+    memory_dedup_threshold: float = Field(default=0.88, ge=0.0, le=1.0, env="MEMORY_DEDUP_THRESHOLD")  # cosine similarity
+    
+    # Long-term memory ranking (score = weighted similarity + importance + recency)
+    memory_similarity_weight: float = Field(default=0.6, ge=0.0, env="MEMORY_SIMILARITY_WEIGHT")
+    memory_importance_weight: float = Field(default=0.3, ge=0.0, env="MEMORY_IMPORTANCE_WEIGHT")
+    memory_recency_weight: float = Field(default=0.1, ge=0.0, env="MEMORY_RECENCY_WEIGHT")
+    memory_recency_half_life_days: float = Field(default=30.0, gt=0, env="MEMORY_RECENCY_HALF_LIFE_DAYS")
+    
+    # Resource monitoring (background sampler behind /status)
+    status_sample_interval: float = Field(default=5.0, gt=0, env="STATUS_SAMPLE_INTERVAL")  # seconds between samples
+    status_history_size: int = Field(default=720, ge=1, env="STATUS_HISTORY_SIZE")  # samples kept (720 x 5s = 1 hour)
     
     # Logging
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
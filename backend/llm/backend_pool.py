@@ -0,0 +1,239 @@
+"""
+LLM Backend Pool
+Routing generations across beberapa Ollama hosts
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, TypeVar
+
+import httpx
+import ollama
+
+from config.settings import settings
+from llm.transport import build_client, retry_idempotent
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses that mean the host (not the request) is in trouble
+_HOST_ERROR_STATUSES = {502, 503, 504}
+
+
+def is_host_failure(error: BaseException) -> bool:
+    """True if an error says the host is unreachable or overloaded, so another host may succeed"""
+    if isinstance(error, (httpx.TransportError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code in _HOST_ERROR_STATUSES
+    return False
+
+
+class NoBackendAvailable(RuntimeError):
+    """Every host is ejected or already failed for this request"""
+
+
+class Backend:
+    """One Ollama host and its routing state."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.client, self.transport = build_client(url)
+        self.outstanding = 0  # requests currently routed here
+        self.served = 0
+        self.failures = 0  # consecutive failures
+        self.timeouts = 0
+        self.retries = 0
+        self.retry_at = 0.0  # monotonic time the host may be tried again
+        self.last_used = 0.0
+        self.last_error: Optional[str] = None
+        self.loaded_models: Set[str] = set()  # from /api/ps
+        self.available_models: Set[str] = set()  # from /api/tags
+
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.retry_at
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": not self.ejected,
+            "outstanding": self.outstanding,
+            "served": self.served,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "retryIn": round(max(self.retry_at - time.monotonic(), 0.0), 1),
+            "loadedModels": sorted(self.loaded_models),
+            "lastError": self.last_error,
+            "http": self.transport.stats()
+        }
+
+
+class BackendPool:
+    """Least-outstanding-requests routing over several Ollama hosts.
+
+    A request goes to a host that is not ejected, preferring hosts that
+    already have the model loaded (``/api/ps``), then hosts that have it
+    pulled (``/api/tags``), then any host; within a tier the host with the
+    fewest requests in flight wins (least recently used on ties).
+
+    A host that fails a request or a probe is ejected for ``eject_seconds``,
+    doubling per consecutive failure up to ``max_eject_seconds``. The
+    probe loop re-checks ejected hosts once their backoff expires and puts
+    them back on the first successful probe. If every host is ejected the
+    one due soonest is still tried, so a single-host setup keeps working.
+    """
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        probe_interval: float,
+        eject_seconds: float,
+        max_eject_seconds: float,
+        probe_timeout: float
+    ):
+        self.backends = [Backend(url) for url in dict.fromkeys(urls)]
+        if not self.backends:
+            raise ValueError("Backend pool needs at least one host")
+        self.probe_interval = probe_interval
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.probe_timeout = probe_timeout
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start periodic health probing (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._probe_loop(), name="llm-backend-probe")
+
+    async def stop(self) -> None:
+        """Stop health probing"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _probe_loop(self) -> None:
+        while True:
+            due = [b for b in self.backends if not b.ejected]
+            if due:
+                await asyncio.gather(*(self.probe(b) for b in due))
+            await asyncio.sleep(self.probe_interval)
+
+    async def probe(self, backend: Backend) -> bool:
+        """Refresh a host's model lists; ejects it on failure"""
+        try:
+            running, pulled = await asyncio.wait_for(
+                asyncio.gather(backend.client.ps(), backend.client.list()),
+                timeout=self.probe_timeout
+            )
+        except Exception as e:
+            self.mark_failure(backend, e)
+            return False
+        backend.loaded_models = {m.model for m in running.models}
+        backend.available_models = {m.model for m in pulled.models}
+        self.mark_success(backend)
+        return True
+
+    async def probe_all(self) -> List[Backend]:
+        """Probe every host now (ejected ones included); returns the healthy ones"""
+        results = await asyncio.gather(*(self.probe(b) for b in self.backends))
+        return [b for b, ok in zip(self.backends, results) if ok]
+
+    def mark_success(self, backend: Backend) -> None:
+        if backend.failures:
+            logger.info(f"LLM backend {backend.url} is back")
+        backend.failures = 0
+        backend.retry_at = 0.0
+        backend.last_error = None
+
+    def mark_failure(self, backend: Backend, error: BaseException) -> None:
+        backend.failures += 1
+        if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+            backend.timeouts += 1
+        backoff = min(self.eject_seconds * 2 ** (backend.failures - 1), self.max_eject_seconds)
+        backend.retry_at = time.monotonic() + backoff
+        backend.last_error = str(error) or type(error).__name__
+        logger.warning(f"Ejecting LLM backend {backend.url} for {backoff:.0f}s: {backend.last_error}")
+
+    def choose(self, model: Optional[str] = None, exclude: Iterable[Backend] = ()) -> Backend:
+        """Pick the host for a request (see class docstring)"""
+        excluded = set(map(id, exclude))
+        candidates = [b for b in self.backends if id(b) not in excluded]
+        if not candidates:
+            raise NoBackendAvailable("All LLM backends failed for this request")
+
+        healthy = [b for b in candidates if not b.ejected]
+        if not healthy:
+            return min(candidates, key=lambda b: b.retry_at)
+
+        def rank(backend: Backend):
+            if model in backend.loaded_models:
+                tier = 0
+            elif model in backend.available_models:
+                tier = 1
+            else:
+                tier = 2
+            return tier, backend.outstanding, backend.last_used
+
+        return min(healthy, key=rank)
+
+    @asynccontextmanager
+    async def use(self, model: Optional[str] = None, exclude: Iterable[Backend] = ()) -> AsyncIterator[Backend]:
+        """Route one request: pick a host and track it while the request runs.
+
+        Host failures raised inside the block eject the host before being
+        re-raised; the caller decides whether to retry elsewhere.
+        """
+        backend = self.choose(model, exclude)
+        backend.outstanding += 1
+        backend.last_used = time.monotonic()
+        try:
+            yield backend
+        except Exception as e:
+            if is_host_failure(e):
+                self.mark_failure(backend, e)
+            raise
+        else:
+            backend.served += 1
+            if model:
+                backend.loaded_models.add(model)
+            if backend.failures:
+                self.mark_success(backend)
+        finally:
+            backend.outstanding -= 1
+
+    async def call(self, model: Optional[str], request: Callable[[Backend], Awaitable[T]]) -> T:
+        """Run an idempotent request (list, show, embeddings) with retries.
+
+        Each retry goes to a host not tried yet while there is one, after a
+        jittered backoff.
+        """
+        tried: List[Backend] = []
+
+        async def attempt() -> T:
+            exclude = tried if len(tried) < len(self.backends) else ()
+            async with self.use(model, exclude=exclude) as backend:
+                tried.append(backend)
+                return await request(backend)
+
+        def count_retry(error: BaseException) -> None:
+            tried[-1].retries += 1
+
+        return await retry_idempotent(attempt, is_host_failure, on_retry=count_retry)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-host routing state"""
+        return [b.stats() for b in self.backends]
+
+
+def configured_hosts() -> List[str]:
+    """Hosts from OLLAMA_HOSTS (comma-separated), falling back to OLLAMA_BASE_URL"""
+    hosts = [h.strip().rstrip("/") for h in settings.ollama_hosts.split(",") if h.strip()]
+    return hosts or [settings.ollama_base_url]
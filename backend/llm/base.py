@@ -0,0 +1,159 @@
+"""
+LLM Provider Interface
+Common interface untuk Ollama dan llama.cpp services
+"""
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from config.settings import settings
+
+
+def _rate(tokens: Optional[int], seconds: Optional[float]) -> Optional[float]:
+    if not tokens or not seconds:
+        return None
+    return tokens / seconds
+
+
+@dataclass
+class GenerationResult:
+    """A generated reply with the provider's token accounting.
+
+    Counts and durations are None when the provider didn't report them.
+    ``prompt_tokens`` are the prompt tokens actually evaluated, so a
+    reused KV-cache prefix makes it smaller than the full prompt.
+    """
+    text: str = ""
+    model: str = ""
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    prompt_eval_seconds: Optional[float] = None
+    eval_seconds: Optional[float] = None
+    load_seconds: Optional[float] = None
+    total_seconds: Optional[float] = None
+
+    @property
+    def prompt_tokens_per_second(self) -> Optional[float]:
+        return _rate(self.prompt_tokens, self.prompt_eval_seconds)
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        return _rate(self.completion_tokens, self.eval_seconds)
+
+    @property
+    def first_token_seconds(self) -> Optional[float]:
+        """Model load plus prompt evaluation, i.e. the time before the first token"""
+        if self.prompt_eval_seconds is None:
+            return None
+        return (self.load_seconds or 0.0) + self.prompt_eval_seconds
+
+    def usage(self) -> Dict[str, Any]:
+        """Token stats for response metadata"""
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return round(value, 3) if value is not None else None
+
+        return {
+            "promptTokens": self.prompt_tokens,
+            "completionTokens": self.completion_tokens,
+            "promptEvalSeconds": rounded(self.prompt_eval_seconds),
+            "evalSeconds": rounded(self.eval_seconds),
+            "loadSeconds": rounded(self.load_seconds),
+            "promptTokensPerSecond": rounded(self.prompt_tokens_per_second),
+            "tokensPerSecond": rounded(self.tokens_per_second)
+        }
+
+
+class BaseLLMService(ABC):
+    """Interface every LLM provider implements.
+
+    ``session_id`` identifies a conversation (character/user pair) so a
+    provider can keep per-conversation state between turns; providers
+    without such state ignore it.
+    """
+
+    def __init__(self):
+        self.current_model = settings.default_model
+        self.active_requests = 0  # generations in flight (background work waits for 0)
+
+    def start(self) -> None:
+        """Start provider background work (called from the app lifespan)"""
+
+    async def stop(self) -> None:
+        """Stop background work and release resources"""
+
+    async def wait_idle(self, poll_interval: float) -> None:
+        """Wait until no generation is in flight (background jobs yield to chat)"""
+        while self.active_requests:
+            await asyncio.sleep(poll_interval)
+
+    def _build_messages(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> List[Dict[str, str]]:
+        """Build chat message list"""
+        messages = []
+
+        if system_prompt:
+            messages.append({
+                "role": "system",
+                "content": system_prompt
+            })
+
+        if conversation_history:
+            messages.extend(conversation_history)
+
+        messages.append({
+            "role": "user",
+            "content": prompt
+        })
+
+        return messages
+
+    @abstractmethod
+    async def check_health(self) -> Dict[str, Any]:
+        """Provider health: ``status``, ``available_models``, ``current_model``"""
+
+    @abstractmethod
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        stream: bool = False,
+        session_id: Optional[str] = None
+    ) -> GenerationResult:
+        """Generate a complete response with its token stats"""
+
+    @abstractmethod
+    def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        session_id: Optional[str] = None,
+        result: Optional[GenerationResult] = None
+    ) -> AsyncIterator[str]:
+        """Stream response tokens as they are generated.
+
+        If ``result`` is given, the reply text and token stats are
+        recorded in it as the stream finishes.
+        """
+
+    @abstractmethod
+    async def pull_model(self, model_name: str) -> Dict[str, Any]:
+        """Download a model"""
+
+    @abstractmethod
+    async def switch_model(self, model_name: str) -> Dict[str, Any]:
+        """Switch the model used for generation"""
+
+    @abstractmethod
+    async def get_model_info(self) -> Dict[str, Any]:
+        """Current model information"""
@@ -0,0 +1,140 @@
+"""
+LLM Health Monitor
+Cached LLM health dan model listings, refreshed di background
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from config.settings import settings
+from llm.base import BaseLLMService
+from llm.provider import llm_service
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Serves the LLM health check from a snapshot instead of per request.
+
+    A background task calls ``check_health`` (liveness and model list)
+    every ``interval`` seconds. Readers get the latest snapshot plus
+    ``checked_at`` (unix time) and ``age_seconds`` so they can tell how
+    stale it is. ``refresh`` updates it right away, e.g. after a model
+    switch.
+
+    Model switches also run here, in the background, because pulling a
+    model that isn't on the host can take minutes. Their progress is
+    reported under ``model_switch`` in the snapshot.
+    """
+
+    def __init__(self, service: BaseLLMService, interval: float):
+        self.service = service
+        self.interval = interval
+        self._health: Dict[str, Any] = {"status": "unknown", "available_models": []}
+        self._checked_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._switch: Optional[Dict[str, Any]] = None
+        self._switch_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start periodic refreshes (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="llm-health-monitor")
+
+    async def stop(self) -> None:
+        """Stop periodic refreshes and any running model switch"""
+        for task in (self._task, self._switch_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._switch_task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Check the LLM now and store the result"""
+        async with self._lock:
+            try:
+                health = await self.service.check_health()
+            except Exception as e:
+                logger.error(f"LLM health refresh failed: {e}")
+                health = {"status": "unhealthy", "error": str(e)}
+            self._health = health
+            self._checked_at = time.time()
+        return self.snapshot()
+
+    def switch_model(self, model_name: str) -> Dict[str, Any]:
+        """Start switching the LLM to ``model_name`` (pulled first if missing).
+
+        Returns:
+            The switch status (``switching``, then ``ready`` or ``failed``)
+
+        Raises:
+            RuntimeError: If a switch to another model is still running
+        """
+        if self.switching:
+            if self._switch["model"] == model_name:
+                return self.model_switch
+            raise RuntimeError(f"Switch to model '{self._switch['model']}' is still in progress")
+
+        self._switch = {
+            "model": model_name,
+            "status": "switching",
+            "error": None,
+            "started_at": time.time(),
+            "finished_at": None
+        }
+        self._switch_task = asyncio.create_task(self._run_switch(model_name), name="llm-model-switch")
+        return self.model_switch
+
+    async def _run_switch(self, model_name: str) -> None:
+        try:
+            await self.service.switch_model(model_name)
+            settings.default_model = model_name
+            self._switch["status"] = "ready"
+        except Exception as e:
+            logger.error(f"Model switch to {model_name} failed: {e}")
+            self._switch.update(status="failed", error=str(e))
+        finally:
+            self._switch["finished_at"] = time.time()
+        await self.refresh()
+
+    @property
+    def switching(self) -> bool:
+        """Whether a model switch is running"""
+        return self._switch_task is not None and not self._switch_task.done()
+
+    @property
+    def model_switch(self) -> Optional[Dict[str, Any]]:
+        """Status of the running or most recent model switch"""
+        return dict(self._switch) if self._switch is not None else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Latest health without touching the LLM"""
+        age = round(time.time() - self._checked_at, 3) if self._checked_at else None
+        return {
+            **self._health,
+            "current_model": self.service.current_model,
+            "checked_at": self._checked_at,
+            "age_seconds": age,
+            "model_switch": self.model_switch
+        }
+
+    async def get(self) -> Dict[str, Any]:
+        """Latest health; checks once if nothing was cached yet"""
+        if self._checked_at is None:
+            return await self.refresh()
+        return self.snapshot()
+
+
+# Global health monitor instance
+health_monitor = HealthMonitor(llm_service, settings.llm_health_interval)
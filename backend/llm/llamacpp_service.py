@@ -0,0 +1,332 @@
+"""
+llama.cpp LLM Service
+In-process GGUF inference via llama-cpp-python (optional dependency)
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from config.settings import settings
+from llm.base import BaseLLMService, GenerationResult
+
+logger = logging.getLogger(__name__)
+
+
+def _shared_prefix(a, b) -> int:
+    """Length of the common prefix of two token sequences"""
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class LlamaCppService(BaseLLMService):
+    """Runs a GGUF model in the backend process.
+
+    The model is loaded once (at startup, or lazily on first use) with
+    ``n_threads`` = ``cpu_threads`` and ``n_gpu_layers`` = ``gpu_layers``.
+    A llama context serves one generation at a time, so generations are
+    serialized and run in a worker thread.
+
+    The conversation (``session_id``) that used the context last stays
+    live in it. Only when another conversation takes over is its state
+    (KV cache and evaluated tokens) snapshotted, keeping the most recent
+    ``llamacpp_max_sessions`` snapshots within ``llamacpp_session_cache_mb``.
+    When a snapshotted conversation's next turn comes in, its state is
+    restored first, and llama.cpp only evaluates the tokens after the
+    longest prefix shared with the previous turn.
+
+    Token stats are measured around the completion: streamed chunks are
+    counted as generated tokens (one chunk per token), the prompt tokens
+    evaluated are the new context tokens after that shared prefix, and
+    prompt evaluation time is the time to the first chunk.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.model_path = Path(settings.llamacpp_model_path) if settings.llamacpp_model_path else None
+        if self.model_path is not None:
+            self.current_model = self.model_path.name
+        self._llm = None
+        self._lock = asyncio.Lock()
+        self._sessions: "OrderedDict[str, Any]" = OrderedDict()  # snapshots of conversations not in the context
+        self._sessions_bytes = 0
+        self._loaded_session: Optional[str] = None
+        self._warmup: Optional[asyncio.Task] = None
+        self.session_hits = 0
+        self.session_misses = 0
+
+    def start(self) -> None:
+        """Load the model in the background so the first turn doesn't pay for it"""
+        if self._warmup is None or self._warmup.done():
+            self._warmup = asyncio.create_task(self._warm(), name="llamacpp-load")
+
+    async def _warm(self) -> None:
+        try:
+            async with self._lock:
+                await asyncio.to_thread(self._ensure_loaded)
+        except Exception as e:
+            logger.error(f"llama.cpp model load failed: {e}")
+
+    async def stop(self) -> None:
+        """Wait for a pending load, then free the model and session states"""
+        if self._warmup is not None:
+            await self._warmup
+            self._warmup = None
+        async with self._lock:
+            self._unload()
+
+    def _ensure_loaded(self):
+        """Load the model if needed (call from a worker thread, holding the lock)"""
+        if self._llm is not None:
+            return self._llm
+
+        try:
+            from llama_cpp import Llama
+        except ImportError as e:
+            raise RuntimeError(
+                "LLM_PROVIDER=llamacpp needs llama-cpp-python: pip install llama-cpp-python"
+            ) from e
+
+        if self.model_path is None or not self.model_path.is_file():
+            raise RuntimeError(f"GGUF model not found: {self.model_path or 'LLAMACPP_MODEL_PATH is not set'}")
+
+        logger.info(f"Loading GGUF model {self.model_path} ({settings.cpu_threads} threads)")
+        self._llm = Llama(
+            model_path=str(self.model_path),
+            n_ctx=settings.llamacpp_n_ctx or settings.context_length,
+            n_batch=settings.llamacpp_n_batch,
+            n_threads=settings.cpu_threads,
+            n_threads_batch=settings.cpu_threads,
+            n_gpu_layers=settings.gpu_layers,
+            verbose=False
+        )
+        return self._llm
+
+    def _unload(self) -> None:
+        self._sessions.clear()
+        self._sessions_bytes = 0
+        self._loaded_session = None
+        if self._llm is not None:
+            self._llm.close()
+            self._llm = None
+
+    def _switch_session(self, llm, session_id: Optional[str]) -> None:
+        """Make ``session_id`` the conversation in the context.
+
+        The conversation being switched away from is snapshotted first;
+        the incoming one is restored from its snapshot if there is one.
+        """
+        if session_id == self._loaded_session:
+            if session_id is not None:
+                self.session_hits += 1
+            return
+
+        if self._loaded_session is not None:
+            self._store_snapshot(self._loaded_session, llm.save_state())
+        self._loaded_session = session_id
+        if session_id is None:
+            return
+
+        state = self._sessions.pop(session_id, None)
+        if state is None:
+            self.session_misses += 1
+            return
+        self._sessions_bytes -= self._state_size(state)
+        llm.load_state(state)
+        self.session_hits += 1
+
+    @staticmethod
+    def _state_size(state) -> int:
+        return getattr(state, "llama_state_size", 0)
+
+    def _store_snapshot(self, session_id: str, state) -> None:
+        """Keep a snapshot, evicting the oldest beyond the count and memory caps"""
+        limit = settings.llamacpp_session_cache_mb * 1024 * 1024
+        if settings.llamacpp_max_sessions == 0 or self._state_size(state) > limit:
+            return
+        self._sessions[session_id] = state
+        self._sessions_bytes += self._state_size(state)
+        while len(self._sessions) > settings.llamacpp_max_sessions or self._sessions_bytes > limit:
+            _, evicted = self._sessions.popitem(last=False)
+            self._sessions_bytes -= self._state_size(evicted)
+
+    def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        session_id: Optional[str],
+        result: GenerationResult,
+        on_token: Optional[Callable[[str], None]] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> None:
+        """Run one chat completion into ``result`` (worker thread, holding the lock)"""
+        llm = self._ensure_loaded()
+        self._switch_session(llm, session_id)
+        previous = llm.input_ids[:llm.n_tokens].tolist()
+
+        parts: List[str] = []
+        started = time.perf_counter()
+        first_token_at: Optional[float] = None
+        stream = llm.create_chat_completion(
+            messages=messages,
+            temperature=temperature or settings.temperature,
+            max_tokens=max_tokens or settings.max_tokens,
+            stream=True
+        )
+        try:
+            for chunk in stream:
+                if cancelled is not None and cancelled.is_set():
+                    break
+                content = chunk["choices"][0]["delta"].get("content")
+                if content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    parts.append(content)
+                    if on_token is not None:
+                        on_token(content)
+        finally:
+            stream.close()
+        finished = time.perf_counter()
+
+        prompt_tokens = max(llm.n_tokens - len(parts), 0)
+        evaluated = llm.input_ids[:prompt_tokens].tolist()
+        result.text = "".join(parts)
+        result.model = self.current_model
+        result.prompt_tokens = prompt_tokens - _shared_prefix(previous, evaluated)
+        result.completion_tokens = len(parts)
+        result.prompt_eval_seconds = (first_token_at or finished) - started
+        result.eval_seconds = finished - first_token_at if first_token_at is not None else None
+        result.total_seconds = finished - started
+
+    async def check_health(self) -> Dict[str, Any]:
+        """Check that the GGUF model is present (and whether it is loaded)"""
+        if self.model_path is None or not self.model_path.is_file():
+            error = f"GGUF model not found: {self.model_path or 'LLAMACPP_MODEL_PATH is not set'}"
+            logger.error(f"llama.cpp health check failed: {error}")
+            return {
+                "status": "unhealthy",
+                "error": error
+            }
+        return {
+            "status": "healthy",
+            "available_models": sorted(p.name for p in self.model_path.parent.glob("*.gguf")),
+            "current_model": self.current_model,
+            "loaded": self._llm is not None,
+            "sessions": len(self._sessions)
+        }
+
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        stream: bool = False,
+        session_id: Optional[str] = None
+    ) -> GenerationResult:
+        """Generate response in-process (``stream`` makes no difference here)"""
+        messages = self._build_messages(prompt, system_prompt, conversation_history)
+        result = GenerationResult()
+        self.active_requests += 1
+        try:
+            async with self._lock:
+                await asyncio.to_thread(self._complete, messages, temperature, max_tokens, session_id, result)
+            return result
+        except Exception as e:
+            logger.error(f"llama.cpp generate error: {e}")
+            raise RuntimeError(f"Failed to generate response: {str(e)}")
+        finally:
+            self.active_requests -= 1
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        session_id: Optional[str] = None,
+        result: Optional[GenerationResult] = None
+    ) -> AsyncIterator[str]:
+        """Stream response tokens from the worker thread as they are generated"""
+        messages = self._build_messages(prompt, system_prompt, conversation_history)
+        result = result if result is not None else GenerationResult()
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        self.active_requests += 1
+        try:
+            async with self._lock:
+                worker = asyncio.ensure_future(asyncio.to_thread(
+                    self._complete, messages, temperature, max_tokens, session_id, result,
+                    lambda token: loop.call_soon_threadsafe(tokens.put_nowait, token),
+                    cancelled
+                ))
+                worker.add_done_callback(lambda _: tokens.put_nowait(None))
+                try:
+                    while (token := await tokens.get()) is not None:
+                        yield token
+                    await worker
+                finally:
+                    # Client went away: stop generating, keep the lock until the thread is done
+                    cancelled.set()
+                    if not worker.done():
+                        await asyncio.wait([worker])
+
+        except Exception as e:
+            logger.error(f"llama.cpp stream error: {e}")
+            raise RuntimeError(f"Failed to generate response: {str(e)}")
+        finally:
+            self.active_requests -= 1
+
+    async def pull_model(self, model_name: str) -> Dict[str, Any]:
+        """Not available in-process; GGUF files are downloaded manually"""
+        raise RuntimeError("The llamacpp provider can't pull models; download the GGUF file into the model directory")
+
+    async def switch_model(self, model_name: str) -> Dict[str, Any]:
+        """Switch to another GGUF file in the model directory"""
+        if self.model_path is None:
+            raise RuntimeError("Failed to switch model: LLAMACPP_MODEL_PATH is not set")
+        name = model_name if model_name.endswith(".gguf") else f"{model_name}.gguf"
+        path = self.model_path.parent / name
+        if not path.is_file():
+            raise RuntimeError(f"Failed to switch model: {path} not found")
+
+        async with self._lock:
+            await asyncio.to_thread(self._unload)
+            self.model_path = path
+            self.current_model = path.name
+        self.start()
+        logger.info(f"Switched to model: {self.current_model}")
+
+        return {
+            "status": "success",
+            "current_model": self.current_model
+        }
+
+    async def get_model_info(self) -> Dict[str, Any]:
+        """Get current model information"""
+        return {
+            "name": self.current_model,
+            "details": {
+                "path": str(self.model_path) if self.model_path else None,
+                "loaded": self._llm is not None,
+                "n_ctx": self._llm.n_ctx() if self._llm is not None else None,
+                "n_threads": settings.cpu_threads,
+                "gpu_layers": settings.gpu_layers,
+                "sessions": len(self._sessions),
+                "session_cache_mb": round(self._sessions_bytes / (1024 * 1024), 1),
+                "session_hits": self.session_hits,
+                "session_misses": self.session_misses
+            }
+        }
@@ -3,37 +3,120 @@ Ollama LLM Service
 Handles communication dengan Ollama server
 """
 import asyncio
-import ollama
 from typing import List, Dict, Any, Optional, AsyncIterator
 import logging
 from config.settings import settings
+from llm.base import BaseLLMService, GenerationResult
+from llm.backend_pool import Backend, BackendPool, configured_hosts, is_host_failure
+from llm.transport import retry_idempotent
 from models.schemas import ChatRole
 
 logger = logging.getLogger(__name__)
 
+NS = 1e9  # Ollama reports durations in nanoseconds
 
-class OllamaService:
-    """Service untuk manage Ollama LLM interactions"""
+
+def _seconds(nanoseconds: Optional[int]) -> Optional[float]:
+    return nanoseconds / NS if nanoseconds is not None else None
+
+
+def _record_stats(result: GenerationResult, response: Any) -> None:
+    """Copy eval stats from a final (``done``) chat response into ``result``"""
+    result.prompt_tokens = response.get("prompt_eval_count")
+    result.completion_tokens = response.get("eval_count")
+    result.prompt_eval_seconds = _seconds(response.get("prompt_eval_duration"))
+    result.eval_seconds = _seconds(response.get("eval_duration"))
+    result.load_seconds = _seconds(response.get("load_duration"))
+    result.total_seconds = _seconds(response.get("total_duration"))
+
+
+class OllamaService(BaseLLMService):
+    """Service untuk manage Ollama LLM interactions
+    
+    ``session_id`` is accepted for interface compatibility; Ollama reuses
+    the KV cache of a matching prompt prefix on its own.
+    """
     
     def __init__(self):
-        self.client = ollama.AsyncClient(host=settings.ollama_base_url)
-        self.current_model = settings.default_model
+        super().__init__()
+        self.pool = BackendPool(
+            configured_hosts(),
+            probe_interval=settings.ollama_probe_interval,
+            eject_seconds=settings.ollama_eject_seconds,
+            max_eject_seconds=settings.ollama_max_eject_seconds,
+            probe_timeout=settings.ollama_connect_timeout
+        )
+    
+    def start(self) -> None:
+        """Start backend health probing"""
+        self.pool.start()
+    
+    async def stop(self) -> None:
+        """Stop backend health probing"""
+        await self.pool.stop()
         
     async def check_health(self) -> Dict[str, Any]:
-        """Check Ollama server health"""
-        try:
-            response = await self.client.list()
-            return {
-                "status": "healthy",
-                "available_models": [m.model for m in response.models],
-                "current_model": self.current_model
-            }
-        except Exception as e:
-            logger.error(f"Ollama health check failed: {e}")
+        """Check Ollama server health (healthy if any host answers)"""
+        healthy = await self.pool.probe_all()
+        if not healthy:
+            errors = "; ".join(f"{b.url}: {b.last_error}" for b in self.pool.backends)
+            logger.error(f"Ollama health check failed: {errors}")
             return {
                 "status": "unhealthy",
-                "error": str(e)
+                "error": errors,
+                "backends": self.pool.stats()
             }
+        
+        available = set().union(*(b.available_models for b in healthy))
+        return {
+            "status": "healthy",
+            "available_models": sorted(available),
+            "current_model": self.current_model,
+            "backends": self.pool.stats()
+        }
+    
+    def _build_options(
+        self,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Build generation options from settings"""
+        return {
+            "temperature": temperature or settings.temperature,
+            "num_predict": max_tokens or settings.max_tokens,
+            "num_ctx": settings.context_length,
+            "num_thread": settings.cpu_threads,
+            "num_gpu": settings.gpu_layers
+        }
+    
+    def _can_retry(self, error: Exception, tried: List[Backend]) -> bool:
+        """A host failure can be retried while some host hasn't been tried yet"""
+        if is_host_failure(error) and len(tried) < len(self.pool.backends):
+            logger.warning(f"LLM backend {tried[-1].url} failed ({error or type(error).__name__}); retrying on another host")
+            return True
+        return False
+    
+    async def _with_deadlines(self, chunks: AsyncIterator[Any], started) -> AsyncIterator[Any]:
+        """Enforce the first-token and total timeouts on a streamed response.
+        
+        ``started`` reports whether a token has gone out yet; a stalled
+        stream raises asyncio.TimeoutError (a host failure).
+        """
+        loop = asyncio.get_running_loop()
+        first_token_at = loop.time() + settings.ollama_first_token_timeout
+        finish_by = loop.time() + settings.ollama_total_timeout
+        iterator = chunks.__aiter__()
+        try:
+            while True:
+                deadline = finish_by if started() else min(first_token_at, finish_by)
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            # Hand the connection back even if the consumer stopped early
+            await iterator.aclose()
     
     async def generate(
         self,
@@ -42,73 +125,132 @@ class OllamaService:
         conversation_history: Optional[List[Dict[str, str]]] = None,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
-        stream: bool = False
-    ) -> str:
+        stream: bool = False,
+        session_id: Optional[str] = None
+    ) -> GenerationResult:
         """Generate response from Ollama"""
+        if stream:
+            # Collect streamed tokens into a single result
+            result = GenerationResult(model=self.current_model)
+            async for _ in self.generate_stream(
+                prompt=prompt,
+                system_prompt=system_prompt,
+                conversation_history=conversation_history,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                session_id=session_id,
+                result=result
+            ):
+                pass
+            return result
+        
+        self.active_requests += 1
+        tried: List[Backend] = []
         try:
-            # Build messages
-            messages = []
-            
-            if system_prompt:
-                messages.append({
-                    "role": "system",
-                    "content": system_prompt
-                })
-            
-            if conversation_history:
-                messages.extend(conversation_history)
-            
-            messages.append({
-                "role": "user",
-                "content": prompt
-            })
-            
-            # Generate response
-            response = await self.client.chat(
-                model=self.current_model,
-                messages=messages,
-                options={
-                    "temperature": temperature or settings.temperature,
-                    "num_predict": max_tokens or settings.max_tokens,
-                    "num_ctx": settings.context_length,
-                    "num_thread": settings.cpu_threads,
-                    "num_gpu": settings.gpu_layers
-                },
-                stream=stream
-            )
-            
-            if stream:
-                # Handle streaming response
-                full_response = ""
-                async for chunk in response:
-                    if "message" in chunk and "content" in chunk["message"]:
-                        full_response += chunk["message"]["content"]
-                return full_response
-            else:
-                return response["message"]["content"]
+            while True:
+                try:
+                    model = self.current_model
+                    async with self.pool.use(model, exclude=tried) as backend:
+                        tried.append(backend)
+                        response = await backend.client.chat(
+                            model=model,
+                            messages=self._build_messages(prompt, system_prompt, conversation_history),
+                            options=self._build_options(temperature, max_tokens),
+                            keep_alive=settings.ollama_keep_alive,
+                            stream=False
+                        )
+                    result = GenerationResult(text=response["message"]["content"], model=model)
+                    _record_stats(result, response)
+                    return result
+                except Exception as e:
+                    if not self._can_retry(e, tried):
+                        raise
                 
         except Exception as e:
             logger.error(f"Ollama generate error: {e}")
             raise RuntimeError(f"Failed to generate response: {str(e)}")
+        finally:
+            self.active_requests -= 1
+    
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        session_id: Optional[str] = None,
+        result: Optional[GenerationResult] = None
+    ) -> AsyncIterator[str]:
+        """Stream response tokens from Ollama as they are generated
+        
+        The final chunk carries the eval stats, recorded in ``result``.
+        """
+        self.active_requests += 1
+        tried: List[Backend] = []
+        try:
+            while True:
+                started = False
+                try:
+                    model = self.current_model
+                    async with self.pool.use(model, exclude=tried) as backend:
+                        tried.append(backend)
+                        response = await backend.client.chat(
+                            model=model,
+                            messages=self._build_messages(prompt, system_prompt, conversation_history),
+                            options=self._build_options(temperature, max_tokens),
+                            keep_alive=settings.ollama_keep_alive,
+                            stream=True
+                        )
+                        
+                        chunks = self._with_deadlines(response, lambda: started)
+                        try:
+                            async for chunk in chunks:
+                                content = chunk["message"]["content"] if chunk.get("message") else None
+                                if content:
+                                    started = True
+                                    if result is not None:
+                                        result.text += content
+                                    yield content
+                                if chunk.get("done") and result is not None:
+                                    result.model = model
+                                    _record_stats(result, chunk)
+                        finally:
+                            await chunks.aclose()
+                    return
+                except Exception as e:
+                    # Once tokens went out the reply can't be restarted elsewhere
+                    if started or not self._can_retry(e, tried):
+                        raise
+                    
+        except Exception as e:
+            logger.error(f"Ollama stream error: {e}")
+            raise RuntimeError(f"Failed to generate response: {str(e)}")
+        finally:
+            self.active_requests -= 1
     
     async def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for text"""
         try:
-            response = await self.client.embeddings(
-                model=self.current_model,
-                prompt=text
+            response = await self.pool.call(
+                self.current_model,
+                lambda backend: backend.client.embeddings(model=self.current_model, prompt=text)
             )
             return response["embedding"]
         except Exception as e:
             logger.error(f"Embedding generation error: {e}")
             raise RuntimeError(f"Failed to generate embedding: {str(e)}")
     
-    async def pull_model(self, model_name: str) -> Dict[str, Any]:
-        """Pull/download a model"""
+    async def pull_model(self, model_name: str, backends: Optional[List[Backend]] = None) -> Dict[str, Any]:
+        """Pull/download a model on every reachable host (or the given ones)"""
+        targets = backends or [b for b in self.pool.backends if not b.ejected] or self.pool.backends
         try:
-            logger.info(f"Pulling model: {model_name}")
-            response = await self.client.pull(model_name)
-            return {"status": "success", "model": model_name, "details": response}
+            logger.info(f"Pulling model: {model_name} on {', '.join(b.url for b in targets)}")
+            responses = await asyncio.gather(*(b.client.pull(model_name) for b in targets))
+            for backend in targets:
+                backend.available_models.add(model_name)
+            details = responses[0] if len(targets) == 1 else {b.url: r for b, r in zip(targets, responses)}
+            return {"status": "success", "model": model_name, "details": details}
         except Exception as e:
             logger.error(f"Model pull error: {e}")
             raise RuntimeError(f"Failed to pull model: {str(e)}")
@@ -116,13 +258,22 @@ class OllamaService:
     async def switch_model(self, model_name: str) -> Dict[str, Any]:
         """Switch to different model"""
         try:
-            # Check if model exists
-            response = await self.client.list()
-            available = [m.model for m in response.models]
+            # Check which hosts already have the model; the probed listing
+            # is trusted when it has the model, re-listed when it doesn't
+            targets = [b for b in self.pool.backends if not b.ejected] or self.pool.backends
+            unknown = [b for b in targets if model_name not in b.available_models]
+            listings = await asyncio.gather(*(
+                retry_idempotent(b.client.list, is_host_failure) for b in unknown
+            ))
+            missing = []
+            for backend, response in zip(unknown, listings):
+                backend.available_models = {m.model for m in response.models}
+                if model_name not in backend.available_models:
+                    missing.append(backend)
             
-            if model_name not in available:
-                # Try to pull model
-                await self.pull_model(model_name)
+            if missing:
+                # Try to pull model where it is missing
+                await self.pull_model(model_name, missing)
             
             self.current_model = model_name
             logger.info(f"Switched to model: {model_name}")
@@ -138,7 +289,10 @@ class OllamaService:
     async def get_model_info(self) -> Dict[str, Any]:
         """Get current model information"""
         try:
-            info = await self.client.show(self.current_model)
+            info = await self.pool.call(
+                self.current_model,
+                lambda backend: backend.client.show(self.current_model)
+            )
             return {
                 "name": self.current_model,
                 "details": info
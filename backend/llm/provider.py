@@ -0,0 +1,22 @@
+"""
+LLM Provider Selection
+Global LLM service untuk provider yang dikonfigurasi (LLM_PROVIDER)
+"""
+from config.settings import settings
+from llm.base import BaseLLMService
+from models.schemas import LLMProvider
+
+
+def create_llm_service() -> BaseLLMService:
+    """Create the service for ``settings.llm_provider``"""
+    if settings.llm_provider == LLMProvider.LLAMACPP:
+        from llm.llamacpp_service import LlamaCppService
+        return LlamaCppService()
+    if settings.llm_provider == LLMProvider.OLLAMA:
+        from llm.ollama_service import ollama_service
+        return ollama_service
+    raise ValueError(f"Unknown LLM_PROVIDER '{settings.llm_provider}' (expected ollama or llamacpp)")
+
+
+# Global LLM service instance
+llm_service = create_llm_service()
@@ -0,0 +1,244 @@
+"""
+LLM Request Scheduler
+Admission control, priorities dan fairness di depan OllamaService
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter
+from enum import IntEnum
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Generation priority (lower value is served first)"""
+    INTERACTIVE = 0  # /chat
+    ENHANCE = 1      # /enhance
+    BACKGROUND = 2   # summaries, memory extraction
+
+
+class SchedulerRejected(Exception):
+    """Request refused by admission control.
+
+    ``status_code`` is 429 when the user already has too many requests
+    waiting and 503 when the server-wide queue is full or the wait timed
+    out. ``retry_after`` is a suggested delay in seconds.
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted request; ``async with ticket`` waits for and holds a slot."""
+
+    def __init__(self, scheduler: "LLMScheduler", priority: Priority, user_id: str):
+        self._scheduler = scheduler
+        self.priority = priority
+        self.user_id = user_id
+        self.wait_time = 0.0  # seconds spent waiting for a slot
+        self.holding = False
+        self.closed = False
+        self._future: Optional[asyncio.Future] = None
+        self._acquired_at = 0.0
+
+    async def __aenter__(self) -> "Ticket":
+        await self._scheduler._acquire(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the slot (or the admission) held by this ticket; idempotent"""
+        self._scheduler._close(self)
+
+    def __del__(self):
+        # Releasing here would depend on GC timing and could run off the loop
+        if not self.closed:
+            logger.warning(f"Scheduler ticket for {self.user_id} was never closed")
+
+
+class TicketedStream:
+    """Async iterator that holds a ticket until the stream is closed.
+
+    A streaming response may never be iterated (e.g. the client goes away
+    before the body starts), so the generator's own cleanup can't be relied
+    on to release the slot. ``aclose`` closes the generator and the ticket
+    either way; call it when the response finishes.
+    """
+
+    def __init__(self, events: AsyncGenerator, ticket: Ticket):
+        self._events = events
+        self.ticket = ticket
+
+    def __aiter__(self) -> AsyncIterator:
+        return self._events
+
+    async def aclose(self) -> None:
+        """Stop the stream and release the ticket (idempotent)"""
+        try:
+            await self._events.aclose()
+        finally:
+            self.ticket.close()
+
+
+class LLMScheduler:
+    """Bounded-concurrency scheduler for LLM generations.
+
+    At most ``slots`` generations run at once. Waiting requests are served
+    by priority, then round-robin across users (a user's n-th waiting
+    request queues behind every other user's earlier ones), then FIFO.
+
+    Admission is checked up front by ``submit`` so overload is reported
+    immediately: a user with ``max_queue_per_user`` requests already
+    admitted gets 429, and once ``max_queue`` requests are waiting
+    everyone gets 503. Background work is never rejected; it just waits.
+    """
+
+    def __init__(self, slots: int, max_queue: int, max_queue_per_user: int, queue_timeout: float):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._admitted = 0
+        self._admitted_by_user: Counter = Counter()
+        self._waiting: List[Tuple[int, int, int, Ticket]] = []
+        self._waiting_by_user: Counter = Counter()
+        self._seq = itertools.count()
+        self._avg_service_time = 5.0  # EMA of slot hold time, for Retry-After
+        self.rejected = 0
+
+    def submit(self, priority: Priority, user_id: str = "anonymous") -> Ticket:
+        """Admit a request or raise SchedulerRejected.
+
+        Args:
+            priority: Request priority
+            user_id: User the request is made for (fairness and per-user limit)
+
+        Returns:
+            Ticket to ``async with`` around the generation
+        """
+        if priority != Priority.BACKGROUND:
+            if self._admitted_by_user[user_id] >= self.max_queue_per_user:
+                self.rejected += 1
+                raise SchedulerRejected(
+                    "Too many requests in progress for this user",
+                    status_code=429,
+                    retry_after=self._retry_after()
+                )
+            if self._admitted - self._active >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerRejected(
+                    "Server is busy, please retry shortly",
+                    status_code=503,
+                    retry_after=self._retry_after()
+                )
+
+        self._admitted += 1
+        self._admitted_by_user[user_id] += 1
+        return Ticket(self, priority, user_id)
+
+    async def _acquire(self, ticket: Ticket) -> None:
+        start = time.monotonic()
+        if self._active < self.slots and not self._waiting:
+            self._grant(ticket)
+            return
+
+        loop = asyncio.get_running_loop()
+        ticket._future = loop.create_future()
+        heapq.heappush(
+            self._waiting,
+            (int(ticket.priority), self._waiting_by_user[ticket.user_id], next(self._seq), ticket)
+        )
+        self._waiting_by_user[ticket.user_id] += 1
+        self._dispatch()  # a slot may be free behind abandoned entries
+
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket._future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(ticket)
+            self.rejected += 1
+            raise SchedulerRejected(
+                f"Timed out after {self.queue_timeout:.0f}s waiting for the model",
+                status_code=503,
+                retry_after=self._retry_after()
+            )
+        except asyncio.CancelledError:
+            self._abandon(ticket)
+            raise
+        finally:
+            ticket.wait_time = time.monotonic() - start
+
+    def _grant(self, ticket: Ticket) -> None:
+        self._active += 1
+        ticket.holding = True
+        ticket._acquired_at = time.monotonic()
+
+    def _abandon(self, ticket: Ticket) -> None:
+        """Give up waiting; if the slot was granted in the meantime, pass it on"""
+        if ticket._future is not None and not ticket._future.done():
+            ticket._future.cancel()
+        self._close(ticket)
+
+    def _close(self, ticket: Ticket) -> None:
+        if ticket.closed:
+            return
+        ticket.closed = True
+        self._admitted -= 1
+        self._admitted_by_user[ticket.user_id] -= 1
+        if self._admitted_by_user[ticket.user_id] <= 0:
+            del self._admitted_by_user[ticket.user_id]
+
+        if ticket.holding:
+            ticket.holding = False
+            self._active -= 1
+            held = time.monotonic() - ticket._acquired_at
+            self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * held
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the best waiting tickets"""
+        while self._active < self.slots and self._waiting:
+            _, _, _, ticket = heapq.heappop(self._waiting)
+            self._waiting_by_user[ticket.user_id] -= 1
+            if self._waiting_by_user[ticket.user_id] <= 0:
+                del self._waiting_by_user[ticket.user_id]
+            if ticket.closed or ticket._future is None or ticket._future.done():
+                continue
+            self._grant(ticket)
+            ticket._future.set_result(None)
+
+    def _retry_after(self) -> int:
+        backlog = max(self._admitted - self._active, 1)
+        return max(1, round(backlog * self._avg_service_time / self.slots))
+
+    def stats(self) -> Dict[str, Any]:
+        """Current scheduler state"""
+        return {
+            "slots": self.slots,
+            "active": self._active,
+            "waiting": sum(1 for *_, ticket in self._waiting if not ticket.closed),
+            "admitted": self._admitted,
+            "rejected": self.rejected,
+            "avgServiceTime": round(self._avg_service_time, 3)
+        }
+
+
+# Global scheduler instance
+llm_scheduler = LLMScheduler(
+    slots=settings.llm_slots,
+    max_queue=settings.llm_max_queue,
+    max_queue_per_user=settings.llm_max_queue_per_user,
+    queue_timeout=settings.llm_queue_timeout
+)
@@ -0,0 +1,148 @@
+"""
+LLM HTTP Transport
+Connection pooling, timeouts dan retries untuk Ollama clients
+"""
+import asyncio
+import logging
+import random
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Tuple, TypeVar
+
+import httpx
+import ollama
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Response body that tells the transport when the connection is handed back"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """httpx transport that counts requests in flight and reports pool usage.
+
+    A request counts as in flight from send until its response body is
+    closed, which for a streamed generation is the end of the stream.
+    """
+
+    def __init__(self, **kwargs: Any):
+        self._transport = httpx.AsyncHTTPTransport(**kwargs)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self.in_flight -= 1
+            self.errors += 1
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_TrackedStream(response.stream, self._release),
+            extensions=response.extensions
+        )
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests in flight and connection pool usage"""
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        return {
+            "inFlight": self.in_flight,
+            "peakInFlight": self.peak_in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections": len(connections),
+            "idleConnections": sum(1 for c in connections if c.is_idle()),
+            "maxConnections": settings.ollama_max_connections
+        }
+
+
+def build_client(url: str) -> Tuple[ollama.AsyncClient, InstrumentedTransport]:
+    """Ollama client for one host with the configured pool limits and timeouts.
+
+    The HTTP read timeout is the total timeout: a non-streamed chat sends
+    nothing until the reply is complete. The first-token deadline of
+    streamed generations is enforced by the caller.
+    """
+    transport = InstrumentedTransport(
+        limits=httpx.Limits(
+            max_connections=settings.ollama_max_connections,
+            max_keepalive_connections=settings.ollama_max_keepalive_connections,
+            keepalive_expiry=settings.ollama_keepalive_expiry
+        ),
+        retries=settings.ollama_connect_retries  # connection failures only; always safe
+    )
+    timeout = httpx.Timeout(
+        connect=settings.ollama_connect_timeout,
+        read=settings.ollama_total_timeout,
+        write=settings.ollama_connect_timeout,
+        pool=settings.ollama_connect_timeout
+    )
+    return ollama.AsyncClient(host=url, timeout=timeout, transport=transport), transport
+
+
+def backoff_delay(attempt: int) -> float:
+    """Jittered exponential backoff for retry ``attempt`` (0-based)"""
+    return settings.ollama_retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+async def retry_idempotent(
+    call: Callable[[], Awaitable[T]],
+    is_retryable: Callable[[BaseException], bool],
+    on_retry: Callable[[BaseException], None] = lambda e: None
+) -> T:
+    """Run an idempotent request (list, show, embeddings), retrying transient failures.
+
+    Args:
+        call: Makes the request; called once per attempt
+        is_retryable: Whether an error is worth another attempt
+        on_retry: Called with the error before each retry
+
+    Returns:
+        Result of the first successful attempt
+    """
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except Exception as e:
+            if attempt >= settings.ollama_retries or not is_retryable(e):
+                raise
+            on_retry(e)
+            delay = backoff_delay(attempt)
+            logger.warning(f"Retrying LLM request in {delay:.2f}s after: {e or type(e).__name__}")
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -4,11 +4,17 @@ import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from config.settings import settings
 from api.routes import router
-from llm.ollama_service import ollama_service
+from llm.provider import llm_service
+from llm.health_monitor import health_monitor
+from rag.vector_service import rag_service
+from services.conversation_summarizer import conversation_summarizer
+from services.memory_extractor import memory_extractor
+from services.system_sampler import system_sampler
 
 # Configure logging
 logging.basicConfig(
@@ -30,8 +36,14 @@ async def lifespan(app: FastAPI):
     Startup:
     - Check LLM service health
     - Warm up services
+    - Start LLM backend health probing and the health monitor
+    - Start RAG background workers
+    - Start conversation summarizer and memory extractor
+    - Start the system resource sampler
     
     Shutdown:
+    - Flush buffered conversation writes
+    - Stop background workers
     - Cleanup resources
     """
     # Startup
@@ -47,11 +59,11 @@ async def lifespan(app: FastAPI):
     try:
         # Check LLM service
         logger.info("Checking LLM service health...")
-        health = await ollama_service.check_health()
-        logger.info(f"✓ LLM service available with {len(health.get('models', []))} models")
+        health = await health_monitor.refresh()
+        logger.info(f"✓ LLM service available with {len(health.get('available_models', []))} models")
         
         # Verify default model
-        available_models = health.get('models', [])
+        available_models = health.get('available_models', [])
         if settings.default_model not in available_models:
             logger.warning(
                 f"Default model '{settings.default_model}' not found. "
@@ -66,6 +78,13 @@ async def lifespan(app: FastAPI):
         logger.error(f"⚠️  LLM service check failed: {e}")
         logger.warning("Backend will start but chat functionality may not work")
     
+    llm_service.start()
+    health_monitor.start()
+    system_sampler.start()
+    rag_service.start()
+    conversation_summarizer.start()
+    memory_extractor.start()
+    
     logger.info("✓ Backend startup complete")
     logger.info(f"API Docs: http://{settings.api_host}:{settings.api_port}/docs")
     
@@ -73,6 +92,12 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down EchoMinds backend...")
+    await conversation_summarizer.stop()
+    await memory_extractor.stop()
+    await system_sampler.stop()
+    await health_monitor.stop()
+    await llm_service.stop()
+    await rag_service.shutdown()
     logger.info("✓ Cleanup complete")
 
 
@@ -126,6 +151,13 @@ async def root():
     }
 
 
+# Prometheus metrics
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (chat stage histograms, turn counters, LLM queue)."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -172,6 +172,27 @@ class SystemStatus(BaseModel):
     uptime_seconds: float = Field(..., description="Server uptime")
 
 
+class SystemSample(BaseModel):
+    """One resource sample taken by the background system sampler"""
+    timestamp: float = Field(..., description="Unix time of the sample")
+    cpu_usage: float = Field(..., ge=0, le=100, description="CPU usage percentage")
+    memory_usage: float = Field(..., ge=0, le=100, description="Memory usage percentage")
+    memory_used_mb: float = Field(..., description="System memory in use (MB)")
+    process_rss_mb: Dict[str, float] = Field(..., description="Resident memory per process (backend, ollama)")
+    characters: Optional[int] = Field(None, description="Character files (None if the store is missing)")
+    memories: Optional[int] = Field(None, description="Stored memories (None if the memory DB is unreachable)")
+    llm_status: str = Field(..., description="Cached LLM health status")
+    llm_active: int = Field(..., description="Generations in flight")
+    llm_waiting: int = Field(..., description="Generations waiting for a slot")
+
+
+class StatusHistory(BaseModel):
+    """Recent resource samples for the monitoring UI"""
+    interval: float = Field(..., description="Seconds between samples")
+    window: float = Field(..., description="Requested window in seconds")
+    samples: List[SystemSample] = Field(default_factory=list, description="Samples, oldest first")
+
+
 class MemoryEntry(BaseModel):
     """Memory entry response"""
     id: str = Field(..., description="Unique memory ID")
@@ -197,6 +218,7 @@ class ModelConfig(BaseModel):
     max_tokens: int
     gpu_memory_used: Optional[float] = None  # GB
     cpu_memory_used: Optional[float] = None  # GB
+    model_switch: Optional[Dict[str, Any]] = None  # running or last background model switch
 
 
 class CharacterProfile(BaseModel):
@@ -0,0 +1,48 @@
+"""
+Collection layout untuk vector store
+Per-pair collections (legacy) atau shared/sharded collections dengan metadata filter
+"""
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from config.settings import settings
+
+PER_PAIR = "per_pair"
+SHARED = "shared"
+
+
+def pair_collection_name(character_id: str, user_id: str, prefix: Optional[str] = None) -> str:
+    """Collection name in the per-pair layout (one collection per character-user pair)"""
+    prefix = settings.collection_prefix if prefix is None else prefix
+    return f"{prefix}{character_id}_{user_id}"
+
+
+def shared_collection_name(
+    character_id: str,
+    user_id: str,
+    shard_count: Optional[int] = None,
+    prefix: Optional[str] = None
+) -> str:
+    """Collection name in the shared layout (pair hashed onto a shard)"""
+    prefix = settings.collection_prefix if prefix is None else prefix
+    shard_count = shard_count or settings.vector_shard_count
+    shard = zlib.crc32(f"{character_id}\0{user_id}".encode("utf-8")) % shard_count
+    return f"{prefix}shared_{shard}"
+
+
+def is_shared_collection(name: str, prefix: Optional[str] = None) -> bool:
+    """Whether a collection name belongs to the shared layout"""
+    prefix = settings.collection_prefix if prefix is None else prefix
+    return name.startswith(f"{prefix}shared_")
+
+
+def pair_filter(character_id: str, user_id: str) -> Dict[str, Any]:
+    """ChromaDB ``where`` filter selecting one pair's documents"""
+    return {"$and": [{"character_id": character_id}, {"user_id": user_id}]}
+
+
+def resolve_collection(character_id: str, user_id: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Collection name and ``where`` filter for a pair under the configured layout"""
+    if settings.vector_storage_mode == SHARED:
+        return shared_collection_name(character_id, user_id), pair_filter(character_id, user_id)
+    return pair_collection_name(character_id, user_id), None
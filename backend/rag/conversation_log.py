@@ -0,0 +1,294 @@
+"""
+Conversation Log
+Append-only chat history per character-user pair (SQLite, WAL mode)
+"""
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def documents_to_messages(results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Convert a ChromaDB ``get`` result into log messages, oldest first"""
+    metadatas = results.get("metadatas") or []
+    messages = []
+    for i, doc in enumerate(results.get("documents") or []):
+        metadata = (metadatas[i] if metadatas else None) or {}
+        messages.append({
+            "id": results["ids"][i],
+            "role": metadata.get("role", "unknown"),
+            "content": doc,
+            "metadata": metadata
+        })
+    messages.sort(key=lambda m: m["metadata"].get("timestamp") or "")
+    return messages
+
+
+class ConversationLog:
+    """Ordered message log used for recent-history lookups.
+
+    Every message gets a monotonically increasing ``seq``. The
+    ``(character_id, user_id, seq)`` index means fetching the last N
+    messages of a pair is an index seek plus N rows, regardless of how
+    long the conversation is. ChromaDB stays responsible for semantic
+    retrieval only. A running summary of turns that aged out of the
+    recent window is kept per pair in ``summaries``.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._backfilled: Set[Tuple[str, str]] = set()
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL,
+                character_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT,
+                metadata TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_pair
+                ON messages (character_id, user_id, seq);
+            CREATE TABLE IF NOT EXISTS summaries (
+                character_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                last_seq INTEGER NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (character_id, user_id)
+            );
+            CREATE TABLE IF NOT EXISTS cursors (
+                character_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                last_seq INTEGER NOT NULL,
+                PRIMARY KEY (character_id, user_id, name)
+            );
+            CREATE TABLE IF NOT EXISTS backfilled_pairs (
+                character_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                PRIMARY KEY (character_id, user_id)
+            );
+            """
+        )
+        self._conn.commit()
+        logger.info(f"Conversation log ready: {self.db_path}")
+
+    def append(self, character_id: str, user_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Append messages (oldest first) for a pair"""
+        rows = [
+            (
+                message["id"],
+                character_id,
+                user_id,
+                message["role"],
+                message["content"],
+                (message.get("metadata") or {}).get("timestamp"),
+                json.dumps(message.get("metadata") or {}, ensure_ascii=False)
+            )
+            for message in messages
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO messages (id, character_id, user_id, role, content, timestamp, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def recent(self, character_id: str, user_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Last ``limit`` messages for a pair, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, role, content, metadata FROM messages "
+                "WHERE character_id = ? AND user_id = ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (character_id, user_id, limit)
+            ).fetchall()
+
+        messages = []
+        for doc_id, role, content, metadata in reversed(rows):
+            messages.append({
+                "id": doc_id,
+                "content": content,
+                "role": role,
+                "metadata": {"role": role, **json.loads(metadata or "{}")}
+            })
+        return messages
+
+    def clear(self, character_id: str, user_id: str) -> int:
+        """Delete all messages (plus summary and job cursors) for a pair; returns number deleted"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM messages WHERE character_id = ? AND user_id = ?",
+                (character_id, user_id)
+            )
+            self._conn.execute(
+                "DELETE FROM summaries WHERE character_id = ? AND user_id = ?",
+                (character_id, user_id)
+            )
+            self._conn.execute(
+                "DELETE FROM cursors WHERE character_id = ? AND user_id = ?",
+                (character_id, user_id)
+            )
+        return cursor.rowcount
+
+    def messages_after(self, character_id: str, user_id: str, after_seq: int, limit: int) -> List[Dict[str, Any]]:
+        """Up to ``limit`` messages with seq > ``after_seq``, oldest first, with ``seq``"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, role, content FROM messages "
+                "WHERE character_id = ? AND user_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (character_id, user_id, after_seq, limit)
+            ).fetchall()
+        return [{"seq": seq, "role": role, "content": content} for seq, role, content in rows]
+
+    def get_cursor(self, character_id: str, user_id: str, name: str) -> int:
+        """Last seq a background job (``name``) has processed for a pair; 0 if none"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_seq FROM cursors WHERE character_id = ? AND user_id = ? AND name = ?",
+                (character_id, user_id, name)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def set_cursor(self, character_id: str, user_id: str, name: str, last_seq: int) -> None:
+        """Record progress of a background job for a pair"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cursors (character_id, user_id, name, last_seq) VALUES (?, ?, ?, ?)",
+                (character_id, user_id, name, last_seq)
+            )
+
+    def get_summary(self, character_id: str, user_id: str) -> Optional[Tuple[str, int]]:
+        """Running summary for a pair as (summary, last summarized seq), if any"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, last_seq FROM summaries WHERE character_id = ? AND user_id = ?",
+                (character_id, user_id)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save_summary(self, character_id: str, user_id: str, summary: str, last_seq: int) -> bool:
+        """Store the running summary covering messages up to ``last_seq``.
+
+        Skipped (returns False) if that message no longer exists, so a
+        summary finished after the conversation was cleared is dropped.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (character_id, user_id, summary, last_seq, updated_at) "
+                "SELECT ?, ?, ?, ?, ? WHERE EXISTS ("
+                "SELECT 1 FROM messages WHERE character_id = ? AND user_id = ? AND seq = ?)",
+                (
+                    character_id, user_id, summary, last_seq, datetime.utcnow().isoformat(),
+                    character_id, user_id, last_seq
+                )
+            )
+        return cursor.rowcount > 0
+
+    def unsummarized(
+        self,
+        character_id: str,
+        user_id: str,
+        after_seq: int,
+        keep_recent: int,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Messages after ``after_seq`` that have aged out of the recent window.
+
+        The newest ``keep_recent`` messages are excluded (they are still sent
+        verbatim). Returns up to ``limit`` messages, oldest first, with ``seq``.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, role, content FROM messages "
+                "WHERE character_id = ? AND user_id = ? AND seq > ? AND seq NOT IN ("
+                "SELECT seq FROM messages WHERE character_id = ? AND user_id = ? "
+                "ORDER BY seq DESC LIMIT ?) "
+                "ORDER BY seq LIMIT ?",
+                (character_id, user_id, after_seq, character_id, user_id, keep_recent, limit)
+            ).fetchall()
+        return [{"seq": seq, "role": role, "content": content} for seq, role, content in rows]
+
+    def is_backfilled(self, character_id: str, user_id: str) -> bool:
+        """Whether legacy history for a pair has already been imported"""
+        key = (character_id, user_id)
+        if key in self._backfilled:
+            return True
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM backfilled_pairs WHERE character_id = ? AND user_id = ?",
+                key
+            ).fetchone()
+        if row:
+            self._backfilled.add(key)
+        return row is not None
+
+    def ensure_backfilled(
+        self,
+        character_id: str,
+        user_id: str,
+        load_legacy: Callable[[], List[Dict[str, Any]]]
+    ) -> None:
+        """Import a pair's legacy history (from ``load_legacy``, oldest first) once"""
+        if self.is_backfilled(character_id, user_id):
+            return
+        self.backfill(character_id, user_id, load_legacy())
+
+    def backfill(self, character_id: str, user_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Import legacy messages ahead of anything logged since, then mark the pair"""
+        with self._lock, self._conn:
+            if messages:
+                existing = self._conn.execute(
+                    "SELECT seq, id, role, content, timestamp, metadata FROM messages "
+                    "WHERE character_id = ? AND user_id = ? ORDER BY seq",
+                    (character_id, user_id)
+                ).fetchall()
+                existing_ids = {row[1] for row in existing}
+                self._conn.execute(
+                    "DELETE FROM messages WHERE character_id = ? AND user_id = ?",
+                    (character_id, user_id)
+                )
+                rows = [
+                    (
+                        m["id"], character_id, user_id, m["role"], m["content"],
+                        (m.get("metadata") or {}).get("timestamp"),
+                        json.dumps(m.get("metadata") or {}, ensure_ascii=False)
+                    )
+                    for m in messages
+                    if m["id"] not in existing_ids
+                ]
+                rows.extend(
+                    (doc_id, character_id, user_id, role, content, timestamp, metadata)
+                    for _, doc_id, role, content, timestamp, metadata in existing
+                )
+                self._conn.executemany(
+                    "INSERT INTO messages (id, character_id, user_id, role, content, timestamp, metadata) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO backfilled_pairs (character_id, user_id) VALUES (?, ?)",
+                (character_id, user_id)
+            )
+        self._backfilled.add((character_id, user_id))
+        if messages:
+            logger.info(f"Imported {len(messages)} legacy messages for {character_id}/{user_id}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,371 @@
+"""
+Embedding Cache
+LRU cache untuk embeddings, dengan optional on-disk tier (memory-mapped)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DISK_WRITE_BATCH = 256  # Queued disk writes appended per keys.log flush
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text before hashing (unicode form + whitespace)"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_cache_key(model_name: str, text: str) -> str:
+    """Cache key for (embedding model, normalized text)"""
+    payload = f"{model_name}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+
+class DiskEmbeddingStore:
+    """Fixed-capacity on-disk vector store backed by a numpy memmap.
+
+    Layout inside ``path``:
+    - ``meta.json``: vector dimension and slot capacity
+    - ``vectors.f32``: memory-mapped float32 matrix (capacity x dim)
+    - ``keys.log``: append-only ``<key> <slot>`` lines, replayed on start
+
+    Slots are reused round-robin once the store is full, so the oldest
+    entries are overwritten first.
+    """
+
+    def __init__(self, path: Path, capacity: int):
+        self.path = Path(path)
+        self.capacity = capacity
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._meta_path = self.path / "meta.json"
+        self._vectors_path = self.path / "vectors.f32"
+        self._log_path = self.path / "keys.log"
+
+        self.dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._index: Dict[str, int] = {}
+        self._slot_keys: Dict[int, str] = {}
+        self._next_slot = 0
+        self._log_lines = 0
+        self._log_file = None
+
+        self._open_existing()
+
+    def _open_existing(self) -> None:
+        """Load an existing store from disk, if compatible"""
+        if not self._meta_path.exists():
+            return
+        try:
+            meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+            if meta.get("capacity") != self.capacity or not self._vectors_path.exists():
+                logger.info("Embedding disk cache layout changed, starting fresh")
+                self._reset()
+                return
+            self._open(meta["dim"], mode="r+")
+            self._replay_log()
+            logger.info(f"Embedding disk cache loaded: {len(self._index)} entries")
+        except Exception as e:
+            logger.warning(f"Could not load embedding disk cache, starting fresh: {e}")
+            self._reset()
+
+    def _open(self, dim: int, mode: str) -> None:
+        self.dim = dim
+        self._vectors = np.memmap(
+            self._vectors_path, dtype=np.float32, mode=mode, shape=(self.capacity, dim)
+        )
+        self._log_file = open(self._log_path, "a", encoding="utf-8")
+
+    def _replay_log(self) -> None:
+        """Rebuild the key index from keys.log (last write wins)"""
+        last_slot = -1
+        with open(self._log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) != 2:
+                    continue  # Torn write at the tail
+                key, slot = parts[0], int(parts[1])
+                if not 0 <= slot < self.capacity:
+                    continue
+                old_key = self._slot_keys.get(slot)
+                if old_key is not None:
+                    self._index.pop(old_key, None)
+                self._index[key] = slot
+                self._slot_keys[slot] = key
+                last_slot = slot
+                self._log_lines += 1
+        self._next_slot = (last_slot + 1) % self.capacity
+
+    def _reset(self) -> None:
+        """Remove all on-disk state"""
+        self.close()
+        for path in (self._meta_path, self._vectors_path, self._log_path):
+            if path.exists():
+                path.unlink()
+        self.dim = None
+        self._index.clear()
+        self._slot_keys.clear()
+        self._next_slot = 0
+        self._log_lines = 0
+
+    def _initialize(self, dim: int) -> None:
+        """Create the memmap file on first write"""
+        self._open(dim, mode="w+")
+        self._meta_path.write_text(
+            json.dumps({"dim": dim, "capacity": self.capacity}), encoding="utf-8"
+        )
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        slot = self._index.get(key)
+        if slot is None or self._vectors is None:
+            return None
+        return np.array(self._vectors[slot])
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        self.put_many([(key, vector)])
+
+    def put_many(self, items: List[Tuple[str, np.ndarray]]) -> None:
+        """Write several vectors with one keys.log append"""
+        lines = []
+        for key, vector in items:
+            if self.dim is None:
+                self._initialize(vector.shape[0])
+            if vector.shape[0] != self.dim:
+                logger.warning("Embedding dimension changed, resetting disk cache")
+                self._reset()
+                self._initialize(vector.shape[0])
+                lines = []
+
+            slot = self._index.get(key)
+            if slot is None:
+                slot = self._next_slot
+                self._next_slot = (slot + 1) % self.capacity
+                old_key = self._slot_keys.get(slot)
+                if old_key is not None:
+                    self._index.pop(old_key, None)
+                self._index[key] = slot
+                self._slot_keys[slot] = key
+                lines.append(f"{key} {slot}\n")
+
+            self._vectors[slot] = vector
+
+        if lines:
+            self._log_file.write("".join(lines))
+            self._log_file.flush()
+            self._log_lines += len(lines)
+        if self._log_lines > 2 * self.capacity:
+            self._compact_log()
+
+    def _compact_log(self) -> None:
+        """Rewrite keys.log with only live entries, oldest slot first"""
+        self._log_file.close()
+        order = sorted(
+            self._index.items(),
+            key=lambda item: (item[1] - self._next_slot) % self.capacity
+        )
+        tmp_path = self._log_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, slot in order:
+                f.write(f"{key} {slot}\n")
+        os.replace(tmp_path, self._log_path)
+        self._log_lines = len(order)
+        self._log_file = open(self._log_path, "a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def close(self) -> None:
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+
+class EmbeddingCache:
+    """Thread-safe embedding cache keyed by (model, normalized text hash).
+
+    The in-memory tier is an LRU bounded by entry count and total vector
+    bytes. When ``disk_path`` is set, entries are also written to a
+    :class:`DiskEmbeddingStore` so they survive restarts; memory misses
+    fall back to disk before the caller has to encode.
+
+    Disk writes never happen in the caller: ``put_many`` only queues them,
+    and a writer thread appends them in batches. Disk I/O runs under its
+    own lock, so it doesn't hold up memory-tier lookups; async callers use
+    ``get_many_async`` so disk reads don't block the event loop either.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_path: Optional[Path] = None,
+        disk_capacity: int = 100000
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk = DiskEmbeddingStore(disk_path, disk_capacity) if disk_path else None
+        self._disk_lock = threading.Lock()
+        self._disk_pending: Dict[str, np.ndarray] = {}  # queued, not yet on disk
+        self._disk_queue: "queue.Queue[Optional[Tuple[str, np.ndarray]]]" = queue.Queue()
+        self._disk_writer: Optional[threading.Thread] = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """Look up several keys; ``None`` marks a miss"""
+        vectors, missing = self._get_from_memory(keys)
+        if missing:
+            self._get_from_disk(keys, vectors, missing)
+        return [vector.tolist() if vector is not None else None for vector in vectors]
+
+    async def get_many_async(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """:meth:`get_many` for the event loop: disk-tier reads run in a worker thread"""
+        vectors, missing = self._get_from_memory(keys)
+        if missing:
+            await asyncio.to_thread(self._get_from_disk, keys, vectors, missing)
+        return [vector.tolist() if vector is not None else None for vector in vectors]
+
+    def _get_from_memory(self, keys: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """Memory-tier lookup; returns the vectors and the indexes still to read from disk"""
+        vectors: List[Optional[np.ndarray]] = []
+        missing: List[int] = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is None:
+                    vector = self._disk_pending.get(key)
+                if vector is not None:
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                    else:
+                        self._insert(key, vector)  # evicted before its disk write landed
+                    self.hits += 1
+                else:
+                    missing.append(i)
+                vectors.append(vector)
+            if self._disk is None:
+                self.misses += len(missing)
+                missing = []
+        return vectors, missing
+
+    def _get_from_disk(self, keys: List[str], vectors: List[Optional[np.ndarray]], missing: List[int]) -> None:
+        """Fill ``vectors[i]`` for each missing index from the disk tier"""
+        with self._disk_lock:
+            found = {i: self._disk.get(keys[i]) for i in missing}
+        with self._lock:
+            for i, vector in found.items():
+                if vector is not None:
+                    self._insert(keys[i], vector)
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+                vectors[i] = vector
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]) -> None:
+        """Store several embeddings (the disk tier is written in the background)"""
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                array = np.asarray(vector, dtype=np.float32)
+                self._insert(key, array)
+                if self._disk is not None:
+                    self._disk_pending[key] = array
+                    self._disk_queue.put((key, array))
+            if self._disk is not None and (self._disk_writer is None or not self._disk_writer.is_alive()):
+                self._disk_writer = threading.Thread(
+                    target=self._write_disk, name="embedding-cache-writer", daemon=True
+                )
+                self._disk_writer.start()
+
+    def _write_disk(self) -> None:
+        """Writer thread: append queued vectors to the disk tier in batches"""
+        while True:
+            item = self._disk_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < DISK_WRITE_BATCH:
+                try:
+                    item = self._disk_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            with self._disk_lock:
+                try:
+                    self._disk.put_many(batch)
+                except Exception as e:
+                    logger.warning(f"Embedding disk cache write failed: {e}")
+            with self._lock:
+                for key, array in batch:
+                    if self._disk_pending.get(key) is array:
+                        del self._disk_pending[key]
+            if stop:
+                return
+
+    def _insert(self, key: str, vector: np.ndarray) -> None:
+        """Insert into the memory tier and evict down to the limits"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "disk_entries": len(self._disk) if self._disk is not None else 0,
+                "disk_pending": len(self._disk_pending),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+    def close(self) -> None:
+        """Write queued vectors and flush the disk tier"""
+        if self._disk is None:
+            return
+        with self._lock:
+            writer = self._disk_writer
+            self._disk_writer = None
+        if writer is not None and writer.is_alive():
+            self._disk_queue.put(None)
+            writer.join()
+        with self._disk_lock:
+            self._disk.close()
@@ -0,0 +1,161 @@
+"""
+Embedding Worker
+Micro-batching executor untuk SentenceTransformer encoding di luar event loop
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _EmbeddingRequest:
+    """Pending encode request waiting in the worker queue"""
+    texts: List[str]
+    future: Future = field(default_factory=Future)
+
+
+class EmbeddingWorker:
+    """Encode texts on a dedicated thread, batching concurrent requests.
+
+    Requests are put on a bounded queue. The worker thread takes the first
+    pending request, keeps collecting more until ``batch_size`` texts are
+    gathered or ``max_wait_ms`` has passed, then calls ``encode`` once for
+    the whole batch and resolves every request's future with its slice.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        queue_size: int = 1024
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[_EmbeddingRequest]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self) -> None:
+        """Start the worker thread (idempotent)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._closed = False
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="embedding-worker",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop the worker after pending requests are encoded"""
+        with self._lock:
+            if self._thread is None or self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        logger.info("Embedding worker stopped")
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for encoding.
+
+        Returns:
+            Future resolving to one embedding (list of floats) per text
+
+        Raises:
+            RuntimeError: If the worker is shut down or the queue is full
+        """
+        if self._closed:
+            raise RuntimeError("Embedding worker is shut down")
+        self.start()
+
+        request = _EmbeddingRequest(texts=list(texts))
+        if not request.texts:
+            request.future.set_result([])
+            return request.future
+
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            raise RuntimeError("Embedding queue is full")
+        return request.future
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Encode texts without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def embed_sync(self, texts: List[str]) -> List[List[float]]:
+        """Encode texts from a worker thread (blocks the caller)"""
+        return self.submit(texts).result()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting to be batched"""
+        return self._queue.qsize()
+
+    def _run(self) -> None:
+        """Worker loop: collect micro-batches and encode them"""
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = [first]
+            text_count = len(first.texts)
+            deadline = time.monotonic() + self.max_wait
+
+            while text_count < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+                text_count += len(request.texts)
+
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch: List[_EmbeddingRequest]) -> None:
+        """Encode one micro-batch and resolve its futures"""
+        # Skip requests whose caller already gave up (e.g. timed out)
+        batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        texts = [text for request in batch for text in request.texts]
+        try:
+            vectors = self.model.encode(
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+        except Exception as e:
+            logger.error(f"Embedding batch failed ({len(texts)} texts): {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        logger.debug(f"Encoded batch: {len(batch)} requests, {len(texts)} texts")
+        offset = 0
+        for request in batch:
+            count = len(request.texts)
+            request.future.set_result(vectors[offset:offset + count].tolist())
+            offset += count
@@ -1,14 +1,23 @@
 """
 RAG Service dengan ChromaDB untuk per-character memory
 """
+import asyncio
+import threading
 import chromadb
 from chromadb.config import Settings as ChromaSettings
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
+import numpy as np
 import logging
 from sentence_transformers import SentenceTransformer
 from config.settings import settings
 from models.schemas import ConversationMessage, ChatRole
+from rag.embedding_cache import EmbeddingCache, make_cache_key
+from rag.collection_layout import resolve_collection
+from rag.conversation_log import ConversationLog, documents_to_messages
+from rag.embedding_worker import EmbeddingWorker
+from rag.write_buffer import ConversationWriteBuffer
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -27,31 +36,105 @@ class RAGService:
             )
         )
         
+        # Bounded LRU of collection handles, keyed by collection name
+        self._collections: "OrderedDict[str, Any]" = OrderedDict()
+        self._collections_lock = threading.Lock()
+        
         # Initialize embedding model
         logger.info(f"Loading embedding model: {settings.embedding_model}")
         self.embedding_model = SentenceTransformer(settings.embedding_model)
+        self.embedding_worker = EmbeddingWorker(
+            self.embedding_model,
+            batch_size=settings.embedding_batch_size,
+            max_wait_ms=settings.embedding_max_wait_ms,
+            queue_size=settings.embedding_queue_size
+        )
+        self.embedding_cache = EmbeddingCache(
+            max_entries=settings.embedding_cache_size,
+            max_bytes=settings.embedding_cache_max_mb * 1024 * 1024,
+            disk_path=settings.embedding_cache_path,
+            disk_capacity=settings.embedding_cache_disk_capacity
+        )
+        self.conversation_log = ConversationLog(
+            settings.conversation_data_path / "conversations.db"
+        )
+        self.write_buffer = ConversationWriteBuffer(
+            self._flush_buffered_messages,
+            max_pending=settings.write_buffer_max_pending,
+            flush_interval=settings.write_buffer_flush_interval,
+            max_attempts=settings.write_buffer_max_attempts
+        )
         
         logger.info("RAG Service initialized")
     
     def _get_collection_name(self, character_id: str, user_id: str) -> str:
-        """Generate collection name per character-user pair"""
-        return f"{settings.collection_prefix}{character_id}_{user_id}"
+        """Collection name for a character-user pair (per-pair or shared shard)"""
+        return resolve_collection(character_id, user_id)[0]
     
     def _get_or_create_collection(self, collection_name: str):
-        """Get or create ChromaDB collection"""
-        try:
-            collection = self.client.get_collection(name=collection_name)
-        except Exception:
-            collection = self.client.create_collection(
-                name=collection_name,
-                metadata={"hnsw:space": "cosine"}
-            )
+        """Get or create ChromaDB collection (cached handle)"""
+        with self._collections_lock:
+            collection = self._collections.get(collection_name)
+            if collection is not None:
+                self._collections.move_to_end(collection_name)
+                return collection
+        
+        collection = self.client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+        
+        with self._collections_lock:
+            self._collections[collection_name] = collection
+            self._collections.move_to_end(collection_name)
+            while len(self._collections) > settings.collection_cache_size:
+                self._collections.popitem(last=False)
         return collection
     
-    def _generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for text"""
-        embedding = self.embedding_model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+    def _invalidate_collection(self, collection_name: str) -> None:
+        """Drop a cached collection handle"""
+        with self._collections_lock:
+            self._collections.pop(collection_name, None)
+    
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings, serving repeated texts from the cache"""
+        keys = [make_cache_key(settings.embedding_model, text) for text in texts]
+        embeddings = await self.embedding_cache.get_many_async(keys)
+        
+        # Encode each distinct missing text once via the batching worker
+        missing: Dict[str, str] = {}
+        for key, text, embedding in zip(keys, texts, embeddings):
+            if embedding is None:
+                missing.setdefault(key, text)
+        
+        if missing:
+            encoded = await self.embedding_worker.embed(list(missing.values()))
+            self.embedding_cache.put_many(list(missing.keys()), encoded)
+            by_key = dict(zip(missing.keys(), encoded))
+            embeddings = [
+                embedding if embedding is not None else by_key[key]
+                for key, embedding in zip(keys, embeddings)
+            ]
+        
+        return embeddings
+    
+    async def embed_text(self, text: str) -> List[float]:
+        """Generate embedding for a single text"""
+        embeddings = await self.embed_texts([text])
+        return embeddings[0]
+    
+    def start(self) -> None:
+        """Start background workers"""
+        self.embedding_worker.start()
+        if settings.write_behind_enabled:
+            self.write_buffer.start()
+    
+    async def shutdown(self) -> None:
+        """Flush buffered writes, stop background workers and flush caches"""
+        await self.write_buffer.stop()
+        self.embedding_worker.shutdown()
+        self.embedding_cache.close()
+        self.conversation_log.close()
     
     async def store_conversation(
         self,
@@ -59,53 +142,227 @@ class RAGService:
         user_id: str,
         role: str,
         content: str,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding: Optional[List[float]] = None
     ) -> str:
         """Store conversation message in vector DB"""
+        doc_ids = await self.store_messages(
+            character_id=character_id,
+            user_id=user_id,
+            messages=[{
+                "role": role,
+                "content": content,
+                "metadata": metadata,
+                "embedding": embedding
+            }]
+        )
+        return doc_ids[0]
+    
+    async def store_messages(
+        self,
+        character_id: str,
+        user_id: str,
+        messages: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Store several messages (e.g. a user/assistant turn) in one write.
+        
+        Each message is a dict with ``role``, ``content``, optional
+        ``metadata`` and optional precomputed ``embedding``. Missing
+        embeddings are encoded together in a single batch.
+        """
+        try:
+            await self._embed_missing(messages)
+        except Exception as e:
+            logger.error(f"Failed to store conversation: {e}")
+            raise RuntimeError(f"Store conversation error: {str(e)}")
+        
+        for message in messages:
+            message.setdefault("id", str(uuid.uuid4()))
+        await asyncio.to_thread(self._log_messages_sync, character_id, user_id, messages)
+        
+        return await asyncio.to_thread(
+            self._store_messages_sync, character_id, user_id, messages
+        )
+    
+    def _store_messages_sync(
+        self,
+        character_id: str,
+        user_id: str,
+        messages: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Blocking part of store_messages (ChromaDB write)"""
         try:
             collection_name = self._get_collection_name(character_id, user_id)
             collection = self._get_or_create_collection(collection_name)
             
-            # Generate unique ID
-            doc_id = str(uuid.uuid4())
-            
-            # Generate embedding
-            embedding = self._generate_embedding(content)
+            # Generate unique IDs
+            doc_ids = [message.get("id") or str(uuid.uuid4()) for message in messages]
             
             # Prepare metadata
-            doc_metadata = {
-                "character_id": character_id,
-                "user_id": user_id,
-                "role": role,
-                **(metadata or {})
-            }
+            doc_metadatas = [
+                {
+                    "character_id": character_id,
+                    "user_id": user_id,
+                    "role": message["role"],
+                    **(message.get("metadata") or {})
+                }
+                for message in messages
+            ]
             
             # Store in ChromaDB
             collection.add(
-                ids=[doc_id],
-                embeddings=[embedding],
-                documents=[content],
-                metadatas=[doc_metadata]
+                ids=doc_ids,
+                embeddings=[message["embedding"] for message in messages],
+                documents=[message["content"] for message in messages],
+                metadatas=doc_metadatas
             )
             
-            logger.debug(f"Stored conversation: {doc_id}")
-            return doc_id
+            logger.debug(f"Stored conversation: {', '.join(doc_ids)}")
+            return doc_ids
             
         except Exception as e:
+            self._invalidate_collection(self._get_collection_name(character_id, user_id))
             logger.error(f"Failed to store conversation: {e}")
             raise RuntimeError(f"Store conversation error: {str(e)}")
     
+    async def enqueue_messages(
+        self,
+        character_id: str,
+        user_id: str,
+        messages: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Store messages write-behind: buffer now, index in the background.
+        
+        Messages go into the conversation log right away; buffered
+        messages are also visible to ``retrieve_context`` for the same pair
+        before they are flushed to ChromaDB.
+        Falls back to a direct write when write-behind is disabled.
+        """
+        if not settings.write_behind_enabled:
+            return await self.store_messages(character_id, user_id, messages)
+        
+        for message in messages:
+            message.setdefault("id", str(uuid.uuid4()))
+        await asyncio.to_thread(self._log_messages_sync, character_id, user_id, messages)
+        self.write_buffer.add(character_id, user_id, messages)
+        return [message["id"] for message in messages]
+    
+    async def _embed_missing(self, messages: List[Dict[str, Any]]) -> None:
+        """Fill in ``embedding`` for messages that don't have one, in one batch"""
+        missing = [m for m in messages if m.get("embedding") is None]
+        if missing:
+            embeddings = await self.embed_texts([m["content"] for m in missing])
+            for message, embedding in zip(missing, embeddings):
+                message["embedding"] = embedding
+    
+    async def _flush_buffered_messages(
+        self,
+        batch: Dict[Tuple[str, str], List[Dict[str, Any]]]
+    ) -> Set[Tuple[str, str]]:
+        """Write-behind flush: one embedding batch, one add per collection.
+        
+        Returns the pairs that were written. If the shared embedding batch
+        fails, each pair is embedded on its own so one bad message only
+        holds back its own conversation.
+        """
+        try:
+            await self._embed_missing([m for messages in batch.values() for m in messages])
+        except Exception as e:
+            logger.warning(f"Batch embedding failed, retrying per conversation: {e}")
+        
+        written = set()
+        for (character_id, user_id), messages in batch.items():
+            try:
+                await self._embed_missing(messages)
+                await asyncio.to_thread(self._store_messages_sync, character_id, user_id, messages)
+            except Exception as e:
+                logger.error(f"Failed to index buffered messages for {character_id}/{user_id}: {e}")
+                continue
+            written.add((character_id, user_id))
+        return written
+    
     async def retrieve_context(
         self,
         character_id: str,
         user_id: str,
         query: str,
         top_k: int = 5,
-        min_relevance: float = 0.3
+        min_relevance: float = 0.3,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """Retrieve relevant context from conversation history"""
+        if query_embedding is None:
+            try:
+                query_embedding = await self.embed_text(query)
+            except Exception as e:
+                logger.error(f"Failed to retrieve context: {e}")
+                return []
+        
+        contexts = await asyncio.to_thread(
+            self._retrieve_context_sync, character_id, user_id, query_embedding, top_k, min_relevance
+        )
+        
+        # Read-your-writes: include buffered messages not yet in ChromaDB
+        pending = self.write_buffer.pending_for(character_id, user_id)
+        if pending:
+            contexts = self._merge_pending_context(
+                character_id, user_id, contexts, pending, query_embedding, top_k, min_relevance
+            )
+        return contexts
+    
+    def _merge_pending_context(
+        self,
+        character_id: str,
+        user_id: str,
+        contexts: List[Dict[str, Any]],
+        pending: List[Dict[str, Any]],
+        query_embedding: List[float],
+        top_k: int,
+        min_relevance: float
+    ) -> List[Dict[str, Any]]:
+        """Score the pair's buffered messages against the query and merge them in"""
+        stored_ids = {c.get("id") for c in contexts}
+        candidates = [
+            m for m in pending
+            if m.get("embedding") is not None and m["id"] not in stored_ids
+        ]
+        if not candidates:
+            return contexts
+        
+        query = np.asarray(query_embedding, dtype=np.float32)
+        vectors = np.asarray([m["embedding"] for m in candidates], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        similarities = vectors @ query / np.maximum(norms, 1e-12)
+        
+        merged = list(contexts)
+        for message, relevance in zip(candidates, similarities.tolist()):
+            if relevance >= min_relevance:
+                merged.append({
+                    "id": message["id"],
+                    "content": message["content"],
+                    "relevance": relevance,
+                    "metadata": {
+                        "character_id": character_id,
+                        "user_id": user_id,
+                        "role": message["role"],
+                        **(message.get("metadata") or {})
+                    }
+                })
+        
+        merged.sort(key=lambda c: c["relevance"], reverse=True)
+        return merged[:top_k]
+    
+    def _retrieve_context_sync(
+        self,
+        character_id: str,
+        user_id: str,
+        query_embedding: List[float],
+        top_k: int = 5,
+        min_relevance: float = 0.3
+    ) -> List[Dict[str, Any]]:
+        """Blocking part of retrieve_context (ChromaDB query)"""
         try:
-            collection_name = self._get_collection_name(character_id, user_id)
+            collection_name, where = resolve_collection(character_id, user_id)
             collection = self._get_or_create_collection(collection_name)
             
             # Get collection count
@@ -113,13 +370,11 @@ class RAGService:
             if count == 0:
                 return []
             
-            # Generate query embedding
-            query_embedding = self._generate_embedding(query)
-            
-            # Search similar documents
+            # Search similar documents (filtered to the pair in shared layout)
             results = collection.query(
                 query_embeddings=[query_embedding],
-                n_results=min(top_k, count)
+                n_results=min(top_k, count),
+                where=where
             )
             
             # Process results
@@ -131,6 +386,7 @@ class RAGService:
                     
                     if relevance >= min_relevance:
                         contexts.append({
+                            "id": results["ids"][0][i],
                             "content": doc,
                             "relevance": relevance,
                             "metadata": results["metadatas"][0][i] if results["metadatas"] else {}
@@ -140,6 +396,7 @@ class RAGService:
             return contexts
             
         except Exception as e:
+            self._invalidate_collection(self._get_collection_name(character_id, user_id))
             logger.error(f"Failed to retrieve context: {e}")
             return []
     
@@ -149,49 +406,75 @@ class RAGService:
         user_id: str,
         limit: int = 10
     ) -> List[Dict[str, Any]]:
-        """Get recent messages from conversation"""
+        """Get the most recent messages from conversation, oldest first"""
+        return await asyncio.to_thread(
+            self._get_recent_messages_sync, character_id, user_id, limit
+        )
+    
+    def _get_recent_messages_sync(
+        self,
+        character_id: str,
+        user_id: str,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Blocking part of get_recent_messages (conversation log read)"""
         try:
-            collection_name = self._get_collection_name(character_id, user_id)
-            collection = self._get_or_create_collection(collection_name)
-            
-            count = collection.count()
-            if count == 0:
-                return []
-            
-            # Get all documents (ChromaDB doesn't support sorting by timestamp directly)
-            results = collection.get(
-                limit=min(limit * 2, count),  # Get more to filter
-                include=["documents", "metadatas"]
-            )
-            
-            # Convert to list and sort by timestamp (if available)
-            messages = []
-            if results["documents"]:
-                for i, doc in enumerate(results["documents"]):
-                    metadata = results["metadatas"][i] if results["metadatas"] else {}
-                    messages.append({
-                        "content": doc,
-                        "role": metadata.get("role", "unknown"),
-                        "metadata": metadata
-                    })
-            
-            # Return most recent
-            return messages[-limit:] if len(messages) > limit else messages
-            
+            self._ensure_log_backfilled(character_id, user_id)
+            return self.conversation_log.recent(character_id, user_id, limit)
         except Exception as e:
             logger.error(f"Failed to get recent messages: {e}")
             return []
     
+    def _log_messages_sync(
+        self,
+        character_id: str,
+        user_id: str,
+        messages: List[Dict[str, Any]]
+    ) -> None:
+        """Append messages to the ordered conversation log"""
+        self._ensure_log_backfilled(character_id, user_id)
+        self.conversation_log.append(character_id, user_id, messages)
+    
+    def _ensure_log_backfilled(self, character_id: str, user_id: str) -> None:
+        """Import history stored before the conversation log existed"""
+        self.conversation_log.ensure_backfilled(
+            character_id, user_id, lambda: self._legacy_messages(character_id, user_id)
+        )
+    
+    def _legacy_messages(self, character_id: str, user_id: str) -> List[Dict[str, Any]]:
+        """A pair's messages from its ChromaDB collection, oldest first"""
+        try:
+            collection_name, where = resolve_collection(character_id, user_id)
+            collection = self.client.get_collection(name=collection_name)
+            results = collection.get(where=where, include=["documents", "metadatas"])
+        except Exception:
+            return []  # No legacy collection for this pair
+        return documents_to_messages(results)
+    
     async def clear_conversation(self, character_id: str, user_id: str) -> bool:
         """Clear conversation history for character-user pair"""
         try:
-            collection_name = self._get_collection_name(character_id, user_id)
-            self.client.delete_collection(name=collection_name)
+            # Buffered writes for the pair are dropped, and an in-flight flush
+            # lands before the delete instead of re-creating the history
+            async with self.write_buffer.discarding(character_id, user_id):
+                await asyncio.to_thread(self.conversation_log.clear, character_id, user_id)
+                collection_name = await asyncio.to_thread(self._delete_pair_documents, character_id, user_id)
             logger.info(f"Cleared conversation: {collection_name}")
             return True
         except Exception as e:
             logger.error(f"Failed to clear conversation: {e}")
             return False
+    
+    def _delete_pair_documents(self, character_id: str, user_id: str) -> str:
+        """Delete a pair's indexed messages (blocking); returns the collection name"""
+        collection_name, where = resolve_collection(character_id, user_id)
+        if where is None:
+            self._invalidate_collection(collection_name)
+            self.client.delete_collection(name=collection_name)
+        else:
+            # Shared layout: only delete this pair's documents
+            self._get_or_create_collection(collection_name).delete(where=where)
+        return collection_name
 
 
 # Global service instance
@@ -0,0 +1,176 @@
+"""
+Write-behind buffer untuk conversation messages
+Menunda indexing ke ChromaDB sampai setelah response dikirim
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+PairKey = Tuple[str, str]  # (character_id, user_id)
+# Writes a batch and returns the pairs that were written; the rest are retried
+FlushCallback = Callable[[Dict[PairKey, List[Dict[str, Any]]]], Awaitable[Set[PairKey]]]
+
+
+class ConversationWriteBuffer:
+    """In-memory buffer of conversation messages flushed in the background.
+
+    Messages are grouped per (character, user) pair. A background task
+    flushes everything pending when ``max_pending`` messages have
+    accumulated or ``flush_interval`` seconds have passed since the oldest
+    one arrived. Until a flush has been written, ``pending_for`` exposes the
+    buffered messages so readers still see their own writes.
+
+    Pairs the callback couldn't write are put back for the next flush; a
+    pair that fails ``max_attempts`` flushes in a row is dropped (the
+    messages stay in the conversation log, they just aren't indexed).
+    """
+
+    def __init__(
+        self,
+        flush_callback: FlushCallback,
+        max_pending: int = 64,
+        flush_interval: float = 2.0,
+        max_attempts: int = 5
+    ):
+        self._flush_callback = flush_callback
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.dropped = 0  # messages given up on after max_attempts
+
+        self._pending: Dict[PairKey, List[Dict[str, Any]]] = {}
+        self._inflight: Dict[PairKey, List[Dict[str, Any]]] = {}
+        self._pending_count = 0
+        self._oldest_at: Optional[float] = None
+        self._attempts: Dict[PairKey, int] = {}  # consecutive failed flushes per pair
+
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def pending_count(self) -> int:
+        """Messages waiting to be written"""
+        return self._pending_count + sum(len(m) for m in self._inflight.values())
+
+    def start(self) -> None:
+        """Start the background flush task (idempotent)"""
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="conversation-write-buffer")
+
+    async def stop(self) -> None:
+        """Stop the background task and flush whatever is pending"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def add(self, character_id: str, user_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Buffer messages for a pair; they are written on the next flush"""
+        self.start()
+        self._pending.setdefault((character_id, user_id), []).extend(messages)
+        self._pending_count += len(messages)
+        if self._oldest_at is None:
+            self._oldest_at = time.monotonic()
+        if self._pending_count >= self.max_pending:
+            self._wakeup.set()
+
+    def pending_for(self, character_id: str, user_id: str) -> List[Dict[str, Any]]:
+        """Buffered (not yet persisted) messages for a pair, oldest first"""
+        key = (character_id, user_id)
+        return [*self._inflight.get(key, []), *self._pending.get(key, [])]
+
+    def discard(self, character_id: str, user_id: str) -> None:
+        """Drop buffered messages for a pair (e.g. conversation cleared)"""
+        dropped = self._pending.pop((character_id, user_id), [])
+        self._pending_count -= len(dropped)
+        self._inflight.pop((character_id, user_id), None)
+        self._attempts.pop((character_id, user_id), None)
+
+    @asynccontextmanager
+    async def discarding(self, character_id: str, user_id: str) -> AsyncIterator[None]:
+        """Drop a pair's buffered messages and hold off flushes while the block runs.
+
+        A flush that is already writing the pair's messages finishes first,
+        so a store cleared inside the block doesn't get them back afterwards.
+        """
+        async with self._flush_lock:
+            self.discard(character_id, user_id)
+            yield
+
+    async def flush(self) -> None:
+        """Write all pending messages now"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            batch, self._pending = self._pending, {}
+            self._pending_count = 0
+            self._oldest_at = None
+            self._inflight = batch
+
+            try:
+                try:
+                    written = await self._flush_callback(batch)
+                except Exception as e:
+                    logger.error(f"Write-behind flush failed: {e}")
+                    written = set()
+
+                for key in written:
+                    self._attempts.pop(key, None)
+                if written:
+                    logger.debug(
+                        f"Flushed {sum(len(batch[key]) for key in written)} messages "
+                        f"for {len(written)} conversations"
+                    )
+                for key, messages in batch.items():
+                    if key not in written and key in self._inflight:
+                        self._retry_later(key, messages)
+                if self._pending and self._oldest_at is None:
+                    self._oldest_at = time.monotonic()
+            finally:
+                self._inflight = {}
+
+    def _retry_later(self, key: PairKey, messages: List[Dict[str, Any]]) -> None:
+        """Put a pair's failed messages back in front of anything buffered meanwhile"""
+        attempts = self._attempts.get(key, 0) + 1
+        if attempts >= self.max_attempts:
+            self._attempts.pop(key, None)
+            self.dropped += len(messages)
+            logger.error(
+                f"Dropping {len(messages)} buffered messages for {key} "
+                f"after {attempts} failed flushes; they won't be indexed"
+            )
+            return
+        self._attempts[key] = attempts
+        logger.warning(f"Write-behind flush failed for {key}, will retry (attempt {attempts})")
+        self._pending[key] = messages + self._pending.get(key, [])
+        self._pending_count += len(messages)
+
+    async def _run(self) -> None:
+        """Background loop flushing on size or age thresholds"""
+        while not self._stopping:
+            timeout = self.flush_interval
+            if self._oldest_at is not None:
+                timeout = max(0.0, self._oldest_at + self.flush_interval - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            if self._stopping:
+                break
+            if self._pending and (
+                self._pending_count >= self.max_pending
+                or time.monotonic() - (self._oldest_at or 0) >= self.flush_interval
+            ):
+                await self.flush()
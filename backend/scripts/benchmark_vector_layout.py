@@ -0,0 +1,154 @@
+"""
+Benchmark per-pair vs shared vector collection layouts.
+
+Builds both layouts from the same synthetic conversations in temporary
+ChromaDB directories, then reports build time, client startup time,
+retrieval latency (p50/p95/p99) and disk footprint.
+
+Usage (from backend/):
+    python -m scripts.benchmark_vector_layout --pairs 500 --messages 40 --shards 4
+"""
+import argparse
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings as ChromaSettings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.collection_layout import pair_collection_name, pair_filter, shared_collection_name  # noqa: E402
+
+PREFIX = "bench_"
+
+
+def _client(path: Path):
+    return chromadb.PersistentClient(
+        path=str(path),
+        settings=ChromaSettings(anonymized_telemetry=False, allow_reset=True)
+    )
+
+
+def _disk_usage(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _synthetic_pairs(pairs: int, messages: int, dim: int, seed: int):
+    """Yield (character_id, user_id, embeddings) for synthetic conversations"""
+    rng = np.random.default_rng(seed)
+    for p in range(pairs):
+        vectors = rng.standard_normal((messages, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        yield f"char{p % 25}", f"user{p}", vectors
+
+
+def build(layout: str, path: Path, args) -> float:
+    """Populate a layout; returns build time in seconds"""
+    client = _client(path)
+    start = time.perf_counter()
+    for character_id, user_id, vectors in _synthetic_pairs(args.pairs, args.messages, args.dim, args.seed):
+        if layout == "per_pair":
+            name = pair_collection_name(character_id, user_id, PREFIX)
+        else:
+            name = shared_collection_name(character_id, user_id, args.shards, PREFIX)
+        collection = client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+        collection.add(
+            ids=[f"{character_id}-{user_id}-{i}" for i in range(len(vectors))],
+            embeddings=vectors.tolist(),
+            documents=[f"message {i}" for i in range(len(vectors))],
+            metadatas=[
+                {"character_id": character_id, "user_id": user_id, "role": "user" if i % 2 == 0 else "assistant"}
+                for i in range(len(vectors))
+            ]
+        )
+    return time.perf_counter() - start
+
+
+def measure(layout: str, path: Path, args) -> dict:
+    """Reopen a layout and time retrieval queries for random pairs"""
+    start = time.perf_counter()
+    client = _client(path)
+    startup = time.perf_counter() - start
+
+    rng = random.Random(args.seed + 1)
+    query_rng = np.random.default_rng(args.seed + 2)
+    latencies = []
+
+    for _ in range(args.queries):
+        p = rng.randrange(args.pairs)
+        character_id, user_id = f"char{p % 25}", f"user{p}"
+        query = query_rng.standard_normal(args.dim).astype(np.float32)
+
+        q_start = time.perf_counter()
+        if layout == "per_pair":
+            collection = client.get_collection(name=pair_collection_name(character_id, user_id, PREFIX))
+            collection.query(query_embeddings=[query.tolist()], n_results=args.top_k)
+        else:
+            collection = client.get_collection(
+                name=shared_collection_name(character_id, user_id, args.shards, PREFIX)
+            )
+            collection.query(
+                query_embeddings=[query.tolist()],
+                n_results=args.top_k,
+                where=pair_filter(character_id, user_id)
+            )
+        latencies.append((time.perf_counter() - q_start) * 1000)
+
+    return {
+        "startup_s": startup,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "disk_mb": _disk_usage(path) / (1024 * 1024)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=200, help="Character-user pairs")
+    parser.add_argument("--messages", type=int, default=40, help="Messages per pair")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    parser.add_argument("--shards", type=int, default=1, help="Collections in the shared layout")
+    parser.add_argument("--queries", type=int, default=500, help="Retrieval queries to time")
+    parser.add_argument("--top-k", type=int, default=5, help="Results per query")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="echominds_bench_"))
+    try:
+        results = {}
+        for layout in ("per_pair", "shared"):
+            path = workdir / layout
+            build_s = build(layout, path, args)
+            results[layout] = {"build_s": build_s, **measure(layout, path, args)}
+
+        print(
+            f"\n{args.pairs} pairs x {args.messages} messages, dim={args.dim}, "
+            f"shards={args.shards}, {args.queries} queries (top_k={args.top_k})\n"
+        )
+        header = f"{'layout':<10}{'build s':>10}{'startup s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'disk MB':>10}"
+        print(header)
+        print("-" * len(header))
+        for layout, r in results.items():
+            print(
+                f"{layout:<10}{r['build_s']:>10.2f}{r['startup_s']:>11.3f}{r['p50_ms']:>9.2f}"
+                f"{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['disk_mb']:>10.1f}"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Migrate conversation vectors from per-pair collections to the shared layout.
+
+Every document keeps its id, embedding, text and metadata; it is copied
+into the shard collection for its (character_id, user_id) pair, which is
+read from the document metadata. Re-running is safe (documents are
+upserted).
+
+With --delete-source a per-pair collection is deleted only once every
+one of its documents is confirmed in the shard collections. Collections
+with documents lacking pair metadata (which can't be copied) are kept.
+
+Usage (from backend/):
+    python -m scripts.migrate_vector_layout --shards 4 --dry-run
+    python -m scripts.migrate_vector_layout --shards 4 --delete-source
+
+Afterwards set VECTOR_STORAGE_MODE=shared and VECTOR_SHARD_COUNT=<shards>.
+"""
+import argparse
+import logging
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config.settings import settings  # noqa: E402
+from rag.collection_layout import is_shared_collection, shared_collection_name  # noqa: E402
+
+logger = logging.getLogger("migrate_vector_layout")
+
+
+def _collection_names(client) -> list:
+    """List collection names (handles both old and new chromadb return types)"""
+    return [c if isinstance(c, str) else c.name for c in client.list_collections()]
+
+
+def _confirm_copied(client, copied: dict, page_size: int) -> bool:
+    """True if every copied id is present in its shard collection"""
+    for target, ids in copied.items():
+        collection = client.get_collection(name=target)
+        found = 0
+        for start in range(0, len(ids), page_size):
+            found += len(collection.get(ids=ids[start:start + page_size], include=[])["ids"])
+        if found != len(ids):
+            logger.error(f"{target} has {found} of {len(ids)} copied documents")
+            return False
+    return True
+
+
+def migrate(
+    db_path: Path,
+    shard_count: int,
+    page_size: int = 500,
+    dry_run: bool = False,
+    delete_source: bool = False
+) -> dict:
+    """Copy every per-pair collection into shared shard collections.
+
+    Returns:
+        Summary with migrated collection and document counts, and the
+        source collections kept despite ``delete_source``
+    """
+    client = chromadb.PersistentClient(
+        path=str(db_path),
+        settings=ChromaSettings(anonymized_telemetry=False, allow_reset=True)
+    )
+    prefix = settings.collection_prefix
+
+    sources = [
+        name for name in _collection_names(client)
+        if name.startswith(prefix) and not is_shared_collection(name, prefix)
+    ]
+    logger.info(f"Found {len(sources)} per-pair collections")
+
+    summary = {"collections": 0, "documents": 0, "skipped": 0, "shards": defaultdict(int), "kept": {}}
+
+    for name in sources:
+        source = client.get_collection(name=name)
+        total = source.count()
+        offset = 0
+        skipped = 0
+        copied = defaultdict(list)  # shard collection -> ids copied from this source
+
+        while offset < total:
+            page = source.get(
+                limit=page_size,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            offset += page_size
+
+            by_shard = defaultdict(lambda: {"ids": [], "embeddings": [], "documents": [], "metadatas": []})
+            for i, doc_id in enumerate(page["ids"]):
+                metadata = page["metadatas"][i] or {}
+                character_id = metadata.get("character_id")
+                user_id = metadata.get("user_id")
+                if not character_id or not user_id:
+                    skipped += 1
+                    continue
+
+                target = shared_collection_name(character_id, user_id, shard_count, prefix)
+                batch = by_shard[target]
+                batch["ids"].append(doc_id)
+                batch["embeddings"].append(page["embeddings"][i])
+                batch["documents"].append(page["documents"][i])
+                batch["metadatas"].append(metadata)
+
+            for target, batch in by_shard.items():
+                summary["documents"] += len(batch["ids"])
+                summary["shards"][target] += len(batch["ids"])
+                copied[target].extend(batch["ids"])
+                if dry_run:
+                    continue
+                client.get_or_create_collection(
+                    name=target,
+                    metadata={"hnsw:space": "cosine"}
+                ).upsert(**batch)
+
+        summary["collections"] += 1
+        summary["skipped"] += skipped
+        logger.info(f"{'[dry-run] ' if dry_run else ''}Migrated {name} ({total} documents)")
+
+        if not delete_source:
+            continue
+        if skipped:
+            summary["kept"][name] = f"{skipped} documents without pair metadata"
+        elif not dry_run and not _confirm_copied(client, dict(copied), page_size):
+            summary["kept"][name] = "copied documents missing from shard collections"
+        elif not dry_run:
+            client.delete_collection(name=name)
+        if name in summary["kept"]:
+            logger.warning(f"Keeping {name}: {summary['kept'][name]}")
+
+    summary["shards"] = dict(summary["shards"])
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-path", type=Path, default=settings.vector_db_path, help="ChromaDB directory")
+    parser.add_argument("--shards", type=int, default=settings.vector_shard_count, help="Number of shared collections")
+    parser.add_argument("--page-size", type=int, default=500, help="Documents read per request")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be migrated")
+    parser.add_argument("--delete-source", action="store_true", help="Delete per-pair collections after copying")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    summary = migrate(
+        db_path=args.db_path,
+        shard_count=args.shards,
+        page_size=args.page_size,
+        dry_run=args.dry_run,
+        delete_source=args.delete_source
+    )
+
+    logger.info(
+        f"Done: {summary['documents']} documents from {summary['collections']} collections "
+        f"into {len(summary['shards'])} shard(s); skipped {summary['skipped']} without pair metadata"
+    )
+    for name, reason in summary["kept"].items():
+        logger.warning(f"Source collection {name} was not deleted: {reason}")
+    if not args.dry_run:
+        logger.info(f"Now set VECTOR_STORAGE_MODE=shared and VECTOR_SHARD_COUNT={args.shards}")
+
+
+if __name__ == "__main__":
+    main()
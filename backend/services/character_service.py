@@ -1,18 +1,34 @@
 """Character service for loading and managing character profiles."""
 
+import asyncio
 import json
 import logging
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Optional
-from functools import lru_cache
 from uuid import uuid4
 
 from models.schemas import CharacterProfile, CharacterCreateRequest
 from config.settings import settings
+from services.message_parser import enhance_system_prompt_with_formatting
+from services.storage_utils import KeyedLocks, atomic_delete, atomic_write_json
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class StaticPrompt:
+    """Per-character prompt sections that don't change between turns."""
+    identity: str  # name and personality
+    persona: str   # character system prompt and example dialogues
+    closing: str   # in-character reminder and formatting guidelines
+    
+    @property
+    def text(self) -> str:
+        """The static prompt on its own (no per-turn context)."""
+        return "\n\n".join(filter(None, (self.identity, self.persona, self.closing)))
+
+
 class CharacterService:
     """Service for managing AI character profiles."""
     
@@ -20,6 +36,8 @@ class CharacterService:
         """Initialize character service and load profiles."""
         self.characters_dir = Path(settings.character_data_path)
         self._character_cache: Dict[str, CharacterProfile] = {}
+        self._locks = KeyedLocks()  # one writer per character file
+        self._static_prompts: Dict[str, StaticPrompt] = {}
         self._load_all_characters()
     
     def _load_all_characters(self) -> None:
@@ -62,9 +80,10 @@ class CharacterService:
         """Reload all character profiles from disk."""
         logger.info("Reloading character profiles...")
         self._character_cache.clear()
+        self._static_prompts.clear()
         self._load_all_characters()
     
-    def create_character(self, request: CharacterCreateRequest) -> CharacterProfile:
+    async def create_character(self, request: CharacterCreateRequest) -> CharacterProfile:
         """Create new character from request data.
         
         This method constructs a character with advanced settings:
@@ -82,11 +101,23 @@ class CharacterService:
         Raises:
             ValueError: If character with same name already exists
         """
-        # Check if character with this name already exists
-        existing = [c for c in self._character_cache.values() if c.name.lower() == request.name.lower()]
-        if existing:
-            raise ValueError(f"Character with name '{request.name}' already exists")
+        # Serialize creates per name so the uniqueness check can't race the save
+        async with self._locks.acquire(("name", request.name.lower())):
+            # Check if character with this name already exists
+            existing = [c for c in self._character_cache.values() if c.name.lower() == request.name.lower()]
+            if existing:
+                raise ValueError(f"Character with name '{request.name}' already exists")
+            
+            character = self._new_character(request)
+            
+            # Save to disk and cache
+            await self.save_character(character)
         
+        logger.info(f"Created character: {character.name} (ID: {character.id}) with relationship: {request.relationshipType}")
+        return character
+    
+    def _new_character(self, request: CharacterCreateRequest) -> CharacterProfile:
+        """Construct a profile (with greeting and system prompt) from a create request."""
         # Generate unique ID
         character_id = str(uuid4())[:8]
         
@@ -130,7 +161,7 @@ class CharacterService:
         system_prompt = self._build_advanced_system_prompt(request)
         
         # Construct character profile
-        character = CharacterProfile(
+        return CharacterProfile(
             id=character_id,
             name=request.name,
             avatar=request.avatar,
@@ -142,12 +173,6 @@ class CharacterService:
             systemPrompt=request.systemPromptOverride or system_prompt,
             exampleDialogues=[]  # Can be populated later
         )
-        
-        # Save to disk and cache
-        self.save_character(character)
-        
-        logger.info(f"Created character: {character.name} (ID: {character_id}) with relationship: {request.relationshipType}")
-        return character
     
     def _build_advanced_system_prompt(self, request: CharacterCreateRequest) -> str:
         """Build advanced system prompt with full user identity awareness.
@@ -267,9 +292,12 @@ class CharacterService:
         
         return "\n".join(filter(None, prompt_parts))
     
-    def save_character(self, character: CharacterProfile) -> None:
+    async def save_character(self, character: CharacterProfile) -> None:
         """Save character profile to disk.
         
+        The file is replaced atomically (temp file + fsync + rename), so a
+        crash mid-write leaves the previous version intact.
+        
         Args:
             character: Character profile to save
             
@@ -278,24 +306,24 @@ class CharacterService:
         """
         file_path = self.characters_dir / f"{character.id}.json"
         
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(
-                    character.model_dump(exclude_none=True),
-                    f,
-                    indent=2,
-                    ensure_ascii=False
+        async with self._locks.acquire(character.id):
+            try:
+                await asyncio.to_thread(
+                    atomic_write_json,
+                    file_path,
+                    character.model_dump(exclude_none=True)
                 )
-            
-            # Update cache
-            self._character_cache[character.id] = character
-            logger.info(f"Saved character: {character.name} ({character.id})")
-            
-        except Exception as e:
-            logger.error(f"Failed to save character {character.id}: {e}")
-            raise IOError(f"Could not save character: {e}")
+                
+                # Update cache
+                self._character_cache[character.id] = character
+                self._static_prompts.pop(character.id, None)
+                logger.info(f"Saved character: {character.name} ({character.id})")
+                
+            except Exception as e:
+                logger.error(f"Failed to save character {character.id}: {e}")
+                raise IOError(f"Could not save character: {e}")
     
-    def delete_character(self, character_id: str) -> bool:
+    async def delete_character(self, character_id: str) -> bool:
         """Delete character profile.
         
         Args:
@@ -304,69 +332,105 @@ class CharacterService:
         Returns:
             True if deleted, False if not found
         """
-        if character_id not in self._character_cache:
-            return False
-        
-        file_path = self.characters_dir / f"{character_id}.json"
-        
-        try:
-            if file_path.exists():
-                file_path.unlink()
+        async with self._locks.acquire(character_id):
+            if character_id not in self._character_cache:
+                return False
             
-            del self._character_cache[character_id]
-            logger.info(f"Deleted character: {character_id}")
-            return True
+            file_path = self.characters_dir / f"{character_id}.json"
             
-        except Exception as e:
-            logger.error(f"Failed to delete character {character_id}: {e}")
-            return False
+            try:
+                await asyncio.to_thread(atomic_delete, file_path)
+                
+                del self._character_cache[character_id]
+                self._static_prompts.pop(character_id, None)
+                logger.info(f"Deleted character: {character_id}")
+                return True
+                
+            except Exception as e:
+                logger.error(f"Failed to delete character {character_id}: {e}")
+                return False
     
-    @lru_cache(maxsize=100)
-    def build_system_prompt(
-        self,
-        character_id: str,
-        context: Optional[str] = None
-    ) -> str:
-        """Build system prompt for LLM with character personality.
+    def get_static_prompt(self, character_id: str) -> StaticPrompt:
+        """Get the precomputed static prompt sections for a character.
+        
+        Built once per character and dropped on save, delete and reload.
         
         Args:
             character_id: Character identifier
-            context: Optional RAG context to include
             
         Returns:
-            Complete system prompt string
+            StaticPrompt for the character
             
         Raises:
             ValueError: If character not found
         """
+        static = self._static_prompts.get(character_id)
+        if static is not None:
+            return static
+        
         character = self.get_character(character_id)
         if not character:
             raise ValueError(f"Character not found: {character_id}")
         
-        prompt_parts = [
-            f"You are {character.name}.",
-            f"Personality: {character.personality}",
-        ]
-        
+        persona_parts = []
         if character.systemPrompt:
-            prompt_parts.append(f"\n{character.systemPrompt}")
+            persona_parts.append(character.systemPrompt)
         
         if character.exampleDialogues:
-            prompt_parts.append("\nExample dialogues:")
+            example_lines = ["Example dialogues:"]
             for example in character.exampleDialogues[:3]:  # Limit to 3 examples
-                prompt_parts.append(f"User: {example.get('user', '')}")
-                prompt_parts.append(f"Assistant: {example.get('assistant', '')}")
+                example_lines.append(f"User: {example.get('user', '')}")
+                example_lines.append(f"Assistant: {example.get('assistant', '')}")
+            persona_parts.append("\n".join(example_lines))
+        
+        static = StaticPrompt(
+            identity=f"You are {character.name}.\nPersonality: {character.personality}",
+            persona="\n\n".join(persona_parts),
+            closing=enhance_system_prompt_with_formatting(
+                f"Speak as {character.name} would speak. "
+                f"Stay in character and provide helpful, engaging responses."
+            )
+        )
+        self._static_prompts[character_id] = static
+        return static
+    
+    def build_system_prompt(
+        self,
+        character_id: str,
+        context: Optional[str] = None,
+        memory_context: Optional[str] = None
+    ) -> str:
+        """Build system prompt for LLM with character personality.
         
-        if context:
-            prompt_parts.append(f"\nRelevant context from previous conversations:")
-            prompt_parts.append(context)
+        Only the per-turn sections are assembled here; the rest comes
+        from the cached static prompt.
         
-        prompt_parts.append(
-            f"\nSpeak as {character.name} would speak. "
-            f"Stay in character and provide helpful, engaging responses."
-        )
+        Args:
+            character_id: Character identifier
+            context: Optional RAG context to include
+            memory_context: Optional long-term memory block (placed after identity)
+            
+        Returns:
+            Complete system prompt string
+            
+        Raises:
+            ValueError: If character not found
+        """
+        static = self.get_static_prompt(character_id)
+        if not context and not memory_context:
+            return static.text
         
-        return "\n".join(prompt_parts)
+        context_block = None
+        if context:
+            context_block = f"Relevant context from previous conversations:\n{context}"
+        
+        return "\n\n".join(filter(None, (
+            static.identity,
+            memory_context,
+            static.persona,
+            context_block,
+            static.closing
+        )))
 
 
 # Global character service instance
@@ -1,30 +1,81 @@
 """Chat service orchestrating LLM, RAG, character management, and long-term memory."""
 
+import asyncio
 import logging
 import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from uuid import uuid4
 
 from models.schemas import (
     ChatMessage,
     ChatResponse,
+    CharacterProfile,
     ConversationMessage,
-    ContextMessage
+    ContextMessage,
+    MemoryEntry
 )
 from services.character_service import character_service
+from services.conversation_summarizer import conversation_summarizer
+from services.memory_extractor import memory_extractor
 from services.memory_service import memory_service
-from services.message_parser import (
-    parse_structured_message,
-    enhance_system_prompt_with_formatting
+from services.message_parser import parse_structured_message
+from services.metrics import (
+    CONTEXT_STAGE_TIMEOUTS, observe_stage, record_generation, record_turn, timed, timed_stage
 )
-from llm.ollama_service import ollama_service
+from services.context_packer import (
+    MEMORY_HEADER,
+    MAX_SNIPPETS,
+    SNIPPET_HEADER,
+    SUMMARY_HEADER,
+    context_packer,
+    format_memory,
+    format_snippet
+)
+from llm.base import GenerationResult
+from llm.provider import llm_service
+from llm.scheduler import Priority, SchedulerRejected, Ticket, TicketedStream, llm_scheduler
 from rag.vector_service import rag_service
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class PreparedTurn:
+    """Everything assembled for a chat turn before LLM generation."""
+    character: CharacterProfile
+    user_id: str
+    message: str
+    conversation_id: str
+    system_prompt: str
+    history: List[Dict[str, str]]
+    context_messages: List[Dict[str, Any]]
+    query_embedding: Optional[List[float]]
+    start_time: float
+    context_prompt: Optional[str] = None  # per-turn context sent after history (stable_prefix layout)
+    context_tokens: Dict[str, Any] = field(default_factory=dict)  # estimated tokens per prompt section
+    queue_wait: float = 0.0  # seconds waiting for a generation slot
+    
+    @property
+    def llm_history(self) -> List[Dict[str, str]]:
+        """History as sent to the LLM, with the per-turn context appended last."""
+        if not self.context_prompt:
+            return self.history
+        return self.history + [{"role": "system", "content": self.context_prompt}]
+    
+    @property
+    def prompt_texts(self) -> List[str]:
+        """Contents of every message in the prompt, for token calibration."""
+        return [self.system_prompt] + [msg["content"] for msg in self.llm_history] + [self.message]
+    
+    @property
+    def session_id(self) -> str:
+        """LLM session key: one running conversation per character/user pair."""
+        return f"{self.character.id}:{self.user_id}"
+
+
 class ChatService:
     """Service for processing chat messages with RAG and LLM."""
     
@@ -33,7 +84,8 @@ class ChatService:
         character_id: str,
         user_id: str,
         message: str,
-        conversation_id: Optional[str] = None
+        conversation_id: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE
     ) -> ChatResponse:
         """Process user message and generate AI response.
         
@@ -42,24 +94,206 @@ class ChatService:
         2. Load character profile
         3. Retrieve RAG context
         4. Get recent conversation history
-        5. Build prompt
-        6. Generate LLM response
-        7. Store conversation
-        8. Return response
+        5. Pack context into the token budget
+        6. Build prompt
+        7. Generate LLM response
+        8. Store conversation
+        9. Return response
         
         Args:
             character_id: Character identifier
             user_id: User identifier
             message: User message text
             conversation_id: Optional conversation tracking ID
+            priority: Scheduler priority for the generation
             
         Returns:
             ChatResponse with AI reply and context
             
         Raises:
             ValueError: If input validation fails
+            SchedulerRejected: If the generation queue is full or the wait times out
             Exception: If LLM generation fails
         """
+        # Admission first, so an overloaded server answers before doing retrieval
+        ticket = self._admit(priority, character_id, user_id)
+        try:
+            turn = await self._prepare_turn(
+                character_id=character_id,
+                user_id=user_id,
+                message=message,
+                conversation_id=conversation_id
+            )
+        except BaseException:
+            ticket.close()
+            raise
+        
+        stage = "llm"
+        try:
+            # 8. Generate LLM response
+            async with ticket:
+                turn.queue_wait = ticket.wait_time
+                observe_stage("queue_wait", character_id, ticket.wait_time)
+                with timed_stage("llm_total", character_id):
+                    result = await llm_service.generate(
+                        prompt=message,
+                        system_prompt=turn.system_prompt,
+                        conversation_history=turn.llm_history,
+                        temperature=settings.temperature,
+                        max_tokens=settings.max_tokens,
+                        session_id=turn.session_id
+                    )
+            if result.first_token_seconds is not None:
+                # No tokens to watch here, so use the provider's own timings
+                observe_stage("llm_first_token", character_id, result.first_token_seconds)
+            record_generation(result)
+            context_packer.observe(result.model, turn.prompt_texts, result.prompt_tokens)
+            
+            stage = "store"
+            response = await self._complete_turn(turn, result)
+            record_turn(character_id, "ok")
+            return response
+            
+        except SchedulerRejected:
+            record_turn(character_id, "rejected")
+            raise
+        except Exception as e:
+            record_turn(character_id, "error", failed_stage=stage)
+            logger.error(f"Error processing message: {e}", exc_info=True)
+            raise Exception(f"Failed to generate response: {str(e)}")
+    
+    async def stream_message(
+        self,
+        character_id: str,
+        user_id: str,
+        message: str,
+        conversation_id: Optional[str] = None
+    ) -> TicketedStream:
+        """Process user message and stream the AI response token by token.
+        
+        Context retrieval and prompt building run before this method
+        returns, so validation errors are raised here rather than in the
+        middle of the stream.
+        
+        Args:
+            character_id: Character identifier
+            user_id: User identifier
+            message: User message text
+            conversation_id: Optional conversation tracking ID
+            
+        Returns:
+            Async iterator of events: ``{"event": "token", "data": {...}}``
+            for every generated chunk, then one ``done`` event carrying the
+            full ChatResponse (or an ``error`` event on failure). It holds a
+            scheduler ticket; ``aclose`` it when the response is finished,
+            even if it was never iterated.
+            
+        Raises:
+            ValueError: If input validation fails
+            SchedulerRejected: If the generation queue is full
+        """
+        ticket = self._admit(Priority.INTERACTIVE, character_id, user_id)
+        try:
+            turn = await self._prepare_turn(
+                character_id=character_id,
+                user_id=user_id,
+                message=message,
+                conversation_id=conversation_id
+            )
+        except BaseException:
+            ticket.close()
+            raise
+        return TicketedStream(self._stream_turn(turn, ticket), ticket)
+    
+    async def _stream_turn(self, turn: PreparedTurn, ticket: Ticket) -> AsyncIterator[Dict[str, Any]]:
+        """Generate streamed tokens for a prepared turn and finalize it.
+        
+        Args:
+            turn: Prepared turn from _prepare_turn
+            ticket: Admitted scheduler ticket; the slot is held while streaming
+            
+        Yields:
+            Token events followed by a done (or error) event
+        """
+        result = GenerationResult(model=llm_service.current_model)
+        character_id = turn.character.id
+        stage = "llm"
+        
+        try:
+            async with ticket:
+                turn.queue_wait = ticket.wait_time
+                observe_stage("queue_wait", character_id, ticket.wait_time)
+                with timed_stage("llm_total", character_id):
+                    generation_start = time.perf_counter()
+                    first_token = True
+                    async for token in llm_service.generate_stream(
+                        prompt=turn.message,
+                        system_prompt=turn.system_prompt,
+                        conversation_history=turn.llm_history,
+                        temperature=settings.temperature,
+                        max_tokens=settings.max_tokens,
+                        session_id=turn.session_id,
+                        result=result
+                    ):
+                        if first_token:
+                            first_token = False
+                            observe_stage("llm_first_token", character_id, time.perf_counter() - generation_start)
+                            logger.debug(
+                                f"First token after {time.time() - turn.start_time:.2f}s"
+                            )
+                        yield {"event": "token", "data": {"content": token}}
+            record_generation(result)
+            context_packer.observe(result.model, turn.prompt_texts, result.prompt_tokens)
+            
+            stage = "store"
+            response = await self._complete_turn(turn, result)
+            record_turn(character_id, "ok")
+            yield {"event": "done", "data": response.model_dump()}
+            
+        except SchedulerRejected as e:
+            record_turn(character_id, "rejected")
+            yield {
+                "event": "error",
+                "data": {"detail": str(e), "status": e.status_code, "retryAfter": e.retry_after}
+            }
+        except Exception as e:
+            record_turn(character_id, "error", failed_stage=stage)
+            logger.error(f"Error streaming message: {e}", exc_info=True)
+            yield {
+                "event": "error",
+                "data": {"detail": f"Failed to generate response: {str(e)}"}
+            }
+    
+    def _admit(self, priority: Priority, character_id: str, user_id: str) -> Ticket:
+        """Admit a generation with the scheduler, counting rejections"""
+        try:
+            return llm_scheduler.submit(priority, user_id)
+        except SchedulerRejected:
+            record_turn(character_id, "rejected")
+            raise
+    
+    async def _prepare_turn(
+        self,
+        character_id: str,
+        user_id: str,
+        message: str,
+        conversation_id: Optional[str] = None
+    ) -> PreparedTurn:
+        """Validate input and assemble everything needed before generation.
+        
+        Args:
+            character_id: Character identifier
+            user_id: User identifier
+            message: User message text
+            conversation_id: Optional conversation tracking ID
+            
+        Returns:
+            PreparedTurn with system prompt, history and retrieved context
+            
+        Raises:
+            ValueError: If input validation fails
+            Exception: If context retrieval fails
+        """
         start_time = time.time()
         
         # 1. Validate input
@@ -80,177 +314,373 @@ class ChatService:
         )
         
         try:
-            # 3. Retrieve long-term memories
-            memories = memory_service.get_relevant_memories(
+            # 3-5. Retrieve memories, RAG context and history concurrently
+            memories, context_messages, history, summary, query_embedding = await self._gather_context(
                 character_id=character_id,
                 user_id=user_id,
-                query=message,
-                limit=8  # Top 8 relevant memories
+                message=message
             )
             
-            logger.debug(f"Retrieved {len(memories)} long-term memories")
+            history = [
+                {"role": msg["role"], "content": msg["content"]}
+                for msg in history
+            ]
             
-            # 4. Retrieve RAG context
-            context_messages = await rag_service.retrieve_context(
-                character_id=character_id,
-                user_id=user_id,
-                query=message,
-                top_k=5
-            )
+            with timed_stage("prompt_build", character_id):
+                # 6. Fit memories, history and snippets into the context window
+                packed = context_packer.pack(
+                    system_prompt=character_service.get_static_prompt(character_id).text,
+                    message=message,
+                    memories=memories,
+                    history=history,
+                    snippets=context_messages,
+                    summary=summary,
+                    model=llm_service.current_model
+                )
+                
+                # 7. Build prompt with memories
+                system_prompt, context_prompt = self._build_system_prompt(
+                    character_id=character_id,
+                    context_messages=packed.snippets,
+                    memories=packed.memories,
+                    summary=packed.summary
+                )
             
-            logger.debug(f"Retrieved {len(context_messages)} context messages")
+        except Exception as e:
+            record_turn(character_id, "error", failed_stage="context")
+            logger.error(f"Error preparing message context: {e}", exc_info=True)
+            raise Exception(f"Failed to generate response: {str(e)}")
+        
+        return PreparedTurn(
+            character=character,
+            user_id=user_id,
+            message=message,
+            conversation_id=conversation_id or str(uuid4()),
+            system_prompt=system_prompt,
+            history=packed.history,
+            context_messages=context_messages,
+            query_embedding=query_embedding,
+            start_time=start_time,
+            context_prompt=context_prompt,
+            context_tokens=packed.report()
+        )
+    
+    async def _gather_context(
+        self,
+        character_id: str,
+        user_id: str,
+        message: str
+    ) -> Tuple[List[MemoryEntry], List[Dict[str, Any]], List[Dict[str, Any]], str, Optional[List[float]]]:
+        """Run the context lookups for a turn in parallel, off the event loop.
+        
+        Each stage gets its own timeout budget (``context_stage_timeout``);
+        a stage that runs over is dropped from the prompt instead of
+        holding up the whole turn. The message is embedded once and the
+        vector is returned so storing the turn can reuse it.
+        
+        Args:
+            character_id: Character identifier
+            user_id: User identifier
+            message: User message used as retrieval query
             
-            # 5. Get recent conversation history
-            history = await rag_service.get_recent_messages(
-                character_id=character_id,
-                user_id=user_id,
-                limit=6  # Last 3 exchanges (6 messages)
+        Returns:
+            Tuple of (long-term memories, RAG context, recent history,
+            running summary, query embedding or None if embedding failed
+            or timed out)
+        """
+        embedding_task = asyncio.create_task(timed("embedding", character_id, rag_service.embed_text(message)))
+        
+        memories, context_messages, history, summary = await asyncio.gather(
+            self._run_stage(
+                "memory lookup",
+                self._retrieve_memories(
+                    character_id=character_id,
+                    user_id=user_id,
+                    message=message,
+                    embedding_task=embedding_task
+                )
+            ),
+            self._run_stage(
+                "RAG retrieval",
+                self._retrieve_rag_context(
+                    character_id=character_id,
+                    user_id=user_id,
+                    message=message,
+                    embedding_task=embedding_task
+                )
+            ),
+            self._run_stage(
+                "history fetch",
+                timed("history_fetch", character_id, rag_service.get_recent_messages(
+                    character_id=character_id,
+                    user_id=user_id,
+                    limit=settings.history_messages  # Last 3 exchanges (6 messages) by default
+                ))
+            ),
+            self._run_stage(
+                "summary fetch",
+                timed("summary_fetch", character_id, conversation_summarizer.get_summary(character_id, user_id)),
+                empty=str
             )
+        )
+        
+        logger.debug(
+            f"Retrieved {len(memories)} long-term memories, "
+            f"{len(context_messages)} context messages, "
+            f"{len(history)} recent messages"
+            f"{', summary' if summary else ''}"
+        )
+        
+        query_embedding = None
+        if embedding_task.done() and not embedding_task.cancelled() and not embedding_task.exception():
+            query_embedding = embedding_task.result()
+        
+        return memories, context_messages, history, summary, query_embedding
+    
+    async def _retrieve_memories(
+        self,
+        character_id: str,
+        user_id: str,
+        message: str,
+        embedding_task: "asyncio.Task[List[float]]"
+    ) -> List[MemoryEntry]:
+        """Rank long-term memories against the shared query embedding.
+        
+        Memories stored before they carried embeddings are encoded once
+        here (one batch) so they take part in semantic ranking.
+        
+        Args:
+            character_id: Character identifier
+            user_id: User identifier
+            message: User message used as retrieval query
+            embedding_task: Task computing the message embedding
             
-            logger.debug(f"Retrieved {len(history)} recent messages")
-            
-            # 6. Build prompt with memories
-            system_prompt = self._build_system_prompt(
-                character_id=character_id,
-                context_messages=context_messages,
-                memories=memories
-            )
+        Returns:
+            Top relevant memories (importance-ranked if embedding failed)
+        """
+        query_embedding = None
+        try:
+            query_embedding = await asyncio.shield(embedding_task)
             
-            # 7. Generate LLM response
-            ai_response = await ollama_service.generate(
-                prompt=message,
-                system_prompt=system_prompt,
-                conversation_history=[
-                    {"role": msg["role"], "content": msg["content"]} 
-                    for msg in history
-                ],
-                temperature=settings.temperature,
-                max_tokens=settings.max_tokens
+            missing = await asyncio.to_thread(
+                memory_service.get_memories_without_embeddings, character_id, user_id
             )
-            
-            response_time = time.time() - start_time
-            logger.info(f"Generated response in {response_time:.2f}s")
-            
-            # Parse structured message
-            structured_content = parse_structured_message(ai_response)
-            logger.debug(f"Parsed structured content: {structured_content.model_dump()}")
-            
-            # Generate conversation ID if not provided
-            conv_id = conversation_id or str(uuid4())
-            
-            # 7. Store conversation in vector DB (user message + assistant response)
-            await rag_service.store_conversation(
+            if missing:
+                vectors = await rag_service.embed_texts([m.content for m in missing])
+                await asyncio.to_thread(
+                    memory_service.set_embeddings, character_id, user_id, missing, vectors
+                )
+                logger.info(f"Backfilled {len(missing)} memory embeddings for {character_id}/{user_id}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Semantic memory ranking unavailable: {e}")
+        
+        with timed_stage("memory_load", character_id):
+            return await asyncio.to_thread(
+                memory_service.get_relevant_memories,
                 character_id=character_id,
                 user_id=user_id,
-                role="user",
-                content=message,
-                metadata={"conversation_id": conv_id, "timestamp": datetime.now().isoformat()}
+                query=message,
+                limit=8,  # Top 8 relevant memories
+                query_embedding=query_embedding
             )
+    
+    async def _retrieve_rag_context(
+        self,
+        character_id: str,
+        user_id: str,
+        message: str,
+        embedding_task: "asyncio.Task[List[float]]"
+    ) -> List[Dict[str, Any]]:
+        """Wait for the shared query embedding, then query the vector store.
+        
+        Args:
+            character_id: Character identifier
+            user_id: User identifier
+            message: User message used as retrieval query
+            embedding_task: Task computing the message embedding
             
-            await rag_service.store_conversation(
+        Returns:
+            Retrieved context messages (empty if embedding failed)
+        """
+        try:
+            # Shield so a stage timeout doesn't discard the embedding
+            query_embedding = await asyncio.shield(embedding_task)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to embed query: {e}")
+            return []
+        
+        with timed_stage("vector_query", character_id):
+            return await rag_service.retrieve_context(
                 character_id=character_id,
                 user_id=user_id,
-                role="assistant",
-                content=ai_response,
-                metadata={"conversation_id": conv_id, "timestamp": datetime.now().isoformat()}
+                query=message,
+                top_k=5,
+                query_embedding=query_embedding
             )
+    
+    async def _run_stage(self, name: str, awaitable: Awaitable[Any], empty: Callable[[], Any] = list) -> Any:
+        """Await a context stage within its timeout budget.
+        
+        Args:
+            name: Stage name for logging
+            awaitable: Stage coroutine
+            empty: Factory for the result used when the stage times out
             
-            # 9. Return response
-            return ChatResponse(
-                reply=ai_response,
-                characterName=character.name,
-                conversationId=conversation_id or str(uuid4()),
-                context=[
-                    ContextMessage(
-                        content=msg.get("content", "") if isinstance(msg, dict) else msg.content,
-                        role=msg.get("role", "user") if isinstance(msg, dict) else msg.role,
-                        timestamp=msg.get("timestamp", "") if isinstance(msg, dict) else msg.timestamp,
-                        relevance=msg.get("metadata", {}).get("relevance", 0.0) if isinstance(msg, dict) else msg.metadata.get("relevance", 0.0)
-                    )
-                    for msg in context_messages
-                ],
-                metadata={
-                    "responseTime": round(response_time, 3),
-                    "tokenCount": len(ai_response.split()),  # Approximate
-                    "model": settings.default_model,
-                    "contextUsed": len(context_messages)
-                },
-                structured=structured_content  # Add structured content
+        Returns:
+            Stage result, or ``empty()`` if the stage timed out
+        """
+        stage_start = time.time()
+        try:
+            result = await asyncio.wait_for(awaitable, timeout=settings.context_stage_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Context stage '{name}' exceeded {settings.context_stage_timeout}s budget, skipping"
             )
+            CONTEXT_STAGE_TIMEOUTS.labels(stage=name).inc()
+            return empty()
+        
+        logger.debug(f"Context stage '{name}' took {time.time() - stage_start:.3f}s")
+        return result
+    
+    async def _complete_turn(self, turn: PreparedTurn, result: GenerationResult) -> ChatResponse:
+        """Parse, store and package a generated reply.
+        
+        Args:
+            turn: Prepared turn from _prepare_turn
+            result: Generated reply with its token stats
             
-        except Exception as e:
-            logger.error(f"Error processing message: {e}", exc_info=True)
-            raise Exception(f"Failed to generate response: {str(e)}")
+        Returns:
+            ChatResponse with AI reply, context and structured content
+        """
+        character_id = turn.character.id
+        user_id = turn.user_id
+        context_messages = turn.context_messages
+        ai_response = result.text
+        
+        response_time = time.time() - turn.start_time
+        logger.info(f"Generated response in {response_time:.2f}s")
+        observe_stage("total", character_id, response_time)
+        
+        # Parse structured message
+        with timed_stage("parse", character_id):
+            structured_content = parse_structured_message(ai_response)
+        logger.debug(f"Parsed structured content: {structured_content.model_dump()}")
+        
+        conv_id = turn.conversation_id
+        
+        # 9. Store conversation in vector DB (user message + assistant response)
+        # Indexing is write-behind, so the reply doesn't wait on it. The user
+        # message reuses the query embedding from retrieval; the reply is
+        # encoded in the background flush.
+        with timed_stage("store", character_id):
+            await rag_service.enqueue_messages(
+                character_id=character_id,
+                user_id=user_id,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": turn.message,
+                        "metadata": {
+                            "conversation_id": conv_id,
+                            "timestamp": datetime.fromtimestamp(turn.start_time).isoformat()
+                        },
+                        "embedding": turn.query_embedding
+                    },
+                    {
+                        "role": "assistant",
+                        "content": ai_response,
+                        "metadata": {"conversation_id": conv_id, "timestamp": datetime.now().isoformat()}
+                    }
+                ]
+            )
+        
+        # Background jobs run once chat is idle: fold aged-out turns into the
+        # running summary, extract durable facts as AUTO memories
+        conversation_summarizer.schedule(character_id, user_id)
+        memory_extractor.schedule(character_id, user_id)
+        
+        # 10. Return response
+        return ChatResponse(
+            reply=ai_response,
+            characterName=turn.character.name,
+            conversationId=conv_id,
+            context=[
+                ContextMessage(
+                    content=msg.get("content", "") if isinstance(msg, dict) else msg.content,
+                    role=msg.get("role", "user") if isinstance(msg, dict) else msg.role,
+                    timestamp=msg.get("timestamp", "") if isinstance(msg, dict) else msg.timestamp,
+                    relevance=msg.get("metadata", {}).get("relevance", 0.0) if isinstance(msg, dict) else msg.metadata.get("relevance", 0.0)
+                )
+                for msg in context_messages
+            ],
+            metadata={
+                "responseTime": round(response_time, 3),
+                "tokenCount": result.completion_tokens if result.completion_tokens is not None else len(ai_response.split()),
+                "model": result.model or settings.default_model,
+                "contextUsed": len(context_messages),
+                "contextTokens": turn.context_tokens,
+                "queueWait": round(turn.queue_wait, 3),
+                "generation": result.usage()
+            },
+            structured=structured_content  # Add structured content
+        )
     
     def _build_system_prompt(
         self,
         character_id: str,
         context_messages: List[ConversationMessage],
-        memories: List = None
-    ) -> str:
+        memories: List = None,
+        summary: str = ""
+    ) -> Tuple[str, Optional[str]]:
         """Build system prompt with character personality, context, and long-term memories.
         
+        With ``prompt_layout=stable_prefix`` the system prompt is the cached
+        static character prompt, byte-identical every turn, so the model
+        server can reuse its prompt KV cache. Memories and RAG context are
+        returned separately and sent after the history. With ``inline``
+        they are injected into the system prompt (legacy layout).
+        
         Args:
             character_id: Character identifier
             context_messages: RAG retrieved context
             memories: Long-term memory entries
+            summary: Running summary of older turns
             
         Returns:
-            Complete system prompt string
+            Tuple of (system prompt, per-turn context prompt or None)
         """
-        # Get base system prompt with character personality
+        # Per-turn sections; the static character prompt is cached
         context_text = None
         
         # 1. Inject long-term memories first (most important)
         memory_context = None
         if memories:
-            memory_parts = ["=== LONG-TERM MEMORIES ==="]
-            memory_parts.append("Things you remember about this user and your relationship:\n")
-            
-            for mem in memories:
-                # Pinned memories get priority marker
-                pin_marker = "📌 " if mem.isPinned else ""
-                type_label = mem.memoryType.upper()
-                
-                memory_parts.append(f"{pin_marker}[{type_label}] {mem.content}")
-            
-            memory_context = "\n".join(memory_parts)
+            memory_context = MEMORY_HEADER + "\n".join(format_memory(mem) for mem in memories)
+        
+        # Older turns are represented by the running summary
+        if summary:
+            memory_context = "\n\n".join(filter(None, (memory_context, SUMMARY_HEADER + summary)))
         
         # 2. Add conversation context (RAG)
         if context_messages:
-            context_parts = ["=== RECENT CONTEXT ==="]
-            for msg in context_messages[:3]:  # Top 3 most relevant
-                msg_role = msg.get("role", "user") if isinstance(msg, dict) else msg.role
-                msg_content = msg.get("content", "") if isinstance(msg, dict) else msg.content
-                msg_metadata = msg.get("metadata", {}) if isinstance(msg, dict) else msg.metadata
-                
-                role_label = "User" if msg_role == "user" else "You"
-                relevance = msg_metadata.get("relevance", 0)
-                context_parts.append(
-                    f"{role_label}: {msg_content[:200]} "
-                    f"(relevance: {relevance:.2f})"
-                )
-            context_text = "\n".join(context_parts)
-        
-        # 3. Build complete prompt
-        base_prompt = character_service.build_system_prompt(
-            character_id=character_id,
-            context=context_text
-        )
-        
-        # Enhance with formatting instructions for structured messages
-        base_prompt = enhance_system_prompt_with_formatting(base_prompt)
+            context_text = "\n".join(
+                [SNIPPET_HEADER] + [format_snippet(msg) for msg in context_messages[:MAX_SNIPPETS]]
+            )
         
-        # Inject memories at the top (after character identity)
-        if memory_context:
-            # Split base prompt to inject memories after character identity
-            prompt_parts = base_prompt.split("\n\n", 1)
-            if len(prompt_parts) == 2:
-                return f"{prompt_parts[0]}\n\n{memory_context}\n\n{prompt_parts[1]}"
-            else:
-                return f"{base_prompt}\n\n{memory_context}"
+        # 3. Assemble around the cached static character prompt
+        if settings.prompt_layout == "stable_prefix":
+            context_prompt = "\n\n".join(filter(None, (memory_context, context_text)))
+            return character_service.get_static_prompt(character_id).text, context_prompt or None
         
-        return base_prompt
+        return character_service.build_system_prompt(
+            character_id=character_id,
+            context=context_text,
+            memory_context=memory_context
+        ), None
     
     def _build_message_history(
         self,
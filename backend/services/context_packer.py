@@ -0,0 +1,255 @@
+"""Context packer: fit memories, history and RAG snippets into the model's context window."""
+
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from models.schemas import MemoryEntry
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+MEMORY_HEADER = (
+    "=== LONG-TERM MEMORIES ===\n"
+    "Things you remember about this user and your relationship:\n"
+)
+SNIPPET_HEADER = "=== RECENT CONTEXT ==="
+SUMMARY_HEADER = "=== CONVERSATION SO FAR ===\n"
+MAX_SNIPPETS = 3  # Top 3 most relevant
+SNIPPET_CHARS = 200
+CALIBRATION_SMOOTHING = 0.2  # weight of each new sample in the per-model ratio
+CACHE_REUSE_RATIO = 1.5  # samples this far above the current ratio evaluated only part of the prompt
+
+
+def format_memory(memory: MemoryEntry) -> str:
+    """Prompt line for a long-term memory"""
+    # Pinned memories get priority marker
+    pin_marker = "📌 " if memory.isPinned else ""
+    return f"{pin_marker}[{memory.memoryType.upper()}] {memory.content}"
+
+
+def format_snippet(message: Any) -> str:
+    """Prompt line for a retrieved conversation snippet (dict or ConversationMessage)"""
+    if isinstance(message, dict):
+        role, content, metadata = message.get("role", "user"), message.get("content", ""), message.get("metadata", {})
+    else:
+        role, content, metadata = message.role, message.content, message.metadata
+
+    role_label = "User" if role == "user" else "You"
+    return f"{role_label}: {content[:SNIPPET_CHARS]} (relevance: {metadata.get('relevance', 0):.2f})"
+
+
+class TokenEstimator:
+    """Approximate token counts without loading the model's tokenizer.
+
+    Uses a characters-per-token ratio (``token_chars_per_token``), plus a
+    fixed overhead per chat message for the template's role markers.
+
+    The ratio is calibrated per model from the prompt token counts the
+    LLM reports (``observe``), since Indonesian text, emoji and roleplay
+    formatting tokenize very differently from English. Reported counts
+    exclude a reused KV-cache prefix, so samples that imply far more
+    characters per token than expected are skipped as partial.
+    """
+
+    def __init__(self, chars_per_token: float, message_overhead: int = 4):
+        self.chars_per_token = chars_per_token
+        self.message_overhead = message_overhead
+        self._model_ratios: Dict[str, float] = {}
+
+    def for_model(self, model: str) -> "TokenEstimator":
+        """Estimator using the ratio calibrated for ``model`` (the default until observed)"""
+        return TokenEstimator(self._model_ratios.get(model, self.chars_per_token), self.message_overhead)
+
+    def observe(self, model: str, prompt_texts: List[str], prompt_tokens: Optional[int]) -> None:
+        """Calibrate ``model``'s ratio from a prompt and the tokens the LLM counted for it"""
+        template_tokens = self.message_overhead * len(prompt_texts)
+        if not prompt_tokens or prompt_tokens <= template_tokens:
+            return
+        current = self._model_ratios.get(model, self.chars_per_token)
+        sample = sum(len(text) for text in prompt_texts) / (prompt_tokens - template_tokens)
+        if sample > current * CACHE_REUSE_RATIO:
+            return
+        self._model_ratios[model] = current + CALIBRATION_SMOOTHING * (sample - current)
+        logger.debug(f"Token ratio for {model}: {self._model_ratios[model]:.2f} chars/token (sample {sample:.2f})")
+
+    def count(self, text: Optional[str]) -> int:
+        """Estimated tokens in a piece of text"""
+        if not text:
+            return 0
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def count_message(self, content: Optional[str]) -> int:
+        """Estimated tokens for one chat message, including template overhead"""
+        return self.count(content) + self.message_overhead
+
+
+@dataclass
+class PackedContext:
+    """Context selected for a turn and the tokens each section uses."""
+    memories: List[MemoryEntry] = field(default_factory=list)
+    summary: str = ""
+    history: List[Dict[str, str]] = field(default_factory=list)
+    snippets: List[Dict[str, Any]] = field(default_factory=list)
+    tokens: Dict[str, int] = field(default_factory=dict)
+    dropped: Dict[str, int] = field(default_factory=dict)
+
+    def report(self) -> Dict[str, Any]:
+        """Per-section token usage for response metadata"""
+        return {**self.tokens, "dropped": self.dropped}
+
+
+class ContextPacker:
+    """Fill the prompt token budget by priority.
+
+    Budget = ``context_length`` less ``context_safety_margin`` (a share
+    kept free for estimation error) - ``max_tokens`` (room for the reply)
+    - ``context_reserve_tokens`` - the fixed parts of the prompt (static
+    system prompt and user message), counted with the current model's
+    calibrated estimator. It is then spent in order on:
+
+    1. pinned memories
+    2. running summary of older turns
+    3. recent turns (newest first, kept contiguous)
+    4. other relevant memories (in rank order)
+    5. retrieved snippets (top ``MAX_SNIPPETS``)
+
+    Items that don't fit are dropped; lower-priority sections still get
+    whatever budget is left.
+    """
+
+    def __init__(self, estimator: Optional[TokenEstimator] = None):
+        self.estimator = estimator or TokenEstimator(settings.token_chars_per_token)
+
+    def available(self, *fixed_texts: str, estimator: Optional[TokenEstimator] = None) -> int:
+        """Tokens left for variable context after the margins, reply reserve and fixed messages"""
+        estimator = estimator or self.estimator
+        fixed = sum(estimator.count_message(text) for text in fixed_texts)
+        usable = math.floor(settings.context_length * (1 - settings.context_safety_margin))
+        return usable - settings.max_tokens - settings.context_reserve_tokens - fixed
+
+    def observe(self, model: str, prompt_texts: List[str], prompt_tokens: Optional[int]) -> None:
+        """Feed a generation's reported prompt tokens back into the estimator"""
+        self.estimator.observe(model, prompt_texts, prompt_tokens)
+
+    def pack(
+        self,
+        system_prompt: str,
+        message: str,
+        memories: List[MemoryEntry],
+        history: List[Dict[str, str]],
+        snippets: List[Dict[str, Any]],
+        summary: str = "",
+        model: Optional[str] = None
+    ) -> PackedContext:
+        """Select the memories, history and snippets that fit the budget.
+
+        Args:
+            system_prompt: Static system prompt (always sent)
+            message: Current user message (always sent)
+            memories: Ranked memories (pinned first)
+            history: Recent messages, oldest first
+            snippets: Retrieved snippets, most relevant first
+            summary: Running summary of turns older than ``history``
+            model: Model the prompt is for (selects the calibrated ratio)
+
+        Returns:
+            PackedContext with the selected items and token usage
+        """
+        estimator = self.estimator.for_model(model) if model else self.estimator
+        budget = self.available(system_prompt, message, estimator=estimator)
+        remaining = budget
+        packed = PackedContext()
+
+        # The per-turn context travels as its own message
+        context_overhead = estimator.message_overhead
+        remaining -= context_overhead
+
+        def take(cost: int) -> bool:
+            nonlocal remaining
+            if cost > remaining:
+                return False
+            remaining -= cost
+            return True
+
+        # 1. Pinned memories, 4. then the rest in rank order
+        pinned = [m for m in memories if m.isPinned]
+        regular = [m for m in memories if not m.isPinned]
+        memory_header_cost = estimator.count(MEMORY_HEADER)
+        memory_tokens = 0
+        selected_ids = set()
+
+        def add_memories(candidates: List[MemoryEntry]) -> None:
+            nonlocal memory_tokens
+            for memory in candidates:
+                cost = estimator.count(format_memory(memory)) + 1
+                if not memory_tokens:
+                    cost += memory_header_cost
+                if take(cost):
+                    memory_tokens += cost
+                    selected_ids.add(memory.id)
+
+        add_memories(pinned)
+
+        # 2. Running summary
+        summary_tokens = 0
+        if summary:
+            cost = estimator.count(SUMMARY_HEADER + summary) + 1
+            if take(cost):
+                summary_tokens = cost
+                packed.summary = summary
+
+        # 3. Recent turns, newest first; stop at the first one that doesn't fit
+        history_tokens = 0
+        kept = 0
+        for turn in reversed(history):
+            cost = estimator.count_message(turn.get("content", ""))
+            if not take(cost):
+                break
+            history_tokens += cost
+            kept += 1
+        packed.history = history[len(history) - kept:] if kept else []
+
+        add_memories(regular)
+        packed.memories = [m for m in memories if m.id in selected_ids]
+
+        # 5. Retrieved snippets
+        snippet_tokens = 0
+        for snippet in snippets[:MAX_SNIPPETS]:
+            cost = estimator.count(format_snippet(snippet)) + 1
+            if not snippet_tokens:
+                cost += estimator.count(SNIPPET_HEADER)
+            if take(cost):
+                snippet_tokens += cost
+                packed.snippets.append(snippet)
+
+        packed.tokens = {
+            "system": estimator.count_message(system_prompt),
+            "memories": memory_tokens,
+            "summary": summary_tokens,
+            "history": history_tokens,
+            "context": snippet_tokens,
+            "message": estimator.count_message(message),
+            "budget": budget
+        }
+        packed.tokens["total"] = (
+            packed.tokens["system"] + memory_tokens + summary_tokens + history_tokens + snippet_tokens
+            + packed.tokens["message"]
+            + (context_overhead if memory_tokens or summary_tokens or snippet_tokens else 0)
+        )
+        packed.dropped = {
+            "memories": len(memories) - len(packed.memories),
+            "summary": int(bool(summary) and not packed.summary),
+            "history": len(history) - len(packed.history),
+            "context": len(snippets[:MAX_SNIPPETS]) - len(packed.snippets)
+        }
+
+        if any(packed.dropped.values()):
+            logger.info(f"Context budget {budget} tokens; dropped {packed.dropped}")
+
+        return packed
+
+
+# Global context packer instance
+context_packer = ContextPacker()
@@ -0,0 +1,143 @@
+"""Rolling conversation summaries, built in the background while chat is idle."""
+
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from config.settings import settings
+from llm.provider import llm_service
+from llm.scheduler import Priority, llm_scheduler
+from rag.vector_service import rag_service
+from services.character_service import character_service
+from services.metrics import record_generation
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a role-play conversation between a user and a character. "
+    "Merge the new messages into the existing summary. Keep names, facts about the user, "
+    "promises, ongoing plans and the emotional state of the relationship. Drop small talk. "
+    "Write in the conversation's language, in third person, at most 200 words. "
+    "Reply with the updated summary only."
+)
+
+# Cap on messages folded into one summarization call
+MAX_MESSAGES_PER_PASS = 40
+
+
+class ConversationSummarizer:
+    """Compresses turns that aged out of the recent-history window.
+
+    After each turn the pair is scheduled. A single background task picks
+    pairs off the queue, waits until no chat generation is in flight, and
+    folds the aged-out messages into the pair's running summary (stored
+    in the conversation log). Prompts then carry the summary plus the
+    last ``history_messages`` messages, so their size stays flat as the
+    conversation grows.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._scheduled: Set[Tuple[str, str]] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the background worker (idempotent)"""
+        if not settings.summary_enabled:
+            return
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._scheduled.clear()
+            self._task = asyncio.create_task(self._run(), name="conversation-summarizer")
+
+    async def stop(self) -> None:
+        """Stop the worker; pending pairs are summarized after the next start"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, character_id: str, user_id: str) -> None:
+        """Queue a pair for summarization (no-op if already queued)"""
+        if self._task is None or self._task.done():
+            return
+        key = (character_id, user_id)
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._queue.put_nowait(key)
+
+    async def _run(self) -> None:
+        while True:
+            key = await self._queue.get()
+            # Yield to interactive generations
+            await llm_service.wait_idle(settings.background_idle_seconds)
+            self._scheduled.discard(key)
+            try:
+                await self.summarize(*key)
+            except Exception as e:
+                logger.error(f"Summarization failed for {key[0]}/{key[1]}: {e}")
+
+    async def get_summary(self, character_id: str, user_id: str) -> str:
+        """Current running summary for a pair ("" if none yet)"""
+        summary = await asyncio.to_thread(rag_service.conversation_log.get_summary, character_id, user_id)
+        return summary[0] if summary else ""
+
+    async def summarize(self, character_id: str, user_id: str) -> bool:
+        """Fold aged-out messages into the pair's summary.
+
+        Returns:
+            True if a new summary was stored
+        """
+        log = rag_service.conversation_log
+        existing = await asyncio.to_thread(log.get_summary, character_id, user_id)
+        previous, last_seq = existing or ("", 0)
+
+        messages = await asyncio.to_thread(
+            log.unsummarized,
+            character_id,
+            user_id,
+            last_seq,
+            settings.history_messages,
+            MAX_MESSAGES_PER_PASS
+        )
+        if len(messages) < settings.summary_trigger_messages:
+            return False
+
+        async with llm_scheduler.submit(Priority.BACKGROUND, "background"):
+            result = await llm_service.generate(
+                prompt=self._build_prompt(character_id, previous, messages),
+                system_prompt=SUMMARY_SYSTEM_PROMPT,
+                temperature=0.2,
+                max_tokens=settings.summary_max_tokens
+            )
+        record_generation(result)
+        summary = result.text.strip()
+        if not summary:
+            return False
+
+        stored = await asyncio.to_thread(log.save_summary, character_id, user_id, summary, messages[-1]["seq"])
+        if stored:
+            logger.info(f"Summarized {len(messages)} messages for {character_id}/{user_id}")
+        return stored
+
+    @staticmethod
+    def _build_prompt(character_id: str, previous: str, messages: List[Dict[str, Any]]) -> str:
+        character = character_service.get_character(character_id)
+        name = character.name if character else "Character"
+
+        transcript = "\n".join(
+            f"{'User' if m['role'] == 'user' else name}: {m['content']}"
+            for m in messages
+        )
+        return (
+            f"Existing summary:\n{previous or '(none yet)'}\n\n"
+            f"New messages:\n{transcript}\n\n"
+            f"Updated summary:"
+        )
+
+
+# Global summarizer instance
+conversation_summarizer = ConversationSummarizer()
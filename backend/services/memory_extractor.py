@@ -0,0 +1,190 @@
+"""Automatic long-term memory extraction from recent turns, off the request path."""
+
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+
+from config.settings import settings
+from llm.provider import llm_service
+from llm.scheduler import Priority, llm_scheduler
+from models.schemas import MemoryCreateRequest, MemoryEntry, MemoryType
+from rag.vector_service import rag_service
+from services.memory_facts import parse_facts
+from services.memory_service import memory_service
+from services.metrics import record_generation
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_SYSTEM_PROMPT = (
+    "You extract long-term memories from a conversation between a user and an AI character. "
+    "List durable facts worth remembering weeks later: the user's name, preferences, relationships, "
+    "plans, important events and feelings about the relationship. Ignore small talk and anything "
+    "only the character said about itself. Write each fact as one short sentence in the "
+    "conversation's language. Reply with a JSON array only, e.g. "
+    '[{"fact": "User works as a nurse", "importance": 0.7}]. Reply [] if there is nothing durable.'
+)
+
+CURSOR_NAME = "memory_extraction"
+MAX_MESSAGES_PER_PASS = 20
+
+
+class MemoryExtractor:
+    """Turns recent conversation into AUTO memories in the background.
+
+    Pairs are scheduled after each turn. Once ``memory_extraction_interval``
+    new messages have been logged since the last pass, the worker waits
+    until no chat generation is in flight, asks the LLM for durable facts,
+    drops facts too similar (``memory_dedup_threshold``) to an existing
+    memory or to each other, and writes the rest in one batch.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._scheduled: Set[Tuple[str, str]] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the background worker (idempotent)"""
+        if not settings.memory_extraction_enabled:
+            return
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._scheduled.clear()
+            self._task = asyncio.create_task(self._run(), name="memory-extractor")
+
+    async def stop(self) -> None:
+        """Stop the worker; unprocessed turns are picked up after the next start"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, character_id: str, user_id: str) -> None:
+        """Queue a pair for extraction (no-op if already queued)"""
+        if self._task is None or self._task.done():
+            return
+        key = (character_id, user_id)
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._queue.put_nowait(key)
+
+    async def _run(self) -> None:
+        while True:
+            key = await self._queue.get()
+            # Yield to interactive generations
+            await llm_service.wait_idle(settings.background_idle_seconds)
+            self._scheduled.discard(key)
+            try:
+                await self.extract(*key)
+            except Exception as e:
+                logger.error(f"Memory extraction failed for {key[0]}/{key[1]}: {e}")
+
+    async def extract(self, character_id: str, user_id: str) -> List[MemoryEntry]:
+        """Run one extraction pass for a pair.
+
+        Returns:
+            Memories created (empty if not enough new messages or no new facts)
+        """
+        log = rag_service.conversation_log
+        last_seq = await asyncio.to_thread(log.get_cursor, character_id, user_id, CURSOR_NAME)
+        messages = await asyncio.to_thread(
+            log.messages_after, character_id, user_id, last_seq, MAX_MESSAGES_PER_PASS
+        )
+        if len(messages) < settings.memory_extraction_interval:
+            return []
+
+        async with llm_scheduler.submit(Priority.BACKGROUND, "background"):
+            result = await llm_service.generate(
+                prompt=self._build_prompt(messages),
+                system_prompt=EXTRACTION_SYSTEM_PROMPT,
+                temperature=0.1,
+                max_tokens=256
+            )
+        record_generation(result)
+        facts = parse_facts(result.text)
+
+        # The pass is done once the output is parsed: the cursor moves even if
+        # storing fails, so a bad batch isn't re-extracted on every turn
+        try:
+            return await self._store_facts(character_id, user_id, facts, messages[-1]["seq"])
+        finally:
+            await asyncio.to_thread(log.set_cursor, character_id, user_id, CURSOR_NAME, messages[-1]["seq"])
+
+    async def _store_facts(
+        self,
+        character_id: str,
+        user_id: str,
+        facts: List[Dict[str, Any]],
+        seq: int
+    ) -> List[MemoryEntry]:
+        """Deduplicate parsed facts and store the rest as AUTO memories"""
+        if not facts:
+            return []
+        embeddings = await rag_service.embed_texts([fact["content"] for fact in facts])
+        facts, embeddings = await self._deduplicate(character_id, user_id, facts, embeddings)
+
+        requests: List[MemoryCreateRequest] = []
+        kept_embeddings: List[List[float]] = []
+        for fact, embedding in zip(facts, embeddings):
+            try:
+                requests.append(MemoryCreateRequest(
+                    content=fact["content"],
+                    memoryType=MemoryType.AUTO,
+                    importance=fact["importance"],
+                    metadata={"source": "extraction", "seq": seq}
+                ))
+            except ValidationError as e:
+                logger.warning(f"Skipping extracted fact for {character_id}/{user_id}: {e}")
+                continue
+            kept_embeddings.append(embedding)
+        if not requests:
+            return []
+
+        async with memory_service.pair_lock(character_id, user_id):
+            created = await asyncio.to_thread(
+                memory_service.create_memories, character_id, user_id, requests, kept_embeddings
+            )
+        logger.info(f"Extracted {len(created)} memories for {character_id}/{user_id}")
+        return created
+
+    async def _deduplicate(
+        self,
+        character_id: str,
+        user_id: str,
+        facts: List[Dict[str, Any]],
+        embeddings: List[List[float]]
+    ) -> Tuple[List[Dict[str, Any]], List[List[float]]]:
+        """Drop facts that repeat an existing memory or an earlier fact in the batch"""
+        threshold = settings.memory_dedup_threshold
+        existing = await asyncio.to_thread(memory_service.max_similarities, character_id, user_id, embeddings)
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1)
+
+        kept: List[int] = []
+        for i, similarity in enumerate(existing):
+            if similarity >= threshold:
+                continue
+            if kept and float((vectors[kept] @ vectors[i]).max()) >= threshold:
+                continue
+            kept.append(i)
+        return [facts[i] for i in kept], [embeddings[i] for i in kept]
+
+    @staticmethod
+    def _build_prompt(messages: List[Dict[str, Any]]) -> str:
+        transcript = "\n".join(
+            f"{'User' if m['role'] == 'user' else 'Character'}: {m['content']}"
+            for m in messages
+        )
+        return f"Conversation:\n{transcript}\n\nFacts (JSON array):"
+
+
+# Global extractor instance
+memory_extractor = MemoryExtractor()
@@ -0,0 +1,44 @@
+"""Parsing of the memory extraction model's output into candidate facts."""
+
+import json
+import logging
+import math
+import re
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+MAX_FACTS_PER_PASS = 5
+
+_JSON_ARRAY = re.compile(r"\[.*\]", re.DOTALL)
+
+
+def parse_facts(raw: str) -> List[Dict[str, Any]]:
+    """Parse the model's JSON array; malformed output yields no facts"""
+    match = _JSON_ARRAY.search(raw or "")
+    if not match:
+        return []
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        logger.warning("Memory extraction returned invalid JSON")
+        return []
+
+    facts = []
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, str):
+            item = {"fact": item}
+        if not isinstance(item, dict):
+            continue
+        content = str(item.get("fact") or item.get("content") or "").strip()
+        if not content:
+            continue
+        try:
+            importance = float(item.get("importance", 0.5))
+        except (TypeError, ValueError):
+            importance = 0.5
+        if not math.isfinite(importance):  # json.loads accepts NaN and Infinity
+            importance = 0.5
+        importance = min(max(importance, 0.0), 1.0)
+        facts.append({"content": content[:500], "importance": importance})
+    return facts[:MAX_FACTS_PER_PASS]
@@ -3,219 +3,539 @@ Memory Service - Long-term Memory Management System
 
 Handles persistent memories per character-user pair.
 Supports pinned, emotional, and factual memories with semantic search.
+
+Memories live in a SQLite database (WAL mode) so every operation touches
+only the rows it needs: point lookups by id, indexed filters by type,
+pinned flag and importance, and single-row updates. The per-turn
+``get_relevant_memories`` call is served from a read-through cache that
+also holds each pair's memory embeddings as one float32 matrix.
 """
 
-import os
 import json
+import logging
+import math
+import sqlite3
+import threading
 import uuid
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from pathlib import Path
 
+import numpy as np
+
 from models.schemas import MemoryEntry, MemoryCreateRequest, MemoryUpdateRequest, MemoryType
+from config.settings import settings
+from services.storage_utils import KeyedLocks
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = (
+    "id, character_id, user_id, content, memory_type, importance, "
+    "is_pinned, created_at, updated_at, metadata"
+)
+
+# Sort order shared by listing and relevance: pinned first, then importance, newest first
+_RANK_ORDER = "is_pinned DESC, importance DESC, created_at DESC"
+
+DEFAULT_USER = "default"
+
+
+def _user_key(user_id: Optional[str]) -> str:
+    """User id as stored: a missing user id means the default user"""
+    return user_id or DEFAULT_USER
+
+
+class _PairMemories:
+    """Cached memories for one pair with arrays for vectorized ranking"""
+
+    def __init__(self, entries: List[MemoryEntry], vectors: List[Optional[bytes]]):
+        self.entries = entries
+        self.importance = np.array([m.importance for m in entries], dtype=np.float32)
+        self.pinned = np.array([m.isPinned for m in entries], dtype=bool)
+        self.created = np.array([self._timestamp(m.createdAt) for m in entries], dtype=np.float64)
+
+        # Unit-normalized embeddings; rows without a vector stay zero
+        dim = next((len(v) // 4 for v in vectors if v), 0)
+        self.matrix = np.zeros((len(entries), dim), dtype=np.float32)
+        self.has_vector = np.zeros(len(entries), dtype=bool)
+        for i, blob in enumerate(vectors):
+            if blob and len(blob) // 4 == dim:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                if norm > 0:
+                    self.matrix[i] = vector / norm
+                    self.has_vector[i] = True
+
+    @staticmethod
+    def _timestamp(value: str) -> float:
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except (TypeError, ValueError):
+            return 0.0
+
+    def missing_vectors(self) -> List[MemoryEntry]:
+        return [m for m, has in zip(self.entries, self.has_vector) if not has]
+
+    def max_similarity(self, vectors: np.ndarray) -> np.ndarray:
+        """Highest cosine similarity of each (unit) vector to any stored memory"""
+        if not self.has_vector.any() or self.matrix.shape[1] != vectors.shape[1]:
+            return np.zeros(len(vectors), dtype=np.float32)
+        return (vectors @ self.matrix[self.has_vector].T).max(axis=1)
+
+    def rank(self, query_embedding: List[float], limit: int) -> List[MemoryEntry]:
+        """Top memories by similarity, importance and recency; pinned first"""
+        if not self.entries:
+            return []
+
+        similarity = np.zeros(len(self.entries), dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if self.matrix.shape[1] == query.shape[0]:
+            norm = np.linalg.norm(query)
+            if norm > 0:
+                similarity = self.matrix @ (query / norm)
+
+        age_days = np.maximum(datetime.utcnow().timestamp() - self.created, 0) / 86400
+        recency = np.exp(-math.log(2) * age_days / settings.memory_recency_half_life_days)
+
+        scores = (
+            settings.memory_similarity_weight * similarity
+            + settings.memory_importance_weight * self.importance
+            + settings.memory_recency_weight * recency
+        )
+
+        # Pinned memories always come first, best-scoring first
+        pinned_idx = np.flatnonzero(self.pinned)
+        pinned_idx = pinned_idx[np.argsort(-scores[pinned_idx], kind="stable")][:limit]
+
+        remaining = limit - len(pinned_idx)
+        regular_idx = np.flatnonzero(~self.pinned)
+        if remaining > 0 and len(regular_idx):
+            if len(regular_idx) > remaining:
+                top = np.argpartition(-scores[regular_idx], remaining - 1)[:remaining]
+                regular_idx = regular_idx[top]
+            regular_idx = regular_idx[np.argsort(-scores[regular_idx], kind="stable")][:remaining]
+        else:
+            regular_idx = regular_idx[:0]
+
+        return [self.entries[i] for i in np.concatenate([pinned_idx, regular_idx])]
 
 
 class MemoryService:
     """Manages long-term memories for characters"""
-    
+
     def __init__(self, data_dir: str = "data/memories"):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
-    
-    def _get_memory_file_path(self, character_id: str, user_id: str = "default") -> Path:
-        """Get file path for character-user memory storage"""
-        # Use default user if not specified
-        safe_user = user_id or "default"
-        filename = f"{character_id}_{safe_user}.json"
-        return self.data_dir / filename
-    
-    def _load_memories(self, character_id: str, user_id: str = "default") -> List[Dict[str, Any]]:
-        """Load all memories for a character-user pair"""
-        file_path = self._get_memory_file_path(character_id, user_id)
-        
-        if not file_path.exists():
-            return []
-        
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                return data.get("memories", [])
-        except Exception as e:
-            print(f"Error loading memories from {file_path}: {e}")
-            return []
-    
-    def _save_memories(self, character_id: str, user_id: str, memories: List[Dict[str, Any]]) -> None:
-        """Save memories to file"""
-        file_path = self._get_memory_file_path(character_id, user_id)
-        
-        data = {
-            "characterId": character_id,
-            "userId": user_id,
-            "lastUpdated": datetime.utcnow().isoformat(),
-            "memories": memories
-        }
-        
-        try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error saving memories to {file_path}: {e}")
-            raise
-    
+        self.db_path = self.data_dir / "memories.db"
+
+        self._lock = threading.RLock()
+        self._pair_locks = KeyedLocks()
+        self._cache: "OrderedDict[Tuple[str, str], _PairMemories]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        self._import_legacy_files()
+
+    def _create_schema(self) -> None:
+        """Create tables and indexes"""
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS memories (
+                id TEXT NOT NULL,
+                character_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                content TEXT NOT NULL,
+                memory_type TEXT NOT NULL,
+                importance REAL NOT NULL DEFAULT 0.5,
+                is_pinned INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                metadata TEXT NOT NULL DEFAULT '{}',
+                PRIMARY KEY (character_id, user_id, id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_memories_rank
+                ON memories (character_id, user_id, is_pinned DESC, importance DESC, created_at DESC);
+            CREATE INDEX IF NOT EXISTS idx_memories_type
+                ON memories (character_id, user_id, memory_type);
+            CREATE TABLE IF NOT EXISTS imported_files (
+                filename TEXT PRIMARY KEY,
+                imported_at TEXT NOT NULL
+            );
+            """
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(memories)")}
+        if "embedding" not in columns:
+            # float32 vector of the content, written at create/update time
+            self._conn.execute("ALTER TABLE memories ADD COLUMN embedding BLOB")
+        self._conn.commit()
+
+    def _import_legacy_files(self) -> None:
+        """Import {character}_{user}.json files written by the old file backend"""
+        with self._lock:
+            imported = {
+                row["filename"] for row in self._conn.execute("SELECT filename FROM imported_files")
+            }
+
+        for file_path in sorted(self.data_dir.glob("*.json")):
+            if file_path.name in imported:
+                continue
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                memories = data.get("memories", [])
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        f"INSERT OR IGNORE INTO memories ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [self._to_row(m) for m in memories]
+                    )
+                    self._conn.execute(
+                        "INSERT INTO imported_files (filename, imported_at) VALUES (?, ?)",
+                        (file_path.name, datetime.utcnow().isoformat())
+                    )
+                logger.info(f"Imported {len(memories)} memories from {file_path.name}")
+            except Exception as e:
+                logger.error(f"Error importing memories from {file_path}: {e}")
+
+    @staticmethod
+    def _to_row(memory: Dict[str, Any]) -> Tuple:
+        """Convert a memory dict (API field names) to a table row"""
+        return (
+            memory["id"],
+            memory["characterId"],
+            memory["userId"],
+            memory["content"],
+            memory.get("memoryType", MemoryType.FACTUAL.value),
+            memory.get("importance", 0.5),
+            1 if memory.get("isPinned", False) else 0,
+            memory["createdAt"],
+            memory.get("updatedAt", memory["createdAt"]),
+            json.dumps(memory.get("metadata") or {}, ensure_ascii=False)
+        )
+
+    @staticmethod
+    def _to_entry(row: sqlite3.Row) -> MemoryEntry:
+        """Convert a table row to a MemoryEntry"""
+        return MemoryEntry(
+            id=row["id"],
+            characterId=row["character_id"],
+            userId=row["user_id"],
+            content=row["content"],
+            memoryType=row["memory_type"],
+            importance=row["importance"],
+            isPinned=bool(row["is_pinned"]),
+            createdAt=row["created_at"],
+            updatedAt=row["updated_at"],
+            metadata=json.loads(row["metadata"] or "{}")
+        )
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[MemoryEntry]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_entry(row) for row in rows]
+
+    def pair_lock(self, character_id: str, user_id: str):
+        """Async lock serializing write requests for one character-user pair"""
+        return self._pair_locks.acquire((character_id, _user_key(user_id)))
+
+    def _invalidate(self, character_id: str, user_id: str) -> None:
+        """Drop cached memories for a pair after a write"""
+        with self._lock:
+            self._cache.pop((character_id, _user_key(user_id)), None)
+
+    def _get_pair(self, character_id: str, user_id: str) -> _PairMemories:
+        """All memories for a pair in rank order, with vectors (read-through cache)"""
+        key = (character_id, _user_key(user_id))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS}, embedding FROM memories WHERE character_id = ? AND user_id = ? "
+                f"ORDER BY {_RANK_ORDER}",
+                key
+            ).fetchall()
+            pair = _PairMemories(
+                [self._to_entry(row) for row in rows],
+                [row["embedding"] for row in rows]
+            )
+            self._cache[key] = pair
+            while len(self._cache) > settings.memory_cache_size:
+                self._cache.popitem(last=False)
+            return pair
+
+    def _get_ranked(self, character_id: str, user_id: str) -> List[MemoryEntry]:
+        """All memories for a pair in rank order"""
+        return self._get_pair(character_id, user_id).entries
+
+    @staticmethod
+    def _to_blob(embedding: Optional[List[float]]) -> Optional[bytes]:
+        if embedding is None:
+            return None
+        return np.asarray(embedding, dtype=np.float32).tobytes()
+
     def create_memory(
         self,
         character_id: str,
         user_id: str,
-        request: MemoryCreateRequest
+        request: MemoryCreateRequest,
+        embedding: Optional[List[float]] = None
     ) -> MemoryEntry:
-        """Create a new memory entry"""
-        memories = self._load_memories(character_id, user_id)
-        
-        memory_id = str(uuid.uuid4())[:8]
+        """Create a new memory entry (with the content embedding, if given)"""
+        return self.create_memories(character_id, user_id, [request], [embedding])[0]
+
+    def create_memories(
+        self,
+        character_id: str,
+        user_id: str,
+        requests: List[MemoryCreateRequest],
+        embeddings: Optional[List[Optional[List[float]]]] = None
+    ) -> List[MemoryEntry]:
+        """Create several memories in one transaction"""
+        user_id = _user_key(user_id)
         now = datetime.utcnow().isoformat()
-        
-        memory_data = {
-            "id": memory_id,
-            "characterId": character_id,
-            "userId": user_id,
-            "content": request.content,
-            "memoryType": request.memoryType.value,
-            "importance": request.importance,
-            "isPinned": request.isPinned,
-            "createdAt": now,
-            "updatedAt": now,
-            "metadata": request.metadata
-        }
-        
-        memories.append(memory_data)
-        self._save_memories(character_id, user_id, memories)
-        
-        return MemoryEntry(**memory_data)
-    
+        embeddings = embeddings or [None] * len(requests)
+
+        memories = [
+            {
+                "id": str(uuid.uuid4())[:8],
+                "characterId": character_id,
+                "userId": user_id,
+                "content": request.content,
+                "memoryType": request.memoryType.value,
+                "importance": request.importance,
+                "isPinned": request.isPinned,
+                "createdAt": now,
+                "updatedAt": now,
+                "metadata": request.metadata
+            }
+            for request in requests
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO memories ({_COLUMNS}, embedding) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (*self._to_row(memory), self._to_blob(embedding))
+                    for memory, embedding in zip(memories, embeddings)
+                ]
+            )
+            self._invalidate(character_id, user_id)
+
+        return [MemoryEntry(**memory) for memory in memories]
+
     def get_all_memories(
         self,
         character_id: str,
-        user_id: str = "default",
+        user_id: str = DEFAULT_USER,
         memory_type: Optional[MemoryType] = None,
         pinned_only: bool = False
     ) -> List[MemoryEntry]:
         """Get all memories for a character-user pair with optional filters"""
-        memories = self._load_memories(character_id, user_id)
-        
-        # Apply filters
+        user_id = _user_key(user_id)
+        if memory_type is None and not pinned_only:
+            return list(self._get_ranked(character_id, user_id))
+
+        # Filtered listings go through the type / rank indexes
+        conditions = ["character_id = ?", "user_id = ?"]
+        params: List[Any] = [character_id, user_id]
         if memory_type:
-            memories = [m for m in memories if m.get("memoryType") == memory_type.value]
-        
+            conditions.append("memory_type = ?")
+            params.append(memory_type.value)
         if pinned_only:
-            memories = [m for m in memories if m.get("isPinned", False)]
-        
-        # Sort by importance (desc), then by creation time (desc)
-        memories.sort(key=lambda m: (m.get("isPinned", False), m.get("importance", 0), m.get("createdAt", "")), reverse=True)
-        
-        return [MemoryEntry(**m) for m in memories]
-    
+            conditions.append("is_pinned = 1")
+
+        # Sort by pinned, importance (desc), then by creation time (desc)
+        return self._query(
+            f"SELECT {_COLUMNS} FROM memories WHERE {' AND '.join(conditions)} ORDER BY {_RANK_ORDER}",
+            tuple(params)
+        )
+
     def get_memory(self, character_id: str, user_id: str, memory_id: str) -> Optional[MemoryEntry]:
         """Get a specific memory by ID"""
-        memories = self._load_memories(character_id, user_id)
-        
-        for memory in memories:
-            if memory.get("id") == memory_id:
-                return MemoryEntry(**memory)
-        
-        return None
-    
+        user_id = _user_key(user_id)
+        memories = self._query(
+            f"SELECT {_COLUMNS} FROM memories WHERE character_id = ? AND user_id = ? AND id = ?",
+            (character_id, user_id, memory_id)
+        )
+        return memories[0] if memories else None
+
     def update_memory(
         self,
         character_id: str,
         user_id: str,
         memory_id: str,
-        request: MemoryUpdateRequest
+        request: MemoryUpdateRequest,
+        embedding: Optional[List[float]] = None
     ) -> Optional[MemoryEntry]:
-        """Update an existing memory"""
-        memories = self._load_memories(character_id, user_id)
-        
-        for i, memory in enumerate(memories):
-            if memory.get("id") == memory_id:
-                # Update fields if provided
-                if request.content is not None:
-                    memory["content"] = request.content
-                if request.importance is not None:
-                    memory["importance"] = request.importance
-                if request.isPinned is not None:
-                    memory["isPinned"] = request.isPinned
-                if request.metadata is not None:
-                    memory["metadata"] = request.metadata
-                
-                memory["updatedAt"] = datetime.utcnow().isoformat()
-                
-                memories[i] = memory
-                self._save_memories(character_id, user_id, memories)
-                
-                return MemoryEntry(**memory)
-        
-        return None
-    
+        """Update an existing memory (pass the new embedding when content changes)"""
+        user_id = _user_key(user_id)
+        # Only the provided fields are written
+        changes: Dict[str, Any] = {}
+        if request.content is not None:
+            changes["content"] = request.content
+            # Without a fresh vector the old one is stale; it gets backfilled
+            changes["embedding"] = self._to_blob(embedding)
+        if request.importance is not None:
+            changes["importance"] = request.importance
+        if request.isPinned is not None:
+            changes["is_pinned"] = 1 if request.isPinned else 0
+        if request.metadata is not None:
+            changes["metadata"] = json.dumps(request.metadata, ensure_ascii=False)
+        changes["updated_at"] = datetime.utcnow().isoformat()
+
+        assignments = ", ".join(f"{column} = ?" for column in changes)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"UPDATE memories SET {assignments} WHERE character_id = ? AND user_id = ? AND id = ?",
+                (*changes.values(), character_id, user_id, memory_id)
+            )
+            if cursor.rowcount == 0:
+                return None
+            self._invalidate(character_id, user_id)
+
+        return self.get_memory(character_id, user_id, memory_id)
+
     def delete_memory(self, character_id: str, user_id: str, memory_id: str) -> bool:
         """Delete a memory by ID"""
-        memories = self._load_memories(character_id, user_id)
-        
-        filtered = [m for m in memories if m.get("id") != memory_id]
-        
-        if len(filtered) < len(memories):
-            self._save_memories(character_id, user_id, filtered)
-            return True
-        
-        return False
-    
+        user_id = _user_key(user_id)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM memories WHERE character_id = ? AND user_id = ? AND id = ?",
+                (character_id, user_id, memory_id)
+            )
+            deleted = cursor.rowcount > 0
+            if deleted:
+                self._invalidate(character_id, user_id)
+
+        return deleted
+
     def pin_memory(self, character_id: str, user_id: str, memory_id: str, pinned: bool = True) -> Optional[MemoryEntry]:
         """Pin or unpin a memory"""
         request = MemoryUpdateRequest(isPinned=pinned)
         return self.update_memory(character_id, user_id, memory_id, request)
-    
+
     def get_relevant_memories(
         self,
         character_id: str,
         user_id: str,
         query: Optional[str] = None,
-        limit: int = 10
+        limit: int = 10,
+        query_embedding: Optional[List[float]] = None
     ) -> List[MemoryEntry]:
         """
         Get relevant memories for context injection.
-        
+
         Priority:
         1. Pinned memories (always included)
-        2. High importance memories
-        3. Recent memories
-        4. Semantic match (if query provided - future enhancement)
+        2. Semantic match with the query, importance and recency combined
+           (when ``query_embedding`` is provided)
+        3. Otherwise high importance, then recent memories
+
+        Served from the per-pair cache, so a chat turn does no disk I/O
+        once the pair has been loaded; scoring is one matrix-vector
+        product over the pair's embeddings.
         """
-        memories = self._load_memories(character_id, user_id)
-        
-        # Separate pinned and regular
-        pinned = [m for m in memories if m.get("isPinned", False)]
-        regular = [m for m in memories if not m.get("isPinned", False)]
-        
-        # Sort regular by importance * recency
-        regular.sort(key=lambda m: m.get("importance", 0), reverse=True)
-        
+        pair = self._get_pair(character_id, user_id)
+
+        if query_embedding is not None:
+            return pair.rank(query_embedding, limit)
+
+        # Ranked list already has pinned first, then regular by importance
+        pinned = [m for m in pair.entries if m.isPinned]
+        regular = [m for m in pair.entries if not m.isPinned]
+
         # Combine: all pinned + top regular (up to limit)
         selected = pinned + regular[:max(0, limit - len(pinned))]
-        
-        return [MemoryEntry(**m) for m in selected[:limit]]
-    
-    def get_memory_statistics(self, character_id: str, user_id: str = "default") -> Dict[str, Any]:
+
+        return selected[:limit]
+
+    def get_memories_without_embeddings(self, character_id: str, user_id: str) -> List[MemoryEntry]:
+        """Memories that have no content embedding yet (legacy or edited)"""
+        return self._get_pair(character_id, user_id).missing_vectors()
+
+    def max_similarities(
+        self,
+        character_id: str,
+        user_id: str,
+        embeddings: List[List[float]]
+    ) -> List[float]:
+        """For each embedding, the highest cosine similarity to an existing memory"""
+        if not embeddings:
+            return []
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1)
+        return self._get_pair(character_id, user_id).max_similarity(vectors).tolist()
+
+    def set_embeddings(
+        self,
+        character_id: str,
+        user_id: str,
+        memories: List[MemoryEntry],
+        embeddings: List[List[float]]
+    ) -> None:
+        """Store content embeddings computed for ``memories``.
+
+        A vector is only written if the memory is unchanged since it was
+        read (same ``updatedAt``), so a backfill racing an edit can't attach
+        the old content's vector to the new content.
+        """
+        user_id = _user_key(user_id)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE memories SET embedding = ? "
+                "WHERE character_id = ? AND user_id = ? AND id = ? AND updated_at = ?",
+                [
+                    (self._to_blob(embedding), character_id, user_id, memory.id, memory.updatedAt)
+                    for memory, embedding in zip(memories, embeddings)
+                ]
+            )
+            self._invalidate(character_id, user_id)
+
+    def count_memories(self) -> int:
+        """Total memories across all pairs (raises sqlite3.Error if the DB is unreachable)"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    def get_memory_statistics(self, character_id: str, user_id: str = DEFAULT_USER) -> Dict[str, Any]:
         """Get statistics about memories"""
-        memories = self._load_memories(character_id, user_id)
-        
+        user_id = _user_key(user_id)
+        with self._lock:
+            totals = self._conn.execute(
+                "SELECT COUNT(*) AS total, COALESCE(SUM(is_pinned), 0) AS pinned, "
+                "COALESCE(AVG(importance), 0) AS avg_importance "
+                "FROM memories WHERE character_id = ? AND user_id = ?",
+                (character_id, user_id)
+            ).fetchone()
+            by_type = {
+                row["memory_type"]: row["count"]
+                for row in self._conn.execute(
+                    "SELECT memory_type, COUNT(*) AS count FROM memories "
+                    "WHERE character_id = ? AND user_id = ? GROUP BY memory_type",
+                    (character_id, user_id)
+                )
+            }
+
         return {
-            "totalCount": len(memories),
-            "pinnedCount": sum(1 for m in memories if m.get("isPinned", False)),
+            "totalCount": totals["total"],
+            "pinnedCount": totals["pinned"],
             "byType": {
-                "factual": sum(1 for m in memories if m.get("memoryType") == "factual"),
-                "emotional": sum(1 for m in memories if m.get("memoryType") == "emotional"),
-                "pinned": sum(1 for m in memories if m.get("memoryType") == "pinned"),
-                "auto": sum(1 for m in memories if m.get("memoryType") == "auto"),
+                "factual": by_type.get("factual", 0),
+                "emotional": by_type.get("emotional", 0),
+                "pinned": by_type.get("pinned", 0),
+                "auto": by_type.get("auto", 0),
             },
-            "avgImportance": sum(m.get("importance", 0) for m in memories) / len(memories) if memories else 0
+            "avgImportance": totals["avg_importance"]
         }
 
 
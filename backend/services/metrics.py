@@ -0,0 +1,182 @@
+"""Prometheus metrics for the chat pipeline, caches and the LLM queue."""
+
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from llm.base import GenerationResult
+from llm.provider import llm_service
+from llm.scheduler import llm_scheduler
+from rag.vector_service import rag_service
+from services.character_service import character_service
+from services.memory_service import memory_service
+
+T = TypeVar("T")
+
+# Retrieval stages take milliseconds, generation takes tens of seconds on CPU
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# Generation runs at a few tokens/s on small CPUs; prompt evaluation reaches thousands on GPU
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+CHAT_STAGE_SECONDS = Histogram(
+    "echominds_chat_stage_seconds",
+    "Duration of each chat turn stage (llm_first_token is provider-reported when not streaming)",
+    ["stage", "model", "character"],
+    buckets=STAGE_BUCKETS
+)
+CHAT_TURNS = Counter(
+    "echominds_chat_turns_total",
+    "Chat turns by outcome (ok, error, rejected)",
+    ["model", "character", "outcome"]
+)
+CHAT_ERRORS = Counter(
+    "echominds_chat_errors_total",
+    "Failed chat turns by the stage that failed",
+    ["model", "character", "stage"]
+)
+CONTEXT_STAGE_TIMEOUTS = Counter(
+    "echominds_context_stage_timeouts_total",
+    "Context lookups dropped for exceeding their time budget",
+    ["stage"]
+)
+LLM_TOKENS = Counter(
+    "echominds_llm_tokens",
+    "Tokens evaluated by the LLM (phase: prompt or completion)",
+    ["model", "phase"]
+)
+LLM_EVAL_SECONDS = Counter(
+    "echominds_llm_eval_seconds",
+    "Time the LLM spent evaluating tokens",
+    ["model", "phase"]
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "echominds_llm_tokens_per_second",
+    "Per-generation evaluation speed",
+    ["model", "phase"],
+    buckets=RATE_BUCKETS
+)
+
+
+def current_model() -> str:
+    return llm_service.current_model
+
+
+def character_label(character_id: str) -> str:
+    """Character id as a label; unknown ids are grouped to keep cardinality bounded"""
+    return character_id if character_service.get_character(character_id) else "unknown"
+
+
+def observe_stage(stage: str, character_id: str, seconds: float, model: Optional[str] = None) -> None:
+    """Record a stage duration measured elsewhere"""
+    CHAT_STAGE_SECONDS.labels(
+        stage=stage, model=model or current_model(), character=character_label(character_id)
+    ).observe(seconds)
+
+
+@contextmanager
+def timed_stage(stage: str, character_id: str, model: Optional[str] = None) -> Iterator[None]:
+    """Time the enclosed block as a chat stage (also recorded when it raises)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, character_id, time.perf_counter() - start, model)
+
+
+async def timed(stage: str, character_id: str, awaitable: Awaitable[T]) -> T:
+    """Await ``awaitable`` and record how long it took as a chat stage"""
+    with timed_stage(stage, character_id):
+        return await awaitable
+
+
+def record_turn(character_id: str, outcome: str, failed_stage: Optional[str] = None) -> None:
+    """Count a finished chat turn; errors also count against the stage that failed"""
+    model = current_model()
+    character = character_label(character_id)
+    CHAT_TURNS.labels(model=model, character=character, outcome=outcome).inc()
+    if failed_stage:
+        CHAT_ERRORS.labels(model=model, character=character, stage=failed_stage).inc()
+
+
+def record_generation(result: GenerationResult) -> None:
+    """Add a generation's token stats to the per-model totals.
+
+    Dividing the token and second counters gives the average speed per
+    model; the histogram shows how it varies between generations.
+    """
+    model = result.model or current_model()
+    for phase, tokens, seconds, rate in (
+        ("prompt", result.prompt_tokens, result.prompt_eval_seconds, result.prompt_tokens_per_second),
+        ("completion", result.completion_tokens, result.eval_seconds, result.tokens_per_second)
+    ):
+        if tokens is not None:
+            LLM_TOKENS.labels(model=model, phase=phase).inc(tokens)
+        if seconds is not None:
+            LLM_EVAL_SECONDS.labels(model=model, phase=phase).inc(seconds)
+        if rate is not None:
+            LLM_TOKENS_PER_SECOND.labels(model=model, phase=phase).observe(rate)
+
+
+class _LiveStateCollector:
+    """Scrape-time metrics read from the services' own counters."""
+
+    def describe(self):
+        return []  # don't read live state at registration
+
+    def collect(self):
+        cache = rag_service.embedding_cache.stats()
+        embedding = CounterMetricFamily(
+            "echominds_embedding_cache_requests",
+            "Embedding cache lookups by result",
+            labels=["result"]
+        )
+        embedding.add_metric(["hit"], cache["hits"])
+        embedding.add_metric(["disk_hit"], cache["disk_hits"])
+        embedding.add_metric(["miss"], cache["misses"])
+        yield embedding
+
+        memories = CounterMetricFamily(
+            "echominds_memory_cache_requests",
+            "Long-term memory cache lookups by result",
+            labels=["result"]
+        )
+        memories.add_metric(["hit"], memory_service.cache_hits)
+        memories.add_metric(["miss"], memory_service.cache_misses)
+        yield memories
+
+        model = current_model()
+        scheduler = llm_scheduler.stats()
+        for name, key, help_text in (
+            ("echominds_llm_queue_depth", "waiting", "Generations waiting for a slot"),
+            ("echominds_llm_active", "active", "Generations holding a slot"),
+            ("echominds_llm_slots", "slots", "Concurrent generation slots")
+        ):
+            gauge = GaugeMetricFamily(name, help_text, labels=["model"])
+            gauge.add_metric([model], scheduler[key])
+            yield gauge
+        rejected = CounterMetricFamily("echominds_llm_rejected", "Requests refused by admission control")
+        rejected.add_metric([], scheduler["rejected"])
+        yield rejected
+
+        pool = getattr(llm_service, "pool", None)
+        if pool is not None:
+            up = GaugeMetricFamily("echominds_llm_backend_up", "LLM host is not ejected", labels=["url"])
+            outstanding = GaugeMetricFamily(
+                "echominds_llm_backend_outstanding", "Requests routed to an LLM host", labels=["url"]
+            )
+            in_flight = GaugeMetricFamily(
+                "echominds_llm_backend_http_in_flight", "HTTP requests open to an LLM host", labels=["url"]
+            )
+            for backend in pool.backends:
+                up.add_metric([backend.url], 0 if backend.ejected else 1)
+                outstanding.add_metric([backend.url], backend.outstanding)
+                in_flight.add_metric([backend.url], backend.transport.in_flight)
+            yield up
+            yield outstanding
+            yield in_flight
+
+
+REGISTRY.register(_LiveStateCollector())
@@ -0,0 +1,97 @@
+"""Storage helpers: crash-safe file writes and per-key async locks."""
+
+import asyncio
+import json
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Hashable
+
+
+def atomic_write_json(path: Path, data: Any) -> None:
+    """Write JSON so readers see either the old or the new file, never a partial one.
+
+    The payload goes to a temp file in the same directory, is fsynced, and
+    then renamed over the target. The directory is fsynced afterwards so
+    the rename itself survives a crash.
+
+    Args:
+        path: Target file
+        data: JSON-serializable payload
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+    _fsync_dir(path.parent)
+
+
+def atomic_delete(path: Path) -> bool:
+    """Delete a file and persist the directory entry removal.
+
+    Returns:
+        True if the file existed
+    """
+    path = Path(path)
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        return False
+    _fsync_dir(path.parent)
+    return True
+
+
+def _fsync_dir(directory: Path) -> None:
+    """Flush a directory entry (no-op where directories can't be opened, e.g. Windows)"""
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class KeyedLocks:
+    """Async locks created on demand per key and dropped when unused.
+
+    Requests for the same key (e.g. one character-user pair) run one at a
+    time; different keys never wait on each other.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    @asynccontextmanager
+    async def acquire(self, key: Hashable) -> AsyncIterator[None]:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,131 @@
+"""Background resource sampler feeding /status and the monitoring history."""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import psutil
+
+from config.settings import settings
+from llm.health_monitor import health_monitor
+from llm.provider import llm_service
+from llm.scheduler import llm_scheduler
+from models.schemas import SystemSample
+from services.memory_service import memory_service
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def _count_json(directory: os.PathLike) -> Optional[int]:
+    """JSON files in a store directory (None if it doesn't exist)"""
+    try:
+        return sum(1 for name in os.listdir(directory) if name.endswith(".json"))
+    except FileNotFoundError:
+        return None
+
+
+def _count_memories() -> Optional[int]:
+    """Rows in the memory DB (None if it can't be queried)"""
+    try:
+        return memory_service.count_memories()
+    except sqlite3.Error as e:
+        logger.warning(f"Memory store count failed: {e}")
+        return None
+
+
+class SystemSampler:
+    """Samples CPU, memory, process RSS, store sizes and LLM load on an interval.
+
+    Samples go into a ring buffer of ``history_size`` entries, so request
+    handlers only read memory: ``latest`` for /status and ``history`` for
+    the resource charts. Blocking calls (psutil, directory listings, the
+    memory count query) run in a worker thread. CPU usage is measured
+    since the previous sample rather than by sleeping.
+    """
+
+    def __init__(self, interval: float, history_size: int):
+        self.interval = interval
+        self._samples: Deque[SystemSample] = deque(maxlen=history_size)
+        self._process = psutil.Process()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start sampling (idempotent)"""
+        if self._task is None or self._task.done():
+            psutil.cpu_percent(interval=None)  # baseline for the first reading
+            self._task = asyncio.create_task(self._run(), name="system-sampler")
+
+    async def stop(self) -> None:
+        """Stop sampling"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sample()
+            except Exception as e:
+                logger.error(f"System sample failed: {e}")
+
+    async def sample(self) -> SystemSample:
+        """Take a sample now and add it to the history"""
+        resources = await asyncio.to_thread(self._collect_resources)
+        sample = SystemSample(
+            timestamp=time.time(),
+            **resources,
+            llm_status=health_monitor.snapshot()["status"],
+            llm_active=llm_service.active_requests,
+            llm_waiting=llm_scheduler.stats()["waiting"]
+        )
+        self._samples.append(sample)
+        return sample
+
+    def _collect_resources(self) -> Dict[str, Any]:
+        memory = psutil.virtual_memory()
+        return {
+            "cpu_usage": psutil.cpu_percent(interval=None),
+            "memory_usage": memory.percent,
+            "memory_used_mb": round(memory.used / MB, 1),
+            "process_rss_mb": self._process_rss(),
+            "characters": _count_json(settings.character_data_path),
+            "memories": _count_memories()
+        }
+
+    def _process_rss(self) -> Dict[str, float]:
+        """RSS of this process and of local Ollama processes (runners included)"""
+        rss = {"backend": round(self._process.memory_info().rss / MB, 1)}
+        ollama_rss = 0
+        for proc in psutil.process_iter(["name", "memory_info"]):
+            name = proc.info["name"] or ""
+            if name.startswith("ollama") and proc.info["memory_info"] is not None:
+                ollama_rss += proc.info["memory_info"].rss
+        if ollama_rss:
+            rss["ollama"] = round(ollama_rss / MB, 1)
+        return rss
+
+    async def latest(self) -> SystemSample:
+        """Most recent sample (taken now if sampling hasn't produced one yet)"""
+        if not self._samples:
+            return await self.sample()
+        return self._samples[-1]
+
+    def history(self, window: float) -> List[SystemSample]:
+        """Samples from the last ``window`` seconds, oldest first"""
+        since = time.time() - window
+        return [s for s in self._samples if s.timestamp >= since]
+
+
+# Global sampler instance
+system_sampler = SystemSampler(settings.status_sample_interval, settings.status_history_size)
@@ -0,0 +1,125 @@
+"""Routing and ejection in the LLM backend pool."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from config.settings import settings
+from llm.backend_pool import BackendPool, NoBackendAvailable
+
+
+def make_pool(*names: str) -> BackendPool:
+    return BackendPool(
+        [f"http://{name}:11434" for name in names],
+        probe_interval=60.0,
+        eject_seconds=10.0,
+        max_eject_seconds=40.0,
+        probe_timeout=1.0
+    )
+
+
+def retry_in(backend) -> float:
+    return backend.stats()["retryIn"]
+
+
+def test_prefers_loaded_model_then_least_outstanding():
+    pool = make_pool("a", "b", "c")
+    a, b, c = pool.backends
+    b.available_models = {"llama"}
+    c.loaded_models = {"llama"}
+    c.outstanding = 5
+    assert pool.choose("llama") is c
+    assert pool.choose("other") is a
+
+    a.outstanding = 2
+    assert pool.choose("other") is b
+
+
+def test_failures_eject_with_doubling_capped_backoff():
+    pool = make_pool("a", "b")
+    a, b = pool.backends
+
+    pool.mark_failure(a, ConnectionError("refused"))
+    assert a.ejected
+    assert retry_in(a) == pytest.approx(10.0, abs=0.5)
+    assert pool.choose() is b
+
+    for _ in range(4):
+        pool.mark_failure(a, ConnectionError("refused"))
+    assert retry_in(a) == pytest.approx(40.0, abs=0.5)
+    assert a.failures == 5
+
+    pool.mark_success(a)
+    assert not a.ejected
+    assert a.failures == 0
+    assert a.last_error is None
+
+
+def test_all_ejected_still_tries_the_host_due_soonest():
+    pool = make_pool("a", "b")
+    a, b = pool.backends
+    pool.mark_failure(a, ConnectionError("refused"))
+    pool.mark_failure(a, ConnectionError("refused"))
+    pool.mark_failure(b, ConnectionError("refused"))
+    assert pool.choose() is b
+
+    with pytest.raises(NoBackendAvailable):
+        pool.choose(exclude=[a, b])
+
+
+def test_only_host_failures_eject_inside_use():
+    async def scenario():
+        pool = make_pool("a")
+        a = pool.backends[0]
+        with pytest.raises(ValueError):
+            async with pool.use("llama"):
+                raise ValueError("bad request")
+        assert not a.ejected
+        assert a.outstanding == 0
+
+        async with pool.use("llama"):
+            pass
+        assert a.served == 1
+        assert "llama" in a.loaded_models
+
+        with pytest.raises(httpx.ConnectError):
+            async with pool.use("llama"):
+                raise httpx.ConnectError("refused")
+        assert a.ejected
+        assert a.outstanding == 0
+
+    asyncio.run(scenario())
+
+
+def test_call_retries_on_another_host(monkeypatch):
+    monkeypatch.setattr(settings, "ollama_retry_backoff", 0.0)
+    pool = make_pool("a", "b")
+    a, b = pool.backends
+    tried = []
+
+    async def request(backend):
+        tried.append(backend)
+        if backend is a:
+            raise httpx.ConnectError("refused")
+        return "ok"
+
+    assert asyncio.run(pool.call("llama", request)) == "ok"
+    assert tried == [a, b]
+    assert a.ejected and a.retries == 1
+    assert b.served == 1
+
+
+def test_call_does_not_retry_request_errors(monkeypatch):
+    monkeypatch.setattr(settings, "ollama_retry_backoff", 0.0)
+    pool = make_pool("a", "b")
+    calls = []
+
+    async def request(backend):
+        calls.append(backend)
+        raise ValueError("model not found")
+
+    with pytest.raises(ValueError):
+        asyncio.run(pool.call("llama", request))
+    assert len(calls) == 1
+    assert not any(b.ejected for b in pool.backends)
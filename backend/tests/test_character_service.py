@@ -0,0 +1,89 @@
+"""Caching of the static character prompt."""
+
+import asyncio
+
+import pytest
+
+import services.character_service as character_module
+from config.settings import settings
+from models.schemas import CharacterProfile, Gender
+from services.character_service import CharacterService
+
+
+def profile(character_id: str = "c1", personality: str = "Cheerful") -> CharacterProfile:
+    return CharacterProfile(
+        id=character_id,
+        name="Aria",
+        avatar="",
+        gender=Gender.FEMALE,
+        race="human",
+        description="A friend",
+        personality=personality,
+        greeting="Hi!",
+        systemPrompt="You are kind.",
+    )
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "character_data_path", tmp_path)
+    return CharacterService()
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Count how many times a static prompt is assembled"""
+    calls = []
+    original = character_module.enhance_system_prompt_with_formatting
+
+    def counting(prompt):
+        calls.append(prompt)
+        return original(prompt)
+
+    monkeypatch.setattr(character_module, "enhance_system_prompt_with_formatting", counting)
+    return calls
+
+
+def test_static_prompt_is_built_once_per_character(service, builds):
+    asyncio.run(service.save_character(profile("c1")))
+    asyncio.run(service.save_character(profile("c2")))
+
+    first = service.get_static_prompt("c1")
+    assert service.get_static_prompt("c1") is first
+    service.build_system_prompt("c1", context="snippet", memory_context="memory")
+    assert len(builds) == 1
+
+    service.get_static_prompt("c2")
+    assert len(builds) == 2
+
+
+def test_save_invalidates_the_static_prompt(service, builds):
+    asyncio.run(service.save_character(profile(personality="Cheerful")))
+    assert "Cheerful" in service.get_static_prompt("c1").text
+
+    asyncio.run(service.save_character(profile(personality="Grumpy")))
+    static = service.get_static_prompt("c1")
+    assert "Grumpy" in static.text
+    assert "Cheerful" not in static.text
+    assert len(builds) == 2
+
+
+def test_delete_invalidates_the_static_prompt(service, builds):
+    asyncio.run(service.save_character(profile()))
+    service.get_static_prompt("c1")
+
+    assert asyncio.run(service.delete_character("c1"))
+    with pytest.raises(ValueError):
+        service.get_static_prompt("c1")
+
+
+def test_static_prompt_has_no_per_turn_context(service, builds):
+    asyncio.run(service.save_character(profile()))
+    static = service.get_static_prompt("c1")
+
+    assert service.build_system_prompt("c1") == static.text
+    full = service.build_system_prompt("c1", context="they talked about cats")
+    assert full.startswith(static.identity)
+    assert full.endswith(static.closing)
+    assert "they talked about cats" in full
+    assert "they talked about cats" not in static.text
@@ -0,0 +1,146 @@
+"""Token budget order of the context packer and its estimator calibration."""
+
+import pytest
+
+from config.settings import settings
+from models.schemas import MemoryEntry, MemoryType
+from services.context_packer import (
+    MEMORY_HEADER,
+    SUMMARY_HEADER,
+    ContextPacker,
+    TokenEstimator,
+    format_memory,
+)
+
+SYSTEM = "system prompt"
+MESSAGE = "hello"
+
+
+@pytest.fixture(autouse=True)
+def budget_settings(monkeypatch):
+    monkeypatch.setattr(settings, "max_tokens", 0)
+    monkeypatch.setattr(settings, "context_reserve_tokens", 0)
+    monkeypatch.setattr(settings, "context_safety_margin", 0.0)
+
+
+def memory(memory_id: str, content: str, pinned: bool = False) -> MemoryEntry:
+    return MemoryEntry(
+        id=memory_id,
+        characterId="c1",
+        userId="u1",
+        content=content,
+        memoryType=MemoryType.PINNED if pinned else MemoryType.FACTUAL,
+        importance=0.5,
+        isPinned=pinned,
+        createdAt="2026-01-01T00:00:00",
+        updatedAt="2026-01-01T00:00:00",
+    )
+
+
+def turn(content: str, role: str = "user"):
+    return {"role": role, "content": content}
+
+
+def snippet(content: str):
+    return {"role": "user", "content": content, "metadata": {"relevance": 0.9}}
+
+
+# One character per token and no template overhead, so costs are easy to add up
+packer = ContextPacker(TokenEstimator(1.0, message_overhead=0))
+estimator = packer.estimator
+
+
+def fixed_budget(monkeypatch, tokens: int) -> None:
+    """Leave exactly ``tokens`` for the variable sections"""
+    monkeypatch.setattr(settings, "context_length", tokens + len(SYSTEM) + len(MESSAGE))
+
+
+def memory_cost(entry: MemoryEntry, first: bool) -> int:
+    return estimator.count(format_memory(entry)) + 1 + (estimator.count(MEMORY_HEADER) if first else 0)
+
+
+def test_everything_fits_in_a_large_budget(monkeypatch):
+    monkeypatch.setattr(settings, "context_length", 100000)
+    packed = packer.pack(
+        SYSTEM, MESSAGE,
+        memories=[memory("p", "pinned fact", pinned=True), memory("r", "regular fact")],
+        history=[turn("one"), turn("two", "assistant")],
+        snippets=[snippet("earlier")],
+        summary="they met yesterday",
+    )
+    assert [m.id for m in packed.memories] == ["p", "r"]
+    assert packed.summary == "they met yesterday"
+    assert len(packed.history) == 2
+    assert len(packed.snippets) == 1
+    assert not any(packed.dropped.values())
+    assert packed.tokens["total"] <= packed.tokens["budget"] + len(SYSTEM) + len(MESSAGE)
+
+
+def test_budget_is_spent_pinned_summary_history_memories_snippets(monkeypatch):
+    pinned = memory("p", "pinned fact", pinned=True)
+    summary = "they met yesterday"
+    newest = turn("newest turn")
+    fixed_budget(
+        monkeypatch,
+        memory_cost(pinned, first=True)
+        + estimator.count(SUMMARY_HEADER + summary) + 1
+        + estimator.count(newest["content"])
+    )
+
+    packed = packer.pack(
+        SYSTEM, MESSAGE,
+        memories=[pinned, memory("r", "regular fact")],
+        history=[turn("older turn"), newest],
+        snippets=[snippet("earlier")],
+        summary=summary,
+    )
+    assert [m.id for m in packed.memories] == ["p"]
+    assert packed.summary == summary
+    assert packed.history == [newest]
+    assert packed.snippets == []
+    assert packed.dropped == {"memories": 1, "summary": 0, "history": 1, "context": 1}
+
+
+def test_history_stays_contiguous_but_leftovers_go_to_later_sections(monkeypatch):
+    regular = memory("r", "fact")
+    newest = turn("short")
+    fixed_budget(monkeypatch, estimator.count(newest["content"]) + 5 + memory_cost(regular, first=True))
+
+    packed = packer.pack(
+        SYSTEM, MESSAGE,
+        memories=[regular],
+        history=[turn("ok"), turn("x" * 500), newest],
+        snippets=[],
+    )
+    # "ok" would fit on its own, but not without the turn in between
+    assert packed.history == [newest]
+    assert [m.id for m in packed.memories] == ["r"]
+
+
+def test_safety_margin_shrinks_the_budget(monkeypatch):
+    monkeypatch.setattr(settings, "context_length", 1000)
+    full = packer.available(SYSTEM, MESSAGE)
+    monkeypatch.setattr(settings, "context_safety_margin", 0.1)
+    assert packer.available(SYSTEM, MESSAGE) == full - 100
+
+
+def test_ratio_is_calibrated_per_model():
+    calibrated = TokenEstimator(4.0, message_overhead=0)
+    prompt = ["x" * 1000]
+
+    calibrated.observe("model-a", prompt, 500)  # 2 chars per token
+    ratio = calibrated.for_model("model-a").chars_per_token
+    assert 2.0 < ratio < 4.0
+    assert calibrated.for_model("model-b").chars_per_token == 4.0
+
+    for _ in range(50):
+        calibrated.observe("model-a", prompt, 500)
+    assert calibrated.for_model("model-a").chars_per_token == pytest.approx(2.0, abs=0.01)
+
+
+def test_cache_reuse_samples_are_ignored():
+    calibrated = TokenEstimator(3.0, message_overhead=4)
+    calibrated.observe("m", ["x" * 3000], 40)  # only the uncached tail was evaluated
+    calibrated.observe("m", ["x" * 3000], None)
+    calibrated.observe("m", ["x" * 3000], 4)  # nothing beyond the template
+    assert calibrated.for_model("m").chars_per_token == 3.0
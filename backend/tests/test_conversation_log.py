@@ -0,0 +1,94 @@
+"""Recent-history reads and legacy backfill of the SQLite conversation log."""
+
+import pytest
+
+from rag.conversation_log import ConversationLog, documents_to_messages
+
+
+def msg(doc_id: str, content: str = None, role: str = "user", timestamp: str = None):
+    metadata = {"timestamp": timestamp} if timestamp else {}
+    return {"id": doc_id, "role": role, "content": content or doc_id, "metadata": metadata}
+
+
+@pytest.fixture
+def log(tmp_path):
+    conversation_log = ConversationLog(tmp_path / "conversations.db")
+    yield conversation_log
+    conversation_log.close()
+
+
+def contents(messages):
+    return [m["content"] for m in messages]
+
+
+def test_recent_returns_the_newest_messages_oldest_first(log):
+    log.append("c1", "u1", [msg("m1"), msg("m2", role="assistant")])
+    log.append("c1", "u1", [msg("m3"), msg("m4", role="assistant")])
+
+    assert contents(log.recent("c1", "u1", 3)) == ["m2", "m3", "m4"]
+    assert contents(log.recent("c1", "u1", 10)) == ["m1", "m2", "m3", "m4"]
+    assert log.recent("c1", "u1", 0) == []
+
+    latest = log.recent("c1", "u1", 1)[0]
+    assert latest["role"] == "assistant"
+    assert latest["metadata"]["role"] == "assistant"
+
+
+def test_pairs_are_kept_apart(log):
+    log.append("c1", "u1", [msg("mine")])
+    log.append("c1", "u2", [msg("other user")])
+    log.append("c2", "u1", [msg("other character")])
+
+    assert contents(log.recent("c1", "u1", 10)) == ["mine"]
+    assert log.clear("c1", "u1") == 1
+    assert log.recent("c1", "u1", 10) == []
+    assert contents(log.recent("c1", "u2", 10)) == ["other user"]
+
+
+def test_legacy_history_is_imported_ahead_of_new_messages(log):
+    log.append("c1", "u1", [msg("new")])
+    legacy = [msg("old 1", timestamp="2025-01-01T10:00:00"), msg("old 2", timestamp="2025-01-01T10:01:00")]
+    calls = []
+
+    def load_legacy():
+        calls.append(1)
+        return legacy + [msg("new")]  # already logged, not imported twice
+
+    log.ensure_backfilled("c1", "u1", load_legacy)
+    log.ensure_backfilled("c1", "u1", load_legacy)
+
+    assert contents(log.recent("c1", "u1", 10)) == ["old 1", "old 2", "new"]
+    assert len(calls) == 1
+
+
+def test_backfill_is_remembered_across_restarts(tmp_path):
+    path = tmp_path / "conversations.db"
+    first = ConversationLog(path)
+    first.ensure_backfilled("c1", "u1", lambda: [msg("old")])
+    first.close()
+
+    reopened = ConversationLog(path)
+    try:
+        reopened.ensure_backfilled("c1", "u1", lambda: pytest.fail("legacy history loaded twice"))
+        assert reopened.is_backfilled("c1", "u1")
+        assert not reopened.is_backfilled("c1", "u2")
+        assert contents(reopened.recent("c1", "u1", 10)) == ["old"]
+    finally:
+        reopened.close()
+
+
+def test_legacy_documents_are_ordered_by_timestamp():
+    results = {
+        "ids": ["b", "a", "c"],
+        "documents": ["second", "first", "undated"],
+        "metadatas": [
+            {"role": "assistant", "timestamp": "2025-01-01T10:01:00"},
+            {"role": "user", "timestamp": "2025-01-01T10:00:00"},
+            None,
+        ],
+    }
+    messages = documents_to_messages(results)
+    assert contents(messages) == ["undated", "first", "second"]
+    assert messages[0]["role"] == "unknown"
+    assert messages[2]["role"] == "assistant"
+    assert documents_to_messages({"ids": [], "documents": None, "metadatas": None}) == []
@@ -0,0 +1,103 @@
+"""Memory LRU and on-disk tier of the embedding cache."""
+
+import asyncio
+
+from rag.embedding_cache import DiskEmbeddingStore, EmbeddingCache, make_cache_key
+
+import numpy as np
+
+
+def vec(value: float, dim: int = 4):
+    return [value] * dim
+
+
+def test_cache_key_normalizes_text_per_model():
+    assert make_cache_key("m", "hello   world\n") == make_cache_key("m", " hello world")
+    assert make_cache_key("m", "café") == make_cache_key("m", "café")
+    assert make_cache_key("m", "hello") != make_cache_key("other", "hello")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put_many(["a", "b"], [vec(1), vec(2)])
+    assert cache.get_many(["a"]) == [vec(1)]  # "b" is now the oldest
+    cache.put_many(["c"], [vec(3)])
+
+    assert cache.get_many(["a", "b", "c"]) == [vec(1), None, vec(3)]
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+
+
+def test_memory_tier_is_bounded_by_bytes():
+    cache = EmbeddingCache(max_entries=100, max_bytes=2 * 4 * 4)  # two float32 vectors of dim 4
+    cache.put_many(["a", "b", "c"], [vec(1), vec(2), vec(3)])
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    assert cache.get_many(["a"]) == [None]
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    cache = EmbeddingCache(disk_path=tmp_path, disk_capacity=10)
+    cache.put_many(["a", "b"], [vec(0.5), vec(0.25)])
+    cache.close()
+
+    reopened = EmbeddingCache(disk_path=tmp_path, disk_capacity=10)
+    assert reopened.get_many(["b", "a", "missing"]) == [vec(0.25), vec(0.5), None]
+    stats = reopened.stats()
+    assert (stats["disk_hits"], stats["misses"]) == (2, 1)
+    assert stats["disk_entries"] == 2
+
+    assert reopened.get_many(["a"]) == [vec(0.5)]  # promoted to the memory tier
+    assert reopened.stats()["hits"] == 1
+    reopened.close()
+
+
+def test_async_lookup_reads_the_disk_tier(tmp_path):
+    cache = EmbeddingCache(disk_path=tmp_path, disk_capacity=10)
+    cache.put_many(["a"], [vec(0.5)])
+    cache.close()
+
+    reopened = EmbeddingCache(disk_path=tmp_path, disk_capacity=10)
+    assert asyncio.run(reopened.get_many_async(["a", "missing"])) == [vec(0.5), None]
+    assert asyncio.run(reopened.get_many_async(["a"])) == [vec(0.5)]
+    stats = reopened.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+    reopened.close()
+
+
+def test_evicted_entries_fall_back_to_disk(tmp_path):
+    cache = EmbeddingCache(max_entries=1, disk_path=tmp_path, disk_capacity=10)
+    cache.put_many(["a", "b"], [vec(1), vec(2)])
+    assert cache.get_many(["a"]) == [vec(1)]
+    assert cache.stats()["misses"] == 0
+    cache.close()
+
+
+def test_disk_store_reuses_the_oldest_slot(tmp_path):
+    store = DiskEmbeddingStore(tmp_path, capacity=2)
+    for i, key in enumerate(["a", "b", "c"]):
+        store.put(key, np.full(4, i, dtype=np.float32))
+    assert store.get("a") is None
+    assert len(store) == 2
+    store.close()
+
+    reopened = DiskEmbeddingStore(tmp_path, capacity=2)
+    assert reopened.get("a") is None
+    assert reopened.get("c").tolist() == [2.0] * 4
+    reopened.put("d", np.full(4, 3, dtype=np.float32))  # overwrites "b", the next oldest
+    assert reopened.get("b") is None
+    assert reopened.get("c") is not None
+    reopened.close()
+
+
+def test_disk_store_starts_fresh_when_capacity_changes(tmp_path):
+    store = DiskEmbeddingStore(tmp_path, capacity=2)
+    store.put("a", np.ones(4, dtype=np.float32))
+    store.close()
+
+    resized = DiskEmbeddingStore(tmp_path, capacity=4)
+    assert len(resized) == 0
+    assert resized.get("a") is None
+    resized.close()
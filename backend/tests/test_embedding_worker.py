@@ -0,0 +1,86 @@
+"""Micro-batching in the embedding worker."""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from rag.embedding_worker import EmbeddingWorker
+
+
+class FakeModel:
+    """Records encode calls; each vector is the code point of the text's first character"""
+
+    def __init__(self, error: Exception = None):
+        self.calls = []
+        self.error = error
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        return np.array([[float(ord(text[0]))] for text in texts], dtype=np.float32)
+
+
+def make_worker(model, batch_size: int) -> EmbeddingWorker:
+    # A long wait so the batch only closes once batch_size texts are queued
+    return EmbeddingWorker(model, batch_size=batch_size, max_wait_ms=2000)
+
+
+def test_concurrent_requests_share_one_encode_call():
+    model = FakeModel()
+    worker = make_worker(model, batch_size=4)
+
+    async def scenario():
+        return await asyncio.gather(
+            worker.embed(["a"]),
+            worker.embed(["b", "c"]),
+            worker.embed(["d"]),
+        )
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        worker.shutdown()
+
+    assert model.calls == [["a", "b", "c", "d"]]
+    assert results == [[[97.0]], [[98.0], [99.0]], [[100.0]]]
+
+
+def test_encode_failure_reaches_every_caller():
+    model = FakeModel(error=ValueError("model crashed"))
+    worker = make_worker(model, batch_size=3)
+
+    async def scenario():
+        return await asyncio.gather(
+            worker.embed(["a"]),
+            worker.embed(["b"]),
+            worker.embed(["c"]),
+            return_exceptions=True
+        )
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        worker.shutdown()
+
+    assert len(model.calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_empty_request_resolves_without_encoding():
+    model = FakeModel()
+    worker = make_worker(model, batch_size=4)
+    try:
+        assert worker.embed_sync([]) == []
+    finally:
+        worker.shutdown()
+    assert model.calls == []
+
+
+def test_submit_after_shutdown_is_rejected():
+    worker = EmbeddingWorker(FakeModel(), batch_size=1, max_wait_ms=0)
+    assert worker.embed_sync(["a"]) == [[97.0]]
+    worker.shutdown()
+    with pytest.raises(RuntimeError):
+        worker.submit(["b"])
@@ -0,0 +1,47 @@
+"""Parsing of the memory extraction model output."""
+
+import math
+
+from services.memory_facts import MAX_FACTS_PER_PASS, parse_facts as parse
+
+
+def test_parses_objects_and_plain_strings():
+    raw = 'Sure! [{"fact": "User works as a nurse", "importance": 0.7}, "User has a cat"]'
+    assert parse(raw) == [
+        {"content": "User works as a nurse", "importance": 0.7},
+        {"content": "User has a cat", "importance": 0.5},
+    ]
+
+
+def test_non_finite_importance_falls_back_to_default():
+    facts = parse('[{"fact": "a", "importance": NaN}, {"fact": "b", "importance": Infinity}]')
+    assert [f["importance"] for f in facts] == [0.5, 0.5]
+    assert all(math.isfinite(f["importance"]) for f in facts)
+
+
+def test_importance_is_clamped_and_coerced():
+    facts = parse(
+        '[{"fact": "a", "importance": 3}, {"fact": "b", "importance": -1},'
+        ' {"fact": "c", "importance": "0.25"}, {"fact": "d", "importance": "high"}]'
+    )
+    assert [f["importance"] for f in facts] == [1.0, 0.0, 0.25, 0.5]
+
+
+def test_malformed_output_yields_no_facts():
+    assert parse("") == []
+    assert parse(None) == []
+    assert parse("no facts here") == []
+    assert parse("[not json]") == []
+    assert parse('{"fact": "not a list"}') == []
+
+
+def test_skips_invalid_items_and_caps_the_batch():
+    assert parse('[1, null, {"fact": ""}, {"other": "x"}, {"content": "kept"}]') == [
+        {"content": "kept", "importance": 0.5}
+    ]
+    many = "[" + ", ".join(f'"fact {i}"' for i in range(MAX_FACTS_PER_PASS + 3)) + "]"
+    assert len(parse(many)) == MAX_FACTS_PER_PASS
+
+
+def test_long_facts_are_truncated():
+    assert len(parse(f'["{"x" * 800}"]')[0]["content"]) == 500
@@ -0,0 +1,100 @@
+"""Vectorised memory ranking and pair keys of the SQLite memory store."""
+
+import importlib
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from config.settings import settings
+from models.schemas import MemoryCreateRequest, MemoryEntry, MemoryType
+
+
+@pytest.fixture
+def memory_module(tmp_path, monkeypatch):
+    # Importing the module opens its global store under the working directory
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module("services.memory_service")
+
+
+@pytest.fixture
+def service(memory_module, tmp_path):
+    return memory_module.MemoryService(data_dir=str(tmp_path / "memories"))
+
+
+def memory(memory_id: str, importance: float, days_old: float, pinned: bool = False) -> MemoryEntry:
+    created = (datetime.utcnow() - timedelta(days=days_old)).isoformat()
+    return MemoryEntry(
+        id=memory_id,
+        characterId="c1",
+        userId="u1",
+        content=f"memory {memory_id}",
+        memoryType=MemoryType.PINNED if pinned else MemoryType.FACTUAL,
+        importance=importance,
+        isPinned=pinned,
+        createdAt=created,
+        updatedAt=created,
+    )
+
+
+def reference_rank(entries, vectors, query, limit):
+    """Per-item scoring the vectorised ranking replaced"""
+    now = datetime.utcnow().timestamp()
+
+    def score(entry, vector):
+        similarity = 0.0
+        if vector is not None:
+            similarity = float(np.dot(vector, query) / (np.linalg.norm(vector) * np.linalg.norm(query)))
+        age_days = max(now - datetime.fromisoformat(entry.createdAt).timestamp(), 0) / 86400
+        recency = math.exp(-math.log(2) * age_days / settings.memory_recency_half_life_days)
+        return (
+            settings.memory_similarity_weight * similarity
+            + settings.memory_importance_weight * entry.importance
+            + settings.memory_recency_weight * recency
+        )
+
+    scored = [(entry, score(entry, vector)) for entry, vector in zip(entries, vectors)]
+    pinned = sorted((s for s in scored if s[0].isPinned), key=lambda s: -s[1])
+    regular = sorted((s for s in scored if not s[0].isPinned), key=lambda s: -s[1])
+    return [entry.id for entry, _ in (pinned + regular)[:limit]]
+
+
+def test_vectorised_ranking_matches_per_item_scoring(memory_module):
+    rng = np.random.default_rng(7)
+    entries = [
+        memory("a", 0.9, 40),
+        memory("b", 0.2, 1),
+        memory("c", 0.5, 10, pinned=True),
+        memory("d", 0.7, 3),
+        memory("e", 0.1, 0.5),
+        memory("f", 0.6, 90, pinned=True),
+        memory("g", 0.4, 20),
+        memory("h", 0.8, 5),  # no embedding yet
+    ]
+    vectors = [rng.normal(size=8).astype(np.float32) for _ in entries[:-1]] + [None]
+    pair = memory_module._PairMemories(entries, [v.tobytes() if v is not None else None for v in vectors])
+
+    for _ in range(5):
+        query = rng.normal(size=8).astype(np.float32)
+        for limit in (1, 2, 3, 5, 8, 20):
+            ranked = [m.id for m in pair.rank(query.tolist(), limit)]
+            assert ranked == reference_rank(entries, vectors, query, limit)
+
+
+def test_missing_user_id_shares_the_default_pair(service):
+    request = MemoryCreateRequest(content="User likes tea", memoryType=MemoryType.FACTUAL, importance=0.6)
+    created = service.create_memory("c1", None, request)
+    assert created.userId == "default"
+
+    assert [m.id for m in service.get_relevant_memories("c1", None)] == [created.id]
+    assert [m.id for m in service.get_relevant_memories("c1", "default")] == [created.id]
+    assert service.get_memory("c1", None, created.id) is not None
+
+    # A write through one spelling invalidates the cache read through the other
+    service.create_memory("c1", "default", request)
+    assert len(service.get_relevant_memories("c1", None)) == 2
+    assert service.get_memory_statistics("c1", None)["totalCount"] == 2
+
+    assert service.delete_memory("c1", None, created.id)
+    assert len(service.get_all_memories("c1", "default")) == 1
@@ -0,0 +1,146 @@
+"""Priority, fairness and admission control of the LLM scheduler."""
+
+import asyncio
+
+import pytest
+
+from llm.scheduler import LLMScheduler, Priority, SchedulerRejected, TicketedStream
+
+
+def make_scheduler(**overrides) -> LLMScheduler:
+    options = {"slots": 1, "max_queue": 10, "max_queue_per_user": 10, "queue_timeout": 5.0}
+    options.update(overrides)
+    return LLMScheduler(**options)
+
+
+async def serve_order(scheduler, requests):
+    """Queue ``requests`` behind a held slot and return the order they are served in"""
+    order = []
+    blocker = scheduler.submit(Priority.INTERACTIVE, "blocker")
+    await blocker.__aenter__()
+
+    async def worker(priority, user_id, label):
+        async with scheduler.submit(priority, user_id):
+            order.append(label)
+
+    tasks = [asyncio.create_task(worker(*request)) for request in requests]
+    await asyncio.sleep(0)  # every request is now waiting
+    blocker.close()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_higher_priority_is_served_first():
+    scheduler = make_scheduler()
+    order = asyncio.run(serve_order(scheduler, [
+        (Priority.BACKGROUND, "u1", "summary"),
+        (Priority.ENHANCE, "u2", "enhance"),
+        (Priority.INTERACTIVE, "u3", "chat"),
+    ]))
+    assert order == ["chat", "enhance", "summary"]
+
+
+def test_users_are_served_round_robin_within_a_priority():
+    scheduler = make_scheduler()
+    order = asyncio.run(serve_order(scheduler, [
+        (Priority.INTERACTIVE, "a", "a1"),
+        (Priority.INTERACTIVE, "a", "a2"),
+        (Priority.INTERACTIVE, "a", "a3"),
+        (Priority.INTERACTIVE, "b", "b1"),
+    ]))
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_slots_are_all_released():
+    scheduler = make_scheduler(slots=2)
+    asyncio.run(serve_order(scheduler, [(Priority.INTERACTIVE, f"u{i}", i) for i in range(5)]))
+    stats = scheduler.stats()
+    assert stats["active"] == 0
+    assert stats["waiting"] == 0
+    assert stats["admitted"] == 0
+
+
+def test_per_user_limit_rejects_with_429():
+    scheduler = make_scheduler(max_queue_per_user=2)
+    first = scheduler.submit(Priority.INTERACTIVE, "u1")
+    second = scheduler.submit(Priority.INTERACTIVE, "u1")
+
+    with pytest.raises(SchedulerRejected) as rejected:
+        scheduler.submit(Priority.INTERACTIVE, "u1")
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after >= 1
+
+    others = scheduler.submit(Priority.INTERACTIVE, "u2")  # other users are unaffected
+    background = scheduler.submit(Priority.BACKGROUND, "u1")  # background work is never rejected
+    background.close()
+    first.close()
+    third = scheduler.submit(Priority.INTERACTIVE, "u1")  # closing frees the admission
+    assert scheduler.rejected == 1
+    for ticket in (second, others, third):
+        ticket.close()
+
+
+def test_full_queue_rejects_with_503():
+    async def scenario():
+        scheduler = make_scheduler(max_queue=1)
+        async with scheduler.submit(Priority.INTERACTIVE, "u1"):
+            queued = scheduler.submit(Priority.INTERACTIVE, "u2")
+            with pytest.raises(SchedulerRejected) as rejected:
+                scheduler.submit(Priority.INTERACTIVE, "u3")
+            assert rejected.value.status_code == 503
+            background = scheduler.submit(Priority.BACKGROUND, "u3")
+            queued.close()
+            background.close()
+        return scheduler
+
+    assert asyncio.run(scenario()).rejected == 1
+
+
+def test_wait_timeout_rejects_and_releases_the_admission():
+    async def scenario():
+        scheduler = make_scheduler(queue_timeout=0.01)
+        async with scheduler.submit(Priority.INTERACTIVE, "u1"):
+            with pytest.raises(SchedulerRejected) as rejected:
+                async with scheduler.submit(Priority.INTERACTIVE, "u2"):
+                    pass
+            assert rejected.value.status_code == 503
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.stats()["admitted"] == 0
+    assert scheduler.rejected == 1
+
+
+async def events():
+    yield "token"
+    yield "done"
+
+
+def test_stream_that_never_starts_releases_its_ticket():
+    async def scenario():
+        scheduler = make_scheduler()
+        stream = TicketedStream(events(), scheduler.submit(Priority.INTERACTIVE, "u1"))
+        assert scheduler.stats()["admitted"] == 1
+        await stream.aclose()
+        await stream.aclose()
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.stats()["admitted"] == 0
+    assert scheduler.submit(Priority.INTERACTIVE, "u1").user_id == "u1"
+
+
+def test_stream_keeps_its_ticket_until_closed():
+    async def scenario():
+        scheduler = make_scheduler()
+        ticket = scheduler.submit(Priority.INTERACTIVE, "u1")
+        stream = TicketedStream(events(), ticket)
+        received = [event async for event in stream]
+        admitted = scheduler.stats()["admitted"]
+        await stream.aclose()
+        return scheduler, received, admitted
+
+    scheduler, received, admitted = asyncio.run(scenario())
+    assert received == ["token", "done"]
+    assert admitted == 1
+    assert scheduler.stats()["admitted"] == 0
@@ -0,0 +1,25 @@
+"""Parsing of settings that Ollama is strict about."""
+
+import pytest
+
+from config.settings import Settings
+
+parse_keep_alive = Settings.parse_keep_alive
+
+
+def test_bare_numbers_become_seconds():
+    assert parse_keep_alive("-1") == -1
+    assert parse_keep_alive(" 3600 ") == 3600
+    assert parse_keep_alive("2.5") == 2.5
+    assert parse_keep_alive(0) == 0
+
+
+def test_durations_are_passed_through():
+    for duration in ("30m", "1h30m", "1.5h", "-1m", "500ms"):
+        assert parse_keep_alive(duration) == duration
+
+
+def test_anything_else_is_rejected():
+    for value in ("forever", "30 m", "", "m30"):
+        with pytest.raises(ValueError):
+            parse_keep_alive(value)
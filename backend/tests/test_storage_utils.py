@@ -0,0 +1,99 @@
+"""Atomic JSON writes and per-key locks."""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from services import storage_utils
+from services.storage_utils import KeyedLocks, atomic_delete, atomic_write_json
+
+
+def leftovers(directory):
+    return sorted(p.name for p in directory.iterdir() if p.name.endswith(".tmp"))
+
+
+def test_write_replaces_the_file(tmp_path):
+    path = tmp_path / "aria.json"
+    atomic_write_json(path, {"name": "Aria"})
+    atomic_write_json(path, {"name": "Ária", "age": 20})
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"name": "Ária", "age": 20}
+    assert leftovers(tmp_path) == []
+
+
+def test_failed_serialisation_keeps_the_original(tmp_path):
+    path = tmp_path / "aria.json"
+    atomic_write_json(path, {"name": "Aria"})
+
+    with pytest.raises(TypeError):
+        atomic_write_json(path, {"name": object()})
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"name": "Aria"}
+    assert leftovers(tmp_path) == []
+
+
+def test_failed_rename_keeps_the_original(tmp_path, monkeypatch):
+    path = tmp_path / "aria.json"
+    atomic_write_json(path, {"name": "Aria"})
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(storage_utils.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        atomic_write_json(path, {"name": "Changed"})
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"name": "Aria"}
+    assert leftovers(tmp_path) == []
+
+
+def test_atomic_delete_reports_whether_the_file_existed(tmp_path):
+    path = tmp_path / "aria.json"
+    atomic_write_json(path, {})
+    assert atomic_delete(path)
+    assert not os.path.exists(path)
+    assert not atomic_delete(path)
+
+
+async def run_locked(locks, keys):
+    """Run one short critical section per key; returns how many ran at once at the peak"""
+    active = set()
+    peak = 0
+
+    async def critical(index, key):
+        nonlocal peak
+        async with locks.acquire(key):
+            active.add(index)
+            peak = max(peak, len(active))
+            await asyncio.sleep(0.01)
+            active.discard(index)
+
+    await asyncio.gather(*(critical(i, key) for i, key in enumerate(keys)))
+    return peak
+
+
+def test_same_key_is_serialised():
+    locks = KeyedLocks()
+    assert asyncio.run(run_locked(locks, [("c1", "u1")] * 4)) == 1
+    assert len(locks) == 0
+
+
+def test_different_keys_run_concurrently():
+    locks = KeyedLocks()
+    assert asyncio.run(run_locked(locks, [("c1", "u1"), ("c1", "u2"), ("c2", "u1")])) == 3
+    assert len(locks) == 0
+
+
+def test_lock_is_released_when_the_block_raises():
+    async def scenario():
+        locks = KeyedLocks()
+        with pytest.raises(ValueError):
+            async with locks.acquire("key"):
+                raise ValueError("write failed")
+        async with locks.acquire("key"):
+            pass
+        return locks
+
+    assert len(asyncio.run(scenario())) == 0
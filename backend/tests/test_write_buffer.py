@@ -0,0 +1,192 @@
+"""Read-your-writes and failure handling of the conversation write buffer."""
+
+import asyncio
+
+from rag.write_buffer import ConversationWriteBuffer
+
+
+def msg(content: str):
+    return {"role": "user", "content": content}
+
+
+class RecordingSink:
+    """Flush callback that records batches; can block or fail on demand"""
+
+    def __init__(self):
+        self.batches = []
+        self.failures = 0
+        self.poisoned = set()  # pairs that never get written
+        self.release = None  # asyncio.Event the next flush waits for
+        self.entered = None
+
+    async def __call__(self, batch):
+        if self.release is not None:
+            self.entered.set()
+            await self.release.wait()
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("vector store unavailable")
+        written = {key: messages for key, messages in batch.items() if key not in self.poisoned}
+        if written:
+            self.batches.append(written)
+        return set(written)
+
+    def block(self):
+        self.release = asyncio.Event()
+        self.entered = asyncio.Event()
+
+
+def make_buffer(sink, max_attempts: int = 5):
+    return ConversationWriteBuffer(sink, max_pending=100, flush_interval=60.0, max_attempts=max_attempts)
+
+
+def test_pending_messages_are_readable_until_flushed():
+    async def scenario():
+        sink = RecordingSink()
+        buffer = make_buffer(sink)
+        buffer.add("c1", "u1", [msg("a"), msg("b")])
+        assert buffer.pending_for("c1", "u1") == [msg("a"), msg("b")]
+        assert buffer.pending_for("c1", "u2") == []
+
+        sink.block()
+        flush = asyncio.create_task(buffer.flush())
+        await sink.entered.wait()
+        buffer.add("c1", "u1", [msg("c")])
+        # Messages being written are still visible, ahead of newer ones
+        assert buffer.pending_for("c1", "u1") == [msg("a"), msg("b"), msg("c")]
+        assert buffer.pending_count == 3
+
+        sink.release.set()
+        await flush
+        assert buffer.pending_for("c1", "u1") == [msg("c")]
+        await buffer.stop()
+        return sink
+
+    sink = asyncio.run(scenario())
+    assert sink.batches == [{("c1", "u1"): [msg("a"), msg("b")]}, {("c1", "u1"): [msg("c")]}]
+
+
+def test_failed_flush_is_requeued_in_order():
+    async def scenario():
+        sink = RecordingSink()
+        sink.failures = 1
+        buffer = make_buffer(sink)
+        buffer.add("c1", "u1", [msg("a")])
+
+        sink.block()
+        flush = asyncio.create_task(buffer.flush())
+        await sink.entered.wait()
+        buffer.add("c1", "u1", [msg("b")])
+        sink.release.set()
+        await flush
+
+        assert buffer.pending_for("c1", "u1") == [msg("a"), msg("b")]
+        assert buffer.pending_count == 2
+        sink.release = None
+        await buffer.flush()
+        assert buffer.pending_count == 0
+        await buffer.stop()
+        return sink
+
+    sink = asyncio.run(scenario())
+    assert sink.batches == [{("c1", "u1"): [msg("a"), msg("b")]}]
+
+
+def test_discard_during_a_failing_flush_is_not_undone():
+    async def scenario():
+        sink = RecordingSink()
+        sink.failures = 1
+        buffer = make_buffer(sink)
+        buffer.add("c1", "u1", [msg("a")])
+        buffer.add("c2", "u1", [msg("keep")])
+
+        sink.block()
+        flush = asyncio.create_task(buffer.flush())
+        await sink.entered.wait()
+        buffer.discard("c1", "u1")
+        sink.release.set()
+        await flush
+
+        assert buffer.pending_for("c1", "u1") == []
+        assert buffer.pending_for("c2", "u1") == [msg("keep")]
+        await buffer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_discarding_waits_for_the_running_flush():
+    async def scenario():
+        sink = RecordingSink()
+        buffer = make_buffer(sink)
+        buffer.add("c1", "u1", [msg("a")])
+
+        sink.block()
+        flush = asyncio.create_task(buffer.flush())
+        await sink.entered.wait()
+        events = []
+
+        async def clear():
+            async with buffer.discarding("c1", "u1"):
+                events.append("cleared")
+
+        clearing = asyncio.create_task(clear())
+        await asyncio.sleep(0)
+        assert events == []  # the write in flight lands before the store is cleared
+        sink.release.set()
+        await asyncio.gather(flush, clearing)
+        assert events == ["cleared"]
+        assert buffer.pending_for("c1", "u1") == []
+        await buffer.stop()
+        return sink
+
+    sink = asyncio.run(scenario())
+    assert sink.batches == [{("c1", "u1"): [msg("a")]}]
+
+
+def test_only_failed_conversations_are_requeued():
+    async def scenario():
+        sink = RecordingSink()
+        sink.poisoned = {("c2", "u1")}
+        buffer = make_buffer(sink)
+        buffer.add("c1", "u1", [msg("a")])
+        buffer.add("c2", "u1", [msg("b")])
+
+        await buffer.flush()
+        assert buffer.pending_for("c1", "u1") == []
+        assert buffer.pending_for("c2", "u1") == [msg("b")]
+
+        sink.poisoned = set()
+        await buffer.flush()
+        await buffer.stop()
+        return sink
+
+    sink = asyncio.run(scenario())
+    assert sink.batches == [{("c1", "u1"): [msg("a")]}, {("c2", "u1"): [msg("b")]}]
+
+
+def test_conversation_is_dropped_after_max_attempts():
+    async def scenario():
+        sink = RecordingSink()
+        sink.poisoned = {("c1", "u1")}
+        buffer = make_buffer(sink, max_attempts=3)
+        buffer.add("c1", "u1", [msg("bad")])
+
+        for attempt in range(3):
+            assert buffer.pending_for("c1", "u1") == [msg("bad")]
+            buffer.add("c2", "u1", [msg(f"ok {attempt}")])
+            await buffer.flush()
+
+        assert buffer.pending_for("c1", "u1") == []
+        assert buffer.pending_count == 0
+        assert buffer.dropped == 1
+
+        # A fresh message for the pair starts a new count
+        buffer.add("c1", "u1", [msg("next")])
+        sink.poisoned = set()
+        await buffer.flush()
+        await buffer.stop()
+        return sink
+
+    sink = asyncio.run(scenario())
+    assert [batch.get(("c2", "u1")) for batch in sink.batches[:3]] == [[msg(f"ok {i}")] for i in range(3)]
+    assert sink.batches[-1] == {("c1", "u1"): [msg("next")]}
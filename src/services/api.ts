@@ -99,9 +99,20 @@ export interface ChatResponse {
     responseTime: number;
     tokenCount: number;
     model: string;
+    generation?: GenerationStats;
   };
 }
 
+export interface GenerationStats {
+  promptTokens: number | null;
+  completionTokens: number | null;
+  promptEvalSeconds: number | null;
+  evalSeconds: number | null;
+  loadSeconds: number | null;
+  promptTokensPerSecond: number | null;
+  tokensPerSecond: number | null;
+}
+
 export interface ModelConfig {
   model_name: string;
   cpu_threads: number;
@@ -109,6 +120,15 @@ export interface ModelConfig {
   temperature: number;
   context_length: number;
   max_tokens: number;
+  model_switch?: ModelSwitchStatus | null;
+}
+
+export interface ModelSwitchStatus {
+  model: string;
+  status: 'switching' | 'ready' | 'failed';
+  error: string | null;
+  started_at: number;
+  finished_at: number | null;
 }
 
 export interface SystemStatus {
@@ -121,6 +141,25 @@ export interface SystemStatus {
   uptime_seconds: number;
 }
 
+export interface SystemSample {
+  timestamp: number;
+  cpu_usage: number;
+  memory_usage: number;
+  memory_used_mb: number;
+  process_rss_mb: Record<string, number>;
+  characters: number | null;
+  memories: number | null;
+  llm_status: string;
+  llm_active: number;
+  llm_waiting: number;
+}
+
+export interface StatusHistory {
+  interval: number;
+  window: number;
+  samples: SystemSample[];
+}
+
 export interface Character {
   id: string;
   name: string;
@@ -153,6 +192,13 @@ export async function getSystemStatus(): Promise<SystemStatus> {
   return fetchAPI<SystemStatus>('/api/status');
 }
 
+/**
+ * Get recent resource samples (last `window` seconds)
+ */
+export async function getStatusHistory(window = 300): Promise<StatusHistory> {
+  return fetchAPI<StatusHistory>(`/api/status/history?window=${window}`);
+}
+
 /**
  * Send chat message and get AI response
  */